@@ -4,31 +4,39 @@
 # AUB MSBA Capstone Project
 # ============================================================================
 
+import itertools
+import os
+import sys
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from figure_cache import FigureLRU, filter_key
+from instrumentation import figure_points, profiling_requested, render_panel, set_payload, set_rows, span, start_rerun
 import warnings
 warnings.filterwarnings('ignore')
 
+# The data layer (pandas) and plotly are imported inside the functions that
+# use them, so a cold start paints the page shell before either is loaded.
+# Import cost is tracked by benchmarks/startup.py.
+
 # ============================================================================
 # PAGE CONFIGURATION
 # ============================================================================
 
-st.set_page_config(
-    page_title="SBE Marketing Intelligence",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+def setup_page():
+    """Page config and theme; kept out of import so the exporter can load this module"""
+    st.set_page_config(
+        page_title="SBE Marketing Intelligence",
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
 # ============================================================================
 # CUSTOM CSS - LIGHTER PROFESSIONAL THEME
 # ============================================================================
 
-st.markdown("""
+PAGE_CSS = """
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&family=Roboto+Mono:wght@400;500&display=swap');
     
@@ -175,7 +183,7 @@ st.markdown("""
     #MainMenu {visibility: hidden;}
     footer {visibility: hidden;}
 </style>
-""", unsafe_allow_html=True)
+"""
 
 # ============================================================================
 # COLOR PALETTE - BRIGHTER
@@ -205,81 +213,129 @@ plotly_layout = dict(
 # DATA LOADING - CHANGED TO RELATIVE PATH FOR CLOUD
 # ============================================================================
 
-@st.cache_data
+# "memory" (default) loads every table; "stream" folds the weekly leads into the cube chunk by chunk
+INGEST = os.environ.get("SBE_INGEST", "memory")
+
+def build_data(base_dir=None, ingest=INGEST):
+    """
+    Tables plus the derived lead cube and cost ledger. In-memory ingestion
+    also keeps the lead tables and their filter index for filter_rows;
+    streaming ingestion has neither.
+    """
+    import data_loader
+    from cost_ledger import CostLedger
+    from cube import LeadCube
+    from funnel import FunnelCube
+    from incremental import drop_dir, refresh_data
+    from post_matrix import PostRegionMatrix
+    from time_rollup import TimeRollup
+    base_dir = base_dir or data_loader.BASE_DIR
+    if ingest == "stream":
+        from streaming import load_streaming
+        data, version = load_streaming(base_dir)
+        data['lead_cube'] = LeadCube.from_counts(data.pop('lead_counts'), data['country_attr'])
+    else:
+        from dimensions import DimensionDictionary
+        from filter_index import FilterIndex
+        data, version = data_loader.load_tables(base_dir)
+        # Rebuilt from the encoded tables, so a snapshot load gets the same dictionary
+        data['dimensions'] = DimensionDictionary.from_tables(data, data['dimension_issues'])
+        data['filter_index'] = FilterIndex.build(data)
+        data['lead_cube'] = LeadCube.build(data['master_leads_weekly'], data['country_attr'])
+    data['data_version'] = version
+    data['table_versions'] = data_loader.table_versions(base_dir)
+    data['cost_ledger'] = CostLedger.build(data['channels_combined'], data['lead_cube'])
+    data['time_rollup'] = TimeRollup.build(data['lead_cube'])
+    data['post_matrix'] = PostRegionMatrix.build(data['post_perf_regional'], data['post_perf_totals'])
+    data['funnel'] = FunnelCube.build(data['weekly_channel_summary'], data['channels_combined'], data['country_attr'])
+    # Weekly batches waiting in the drop folder are applied on top of the base files
+    return refresh_data(data, drop_dir(base_dir)) or data
+
+@st.cache_resource(max_entries=2)
+def shared_datastore(version):
+    """One read-only copy of the data per base version, shared by every session"""
+    import data_loader
+    from incremental import LiveStore, drop_dir
+    return LiveStore(build_data, drop_dir(data_loader.BASE_DIR))
+
 def load_data():
-    BASE_DIR = "data"  # Relative path for Streamlit Cloud
-    
+    # Edited base CSVs mean a new version and a full load; new batches in the
+    # drop folder are folded into the current store. Both checks are stat()-only.
     try:
-        channel_gs = pd.read_csv(f'{BASE_DIR}/channel_costs_GS.csv')
-        channel_sm = pd.read_csv(f'{BASE_DIR}/channel_costs_SM.csv')
-        country_attr = pd.read_csv(f'{BASE_DIR}/country_attributes.csv')
-        master_leads = pd.read_csv(f'{BASE_DIR}/master_leads.csv')
-        master_leads_weekly = pd.read_csv(f'{BASE_DIR}/master_leads_weekly.csv')
-        post_perf_totals = pd.read_csv(f'{BASE_DIR}/post_performance_totals_clean.csv')
-        post_perf_regional = pd.read_csv(f'{BASE_DIR}/post_performance_regional_clean.csv')
-        weekly_channel_summary = pd.read_csv(f'{BASE_DIR}/weekly_channel_summary.csv')
-        
-        # Clean data
-        channel_gs['cpl'] = pd.to_numeric(channel_gs['cpl'].replace('#DIV/0!', np.nan), errors='coerce')
-        channel_gs_clean = channel_gs.dropna(subset=['channel']).reset_index(drop=True)
-        channels_combined = pd.concat([channel_gs_clean, channel_sm], ignore_index=True)
-        channels_combined['cpl'] = pd.to_numeric(channels_combined['cpl'], errors='coerce')
-        
-        master_leads_weekly['week_num'] = master_leads_weekly['week_number'].str.extract('(\d+)').astype(int)
-        master_enriched = master_leads_weekly.merge(country_attr, on='country', how='left', suffixes=('', '_country'))
-        
-        return {
-            'channel_gs': channel_gs_clean,
-            'channel_sm': channel_sm,
-            'channels_combined': channels_combined,
-            'country_attr': country_attr,
-            'master_leads': master_leads,
-            'master_leads_weekly': master_leads_weekly,
-            'master_enriched': master_enriched,
-            'post_perf_totals': post_perf_totals,
-            'post_perf_regional': post_perf_regional,
-            'weekly_channel_summary': weekly_channel_summary
-        }
+        import data_loader
+        live = shared_datastore(data_loader.current_version(data_loader.BASE_DIR))
+        store = live.refresh()
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return None
+    show_batch_errors(live.error, store.tables.get('ingested_batches', {}))
+    start_cache_warmer(store)
+    return store
+
+def show_batch_errors(error, batches):
+    """Drop-folder batches that could not be applied; the data shown leaves them out"""
+    if error:
+        st.sidebar.warning(f"⚠️ New batches could not be applied ({error}); showing the last loaded data.")
+    for name, entry in batches.items():
+        if 'error' in entry:
+            st.sidebar.warning(f"⚠️ Skipped batch {name}: {entry['error']}")
+
+# "pandas" (default) aggregates the in-memory LeadCube; "sqlite" pushes filters into SQL
+BACKEND = os.environ.get("SBE_BACKEND", "pandas")
+
+@st.cache_resource(max_entries=2)
+def sqlite_store(version, _data):
+    # Connections are not picklable, so the store lives in the resource cache keyed on data version
+    from sql_backend import SqliteLeadStore
+    if 'master_leads_weekly' not in _data:
+        import data_loader
+        import pandas as pd
+        from incremental import drop_dir, lead_registry, mark_new_leads, read_batch
+        from streaming import first_weeks, iter_lead_chunks, weekly_leads_path
+        path, batch_dir = weekly_leads_path(data_loader.BASE_DIR), drop_dir(data_loader.BASE_DIR)
+        registry = lead_registry(_data)
+        first = first_weeks(path, registry)
+        batches = [read_batch(os.path.join(batch_dir, name), _data['dimensions'], registry)[0]
+                   for name, entry in _data.get('ingested_batches', {}).items() if 'error' not in entry]
+        if batches:
+            batches = [mark_new_leads(pd.concat(batches, ignore_index=True), first[0])[0]]
+        return SqliteLeadStore.build_chunked(itertools.chain(iter_lead_chunks(path, _data['dimensions'], registry,
+                                                                              first=first), batches),
+                                             _data['country_attr'])
+    return SqliteLeadStore.build(_data['master_leads_weekly'], _data['country_attr'])
+
+@st.cache_resource(max_entries=2)
+def lead_scores(version, _data):
+    """
+    (LeadScorer, probability per master_enriched row, the same from the
+    holdout model or None); trained or read once per data version
+    """
+    import data_loader
+    from scoring import load_or_train, model_dir
+    scorer = load_or_train(_data['master_enriched'], version, model_dir(data_loader.BASE_DIR))
+    probabilities = scorer.score(_data['master_enriched'])
+    probabilities.setflags(write=False)
+    holdout = None
+    if scorer.holdout is not None:
+        holdout = scorer.holdout.score(_data['master_enriched'])
+        holdout.setflags(write=False)
+    return scorer, probabilities, holdout
+
+def lead_source(data):
+    """Object the Overview/Performance widgets slice and roll up"""
+    if BACKEND == "sqlite":
+        return sqlite_store(data['table_versions']['master_leads_weekly'], data)
+    return data['lead_cube']
 
 # ============================================================================
 # FILTER DATA FUNCTION
 # ============================================================================
 
-def apply_filters(data, filters):
-    """Apply sidebar filters to the data"""
-    leads = data['master_leads_weekly'].copy()
-    master_enriched = data['master_enriched'].copy()
-    
-    if filters['channel'] != 'All':
-        leads = leads[leads['channel'] == filters['channel']]
-        master_enriched = master_enriched[master_enriched['channel'] == filters['channel']]
-    
-    if filters['country'] != 'All':
-        leads = leads[leads['country'] == filters['country']]
-        master_enriched = master_enriched[master_enriched['country'] == filters['country']]
-    
-    if filters['priority'] != 'All':
-        leads_with_priority = leads.merge(
-            data['country_attr'][['country', 'market_priority']], 
-            on='country', 
-            how='left'
-        )
-        leads = leads_with_priority[leads_with_priority['market_priority'] == filters['priority']]
-        leads = leads.drop(columns=['market_priority'], errors='ignore')
-        master_enriched = master_enriched[master_enriched['market_priority'] == filters['priority']]
-    
-    week_min, week_max = filters['week_range']
-    leads = leads[(leads['week_num'] >= week_min) & (leads['week_num'] <= week_max)]
-    master_enriched = master_enriched[(master_enriched['week_num'] >= week_min) & (master_enriched['week_num'] <= week_max)]
-    
-    filtered_data = data.copy()
-    filtered_data['master_leads_weekly'] = leads
-    filtered_data['master_enriched'] = master_enriched
-    
-    return filtered_data
+def filter_rows(data, filters):
+    """Positions of the lead rows passing the filters, or None for all rows"""
+    if BACKEND == "sqlite":
+        return lead_source(data).select_rows(filters)
+    return data['filter_index'].select(filters)
 
 # ============================================================================
 # HELPER FUNCTIONS
@@ -295,6 +351,15 @@ def create_kpi_card(label, value, delta=None):
     </div>
     """
 
+def show_chart(fig):
+    """st.plotly_chart wrapped in a profiler span (serialization + send)"""
+    with span('plotly_chart', 'chart') as record:
+        if record is not None:
+            set_rows(record, figure_points(fig))
+        st.plotly_chart(fig, use_container_width=True)
+    # Measured after the span closes so the extra serialization is not timed
+    set_payload(record, fig)
+
 def create_insight_card(title, text, icon="💡"):
     return f"""
     <div class="insight-card">
@@ -303,6 +368,14 @@ def create_insight_card(title, text, icon="💡"):
     </div>
     """
 
+def show_partial_periods(trend):
+    """Note periods the week range cuts through; rollups hold whole periods only"""
+    periods = trend['period'][trend['partial']].tolist()
+    if periods:
+        names = ', '.join(str(p) for p in periods)
+        st.caption(f"{names} {'extends' if len(periods) == 1 else 'extend'} past the selected weeks; "
+                   "totals cover the whole period.")
+
 def show_filter_status(filters):
     """Show active filters"""
     active = []
@@ -324,7 +397,21 @@ def show_filter_status(filters):
 # SIDEBAR
 # ============================================================================
 
-def render_sidebar(data):
+def sidebar_options(data):
+    """Filter choices offered by the sidebar (also enumerated by the exporter)"""
+    from time_rollup import GRAINS
+    # Cube cells hold every channel and week present in the leads
+    cells = data['lead_cube'].cells
+    return {
+        'channel': ['All'] + sorted(cells['channel'].dropna().unique().tolist()),
+        'country': ['All'] + sorted(data['country_attr']['country'].dropna().unique().tolist()),
+        'priority': ['All'] + sorted(data['country_attr']['market_priority'].dropna().unique().tolist()),
+        'week_bounds': (int(cells['week_num'].min()), int(cells['week_num'].max())),
+        'grains': GRAINS,
+    }
+
+def render_sidebar_header():
+    """Brand block; drawn before the data loads so a cold start paints at once"""
     st.sidebar.markdown("""
     <div style="text-align: center; padding: 20px 0;">
         <h2 style="background: linear-gradient(90deg, #00d4ff, #a855f7); 
@@ -335,30 +422,28 @@ def render_sidebar(data):
         <p style="color: #94a3b8; font-size: 0.85rem;">Marketing Intelligence Platform</p>
     </div>
     """, unsafe_allow_html=True)
-    
+
+def render_sidebar(data):
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 🧭 Navigation")
     page = st.sidebar.radio(
         "Select Page",
         ["📊 Overview", "📈 Performance", "🤖 Models", "💡 Recommendations"],
-        label_visibility="collapsed"
+        label_visibility="collapsed",
+        key="page"
     )
     
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 🎛️ Filters")
     
-    channels = ['All'] + sorted(data['master_leads_weekly']['channel'].dropna().unique().tolist())
-    selected_channel = st.sidebar.selectbox("📡 Channel", channels)
+    options = sidebar_options(data)
+    selected_channel = st.sidebar.selectbox("📡 Channel", options['channel'])
+    selected_country = st.sidebar.selectbox("🌍 Country", options['country'])
+    selected_priority = st.sidebar.selectbox("⭐ Market Priority", options['priority'])
     
-    countries = ['All'] + sorted(data['country_attr']['country'].dropna().unique().tolist())
-    selected_country = st.sidebar.selectbox("🌍 Country", countries)
-    
-    priorities = ['All'] + sorted(data['country_attr']['market_priority'].dropna().unique().tolist())
-    selected_priority = st.sidebar.selectbox("⭐ Market Priority", priorities)
-    
-    min_week = int(data['master_leads_weekly']['week_num'].min())
-    max_week = int(data['master_leads_weekly']['week_num'].max())
+    min_week, max_week = options['week_bounds']
     week_range = st.sidebar.slider("📅 Week Range", min_week, max_week, (min_week, max_week))
+    grain = st.sidebar.radio("🗓️ Time Grain", options['grains'], horizontal=True, key="grain")
     
     st.sidebar.markdown("---")
     st.sidebar.markdown("""
@@ -368,17 +453,149 @@ def render_sidebar(data):
         <div style="color: #94a3b8; font-size: 0.7rem;">AUB MSBA Capstone</div>
     </div>
     """, unsafe_allow_html=True)
+    render_dimension_issues(data['dimension_issues'])
     
-    return page, {'channel': selected_channel, 'country': selected_country, 'priority': selected_priority, 'week_range': week_range}
+    return page, {'channel': selected_channel, 'country': selected_country, 'priority': selected_priority,
+                  'week_range': week_range, 'grain': grain}
+
+ISSUE_LABELS = {'respelled': "Respelled", 'unknown': "Not in reference table", 'suspect': "Possible misspelling"}
+
+def render_dimension_issues(issues):
+    """What the dimension dictionary found at ingest (see dimensions.py)"""
+    if issues.empty:
+        return
+    with st.sidebar.expander(f"🧹 Data quality ({len(issues)})"):
+        st.dataframe(issues.assign(issue=issues['issue'].map(ISSUE_LABELS)), hide_index=True,
+                     column_config={'canonical': st.column_config.TextColumn("Read as / likely")})
 
 # ============================================================================
 # PAGE 1: OVERVIEW
 # ============================================================================
 
+def compute_overview_kpis(data, filters, cube):
+    """KPI card and channel paradox numbers for a filtered slice"""
+    with span('overview.kpis', 'aggregate', rows=len(cube)):
+        totals = cube.totals()
+        spend = data['cost_ledger'].spend_by_channel(filters)
+        total_budget = sum(spend.values())
+        total_leads = totals['lead_count']
+        qualified_leads = totals['qualified_sum']
+        reachable_leads = totals['reachable_sum']
+        kpis = {
+            'total_budget': total_budget,
+            'total_leads': total_leads,
+            'qualified_leads': qualified_leads,
+            'reachable_leads': reachable_leads,
+            'qualification_rate': qualified_leads / total_leads * 100 if total_leads > 0 else 0,
+            'reachability_rate': reachable_leads / total_leads * 100 if total_leads > 0 else 0,
+            'avg_cpl': total_budget / total_leads if total_leads > 0 else 0,
+            'avg_cpql': total_budget / qualified_leads if qualified_leads > 0 else 0,
+            'weeks_in_filter': cube.nunique('week_num'),
+            'countries_in_filter': cube.nunique('country'),
+        }
+    
+    with span('overview.channel_paradox', 'aggregate', rows=len(cube)):
+        gs_budget = spend.get('Google Search', 0)
+        sm_budget = spend.get('Social Media', 0)
+        by_channel = cube.rollup('channel')
+        gs_leads = by_channel['lead_count'].get('Google Search', 0)
+        sm_leads = by_channel['lead_count'].get('Social Media', 0)
+        gs_qualified = by_channel['qualified_sum'].get('Google Search', 0)
+        sm_qualified = by_channel['qualified_sum'].get('Social Media', 0)
+        
+        kpis['gs_cpl'] = gs_budget / gs_leads if gs_leads > 0 else 0
+        kpis['sm_cpl'] = sm_budget / sm_leads if sm_leads > 0 else 0
+        kpis['gs_cpql'] = gs_budget / gs_qualified if gs_qualified > 0 else 0
+        kpis['sm_cpql'] = sm_budget / sm_qualified if sm_qualified > 0 else 0
+        kpis['efficiency_ratio'] = kpis['sm_cpql'] / kpis['gs_cpql'] if kpis['gs_cpql'] > 0 else 0
+    return kpis
+
+def build_paradox_figure(kpis):
+    import plotly.graph_objects as go
+    gs_cpl, sm_cpl, gs_cpql, sm_cpql = kpis['gs_cpl'], kpis['sm_cpl'], kpis['gs_cpql'], kpis['sm_cpql']
+    with span('overview.channel_paradox', 'figure'):
+        fig = go.Figure()
+        fig.add_trace(go.Bar(name='CPL', x=['Google Search', 'Social Media'], y=[gs_cpl, sm_cpl],
+                            marker_color=[colors['google'], colors['social']], 
+                            text=[f'${gs_cpl:.0f}', f'${sm_cpl:.0f}'], textposition='outside',
+                            textfont=dict(color='#e8e8e8', size=12)))
+        fig.add_trace(go.Bar(name='CPQL', x=['Google Search', 'Social Media'], y=[gs_cpql, sm_cpql],
+                            marker_color=[colors['primary'], colors['secondary']], 
+                            text=[f'${gs_cpql:.0f}', f'${sm_cpql:.0f}'], textposition='outside',
+                            textfont=dict(color='#e8e8e8', size=12)))
+        
+        fig.update_layout(**plotly_layout, barmode='group', height=350,
+                         legend=dict(orientation='h', y=-0.15, font=dict(color='#e8e8e8', size=12)),
+                         yaxis_title='Cost ($)')
+    return fig
+
+GRAIN_ADJECTIVES = {'Week': 'Weekly', 'Month': 'Monthly', 'Quarter': 'Quarterly'}
+GRAIN_AXIS_TITLES = {'Week': 'Week Number', 'Month': 'Month', 'Quarter': 'Quarter'}
+
+def trend_slice(data, filters):
+    """Precomputed lead series at the selected grain; no regrouping of leads"""
+    rollup = data['time_rollup']
+    with span('time_rollup.slice', 'filter', rows=len(rollup.keys)):
+        return rollup.slice(filters, filters['grain'])
+
+def moving_average_label(grain):
+    from time_rollup import MA_WINDOWS
+    return f"{MA_WINDOWS[grain]}-{grain} MA"
+
+def build_weekly_trend_figure(trend, grain):
+    import plotly.graph_objects as go
+    from chart_layer import line_trace
+    with span('overview.weekly_trend', 'figure'):
+        fig = go.Figure()
+        fig.add_trace(line_trace(trend['period'], trend['lead_count'], mode='lines+markers',
+                                name=f'{GRAIN_ADJECTIVES[grain]} Leads', line=dict(color=colors['primary'], width=2),
+                                marker=dict(size=8)))
+        fig.add_trace(line_trace(trend['period'], trend['moving_avg'], mode='lines',
+                                name=moving_average_label(grain), line=dict(color=colors['warning'], width=3, dash='dash')))
+        
+        fig.update_layout(**plotly_layout, height=320,
+                         legend=dict(orientation='h', y=-0.2, font=dict(color='#e8e8e8', size=11)),
+                         xaxis_title=GRAIN_AXIS_TITLES[grain], yaxis_title='Number of Leads')
+    return fig
+
+def build_top_countries_figure(cube):
+    import plotly.graph_objects as go
+    with span('overview.top_countries', 'aggregate', rows=len(cube)):
+        country_data = cube.rollup('country')[['lead_count']].reset_index()
+        country_data.columns = ['Country', 'Leads']
+        country_data = country_data.sort_values('Leads', ascending=False).head(5)
+    
+    with span('overview.top_countries', 'figure'):
+        fig = go.Figure(go.Bar(x=country_data['Leads'], y=country_data['Country'], orientation='h',
+                              marker_color=colors['primary'], 
+                              text=country_data['Leads'], textposition='outside',
+                              textfont=dict(color='#e8e8e8', size=11)))
+        fig.update_layout(**plotly_layout, height=320, yaxis=dict(autorange='reversed'))
+    return fig
+
+def compute_overview(data, filters):
+    """Overview KPIs and figures, or None when no lead matches the filters"""
+    with span('lead_cube.slice', 'filter', rows=len(lead_source(data))):
+        cube = lead_source(data).slice(filters)
+    if cube.is_empty():
+        return None
+    
+    kpis = compute_overview_kpis(data, filters, cube)
+    figures = {
+        'channel_paradox': build_paradox_figure(kpis),
+        'weekly_trend': build_weekly_trend_figure(trend_slice(data, filters), filters['grain']),
+        'top_countries': build_top_countries_figure(cube),
+    }
+    return kpis, figures
+
+def overview_key(data, filters):
+    """Figure cache key of the Overview: filters, grain and versions of the tables read"""
+    versions = data['table_versions']
+    return ("📊 Overview", filter_key(filters), filters['grain'], versions['master_leads_weekly'],
+            versions['country_attr'], versions['channel_gs'], versions['channel_sm'])
+
 def render_overview(data, filters):
-    filtered_data = apply_filters(data, filters)
-    leads = filtered_data['master_leads_weekly']
-    channels = data['channels_combined']
+    overview = figure_cache().get_or_build(overview_key(data, filters), lambda: compute_overview(data, filters))
     
     show_filter_status(filters)
     
@@ -389,44 +606,34 @@ def render_overview(data, filters):
     </p>
     """, unsafe_allow_html=True)
     
-    if len(leads) == 0:
+    if overview is None:
         st.warning("⚠️ No data matches the current filters. Please adjust your selection.")
         return
-    
-    total_budget = channels['budget_usd'].sum()
-    total_leads = len(leads)
-    qualified_leads = leads['is_qualified'].sum()
-    reachable_leads = leads['is_reachable'].sum()
-    qualification_rate = qualified_leads / total_leads * 100 if total_leads > 0 else 0
-    reachability_rate = reachable_leads / total_leads * 100 if total_leads > 0 else 0
-    avg_cpl = total_budget / total_leads if total_leads > 0 else 0
-    avg_cpql = total_budget / qualified_leads if qualified_leads > 0 else 0
+    kpis, figures = overview
     
     st.markdown('<div class="section-header">📊 Key Performance Indicators</div>', unsafe_allow_html=True)
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.markdown(create_kpi_card("Total Investment", f"${total_budget:,.0f}"), unsafe_allow_html=True)
+        st.markdown(create_kpi_card("Total Investment", f"${kpis['total_budget']:,.0f}"), unsafe_allow_html=True)
     with col2:
-        st.markdown(create_kpi_card("Total Leads", f"{total_leads:,}", f"Filtered"), unsafe_allow_html=True)
+        st.markdown(create_kpi_card("Total Leads", f"{kpis['total_leads']:,}", f"Filtered"), unsafe_allow_html=True)
     with col3:
-        st.markdown(create_kpi_card("Qualified Leads", f"{int(qualified_leads)}", f"{qualification_rate:.1f}%"), unsafe_allow_html=True)
+        st.markdown(create_kpi_card("Qualified Leads", f"{int(kpis['qualified_leads'])}", f"{kpis['qualification_rate']:.1f}%"), unsafe_allow_html=True)
     with col4:
-        st.markdown(create_kpi_card("Reachable Leads", f"{int(reachable_leads)}", f"{reachability_rate:.1f}%"), unsafe_allow_html=True)
+        st.markdown(create_kpi_card("Reachable Leads", f"{int(kpis['reachable_leads'])}", f"{kpis['reachability_rate']:.1f}%"), unsafe_allow_html=True)
     
     st.markdown("<br>", unsafe_allow_html=True)
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.markdown(create_kpi_card("Average CPL", f"${avg_cpl:.2f}"), unsafe_allow_html=True)
+        st.markdown(create_kpi_card("Average CPL", f"${kpis['avg_cpl']:.2f}"), unsafe_allow_html=True)
     with col2:
-        st.markdown(create_kpi_card("Average CPQL", f"${avg_cpql:.2f}"), unsafe_allow_html=True)
+        st.markdown(create_kpi_card("Average CPQL", f"${kpis['avg_cpql']:.2f}"), unsafe_allow_html=True)
     with col3:
-        weeks_in_filter = leads['week_num'].nunique()
-        st.markdown(create_kpi_card("Weeks in View", f"{weeks_in_filter}", "of 35 total"), unsafe_allow_html=True)
+        st.markdown(create_kpi_card("Weeks in View", f"{kpis['weeks_in_filter']}", "of 35 total"), unsafe_allow_html=True)
     with col4:
-        countries_in_filter = leads['country'].nunique()
-        st.markdown(create_kpi_card("Countries", f"{countries_in_filter}"), unsafe_allow_html=True)
+        st.markdown(create_kpi_card("Countries", f"{kpis['countries_in_filter']}"), unsafe_allow_html=True)
     
     st.markdown("<br><br>", unsafe_allow_html=True)
     
@@ -435,46 +642,16 @@ def render_overview(data, filters):
     
     with col1:
         st.markdown('<div class="section-header">🔍 Channel Efficiency Paradox</div>', unsafe_allow_html=True)
-        
-        gs_data = channels[channels['channel'] == 'Google_Search']
-        sm_data = channels[channels['channel'] == 'Social_Media']
-        
-        gs_budget = gs_data['budget_usd'].sum()
-        sm_budget = sm_data['budget_usd'].sum()
-        gs_leads = len(leads[leads['channel'] == 'Google Search'])
-        sm_leads = len(leads[leads['channel'] == 'Social Media'])
-        gs_qualified = leads[leads['channel'] == 'Google Search']['is_qualified'].sum()
-        sm_qualified = leads[leads['channel'] == 'Social Media']['is_qualified'].sum()
-        
-        gs_cpl = gs_budget / gs_leads if gs_leads > 0 else 0
-        sm_cpl = sm_budget / sm_leads if sm_leads > 0 else 0
-        gs_cpql = gs_budget / gs_qualified if gs_qualified > 0 else 0
-        sm_cpql = sm_budget / sm_qualified if sm_qualified > 0 else 0
-        
-        fig = go.Figure()
-        fig.add_trace(go.Bar(name='CPL', x=['Google Search', 'Social Media'], y=[gs_cpl, sm_cpl],
-                            marker_color=[colors['google'], colors['social']], 
-                            text=[f'${gs_cpl:.0f}', f'${sm_cpl:.0f}'], textposition='outside',
-                            textfont=dict(color='#e8e8e8', size=12)))
-        fig.add_trace(go.Bar(name='CPQL', x=['Google Search', 'Social Media'], y=[gs_cpql, sm_cpql],
-                            marker_color=[colors['primary'], colors['secondary']], 
-                            text=[f'${gs_cpql:.0f}', f'${sm_cpql:.0f}'], textposition='outside',
-                            textfont=dict(color='#e8e8e8', size=12)))
-        
-        fig.update_layout(**plotly_layout, barmode='group', height=350,
-                         legend=dict(orientation='h', y=-0.15, font=dict(color='#e8e8e8', size=12)),
-                         yaxis_title='Cost ($)')
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(figures['channel_paradox'])
     
     with col2:
         st.markdown('<div class="section-header">💡 Key Insight</div>', unsafe_allow_html=True)
-        efficiency_ratio = sm_cpql / gs_cpql if gs_cpql > 0 else 0
         
         st.markdown(create_insight_card(
             "The Channel Efficiency Paradox",
-            f"<b>Social Media</b> appears cheaper at <b>${sm_cpl:.0f} CPL</b>, but delivers <b>${sm_cpql:.0f} CPQL</b>.<br><br>"
-            f"<b>Google Search</b> seems expensive at <b>${gs_cpl:.0f} CPL</b>, but delivers <b>${gs_cpql:.0f} CPQL</b>.<br><br>"
-            f"<span style='color: #22c55e;'>Google Search is {efficiency_ratio:.1f}x more cost-efficient!</span>",
+            f"<b>Social Media</b> appears cheaper at <b>${kpis['sm_cpl']:.0f} CPL</b>, but delivers <b>${kpis['sm_cpql']:.0f} CPQL</b>.<br><br>"
+            f"<b>Google Search</b> seems expensive at <b>${kpis['gs_cpl']:.0f} CPL</b>, but delivers <b>${kpis['gs_cpql']:.0f} CPQL</b>.<br><br>"
+            f"<span style='color: #22c55e;'>Google Search is {kpis['efficiency_ratio']:.1f}x more cost-efficient!</span>",
             "🎯"
         ), unsafe_allow_html=True)
         
@@ -489,174 +666,478 @@ def render_overview(data, filters):
     col1, col2 = st.columns([1.2, 0.8])
     
     with col1:
-        st.markdown('<div class="section-header">📈 Weekly Lead Volume Trend</div>', unsafe_allow_html=True)
-        
-        weekly_data = leads.groupby('week_num').agg({'lead_id': 'count', 'is_qualified': 'sum'}).reset_index()
-        weekly_data.columns = ['Week', 'Total Leads', 'Qualified']
-        weekly_data['4-Week MA'] = weekly_data['Total Leads'].rolling(window=4).mean()
-        
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=weekly_data['Week'], y=weekly_data['Total Leads'], mode='lines+markers',
-                                name='Weekly Leads', line=dict(color=colors['primary'], width=2),
-                                marker=dict(size=8)))
-        fig.add_trace(go.Scatter(x=weekly_data['Week'], y=weekly_data['4-Week MA'], mode='lines',
-                                name='4-Week MA', line=dict(color=colors['warning'], width=3, dash='dash')))
-        
-        fig.update_layout(**plotly_layout, height=320,
-                         legend=dict(orientation='h', y=-0.2, font=dict(color='#e8e8e8', size=11)),
-                         xaxis_title='Week Number', yaxis_title='Number of Leads')
-        st.plotly_chart(fig, use_container_width=True)
+        st.markdown(f'<div class="section-header">📈 {GRAIN_ADJECTIVES[filters["grain"]]} Lead Volume Trend</div>', unsafe_allow_html=True)
+        show_chart(figures['weekly_trend'])
+        show_partial_periods(trend_slice(data, filters))
     
     with col2:
         st.markdown('<div class="section-header">🌍 Top Countries</div>', unsafe_allow_html=True)
-        
-        country_data = leads.groupby('country').agg({'lead_id': 'count'}).reset_index()
-        country_data.columns = ['Country', 'Leads']
-        country_data = country_data.sort_values('Leads', ascending=False).head(5)
-        
-        fig = go.Figure(go.Bar(x=country_data['Leads'], y=country_data['Country'], orientation='h',
-                              marker_color=colors['primary'], 
-                              text=country_data['Leads'], textposition='outside',
-                              textfont=dict(color='#e8e8e8', size=11)))
-        fig.update_layout(**plotly_layout, height=320, yaxis=dict(autorange='reversed'))
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(figures['top_countries'])
 
 # ============================================================================
 # PAGE 2: PERFORMANCE (SIMPLIFIED)
 # ============================================================================
 
-def render_performance(data, filters):
-    filtered_data = apply_filters(data, filters)
-    leads = filtered_data['master_leads_weekly']
-    
-    st.markdown('<h1 style="text-align: center; margin-bottom: 32px;">📈 Performance Analytics</h1>', unsafe_allow_html=True)
-    show_filter_status(filters)
-    
-    if len(leads) == 0:
-        st.warning("⚠️ No data for current filters.")
-        return
-    
-    tabs = st.tabs(["📡 Channel", "🌍 Geographic", "🎨 Creative", "⏱️ Temporal"])
-    
-    with tabs[0]:
-        # Channel Performance
-        st.markdown("### Channel Performance")
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            channel_dist = leads['channel'].value_counts()
-            fig = go.Figure(data=[go.Pie(labels=channel_dist.index, values=channel_dist.values, hole=0.5,
+PERFORMANCE_TABS = ["📡 Channel", "🌍 Geographic", "🎨 Creative", "⏱️ Temporal", "🔻 Funnel"]
+FIGURE_CACHE_SIZE = 256
+
+@st.cache_resource
+def figure_cache():
+    return FigureLRU(maxsize=FIGURE_CACHE_SIZE)
+
+def performance_key(data, filters, tab):
+    """Figure cache key of a filtered Performance tab: filters, versions of the tables read, and grain if used"""
+    versions = data['table_versions']
+    key = (tab, filter_key(filters), versions['master_leads_weekly'], versions['country_attr'])
+    return key + (filters['grain'],) if tab == "⏱️ Temporal" else key
+
+def build_channel_figures(cube):
+    import plotly.graph_objects as go
+    from chart_layer import cap_categories
+    with span('performance.channel_mix', 'aggregate', rows=len(cube)):
+        channels = cap_categories(cube.rollup('channel')[['qualified_sum', 'lead_count']], 'lead_count')
+        channel_dist = channels['lead_count'].sort_values(ascending=False)
+    with span('performance.channel_mix', 'figure'):
+        mix_fig = go.Figure(data=[go.Pie(labels=channel_dist.index, values=channel_dist.values, hole=0.5,
                                          marker_colors=[colors['google'], colors['social'], colors['warning'], colors['secondary']],
                                          textinfo='label+percent', textfont=dict(color='#e8e8e8', size=11))])
-            fig.update_layout(**plotly_layout, height=350, title="Channel Mix")
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            channel_qual = leads.groupby('channel').agg({'is_qualified': ['sum', 'count']}).reset_index()
-            channel_qual.columns = ['Channel', 'Qualified', 'Total']
-            channel_qual['Rate'] = (channel_qual['Qualified'] / channel_qual['Total'] * 100).round(2)
-            channel_qual = channel_qual.sort_values('Rate', ascending=True)
-            
-            fig = go.Figure(go.Bar(x=channel_qual['Rate'], y=channel_qual['Channel'], orientation='h',
-                                  marker_color=[colors['danger'] if x < 10 else colors['success'] for x in channel_qual['Rate']],
-                                  text=[f'{x:.1f}%' for x in channel_qual['Rate']], textposition='outside',
-                                  textfont=dict(color='#e8e8e8', size=11)))
-            fig.update_layout(**plotly_layout, height=350, title="Qualification Rate by Channel")
-            st.plotly_chart(fig, use_container_width=True)
-    
-    with tabs[1]:
-        # Geographic Performance
-        st.markdown("### Geographic Performance")
-        country_leads = leads.groupby('country').agg({'lead_id': 'count', 'is_qualified': 'sum'}).reset_index()
+        mix_fig.update_layout(**plotly_layout, height=350, title="Channel Mix")
+    
+    with span('performance.channel_qualification', 'aggregate', rows=len(cube)):
+        channel_qual = channels.reset_index()
+        channel_qual.columns = ['Channel', 'Qualified', 'Total']
+        channel_qual['Rate'] = (channel_qual['Qualified'] / channel_qual['Total'] * 100).round(2)
+        channel_qual = channel_qual.sort_values('Rate', ascending=True)
+    
+    with span('performance.channel_qualification', 'figure'):
+        qual_fig = go.Figure(go.Bar(x=channel_qual['Rate'], y=channel_qual['Channel'], orientation='h',
+                                    marker_color=[colors['danger'] if x < 10 else colors['success'] for x in channel_qual['Rate']],
+                                    text=[f'{x:.1f}%' for x in channel_qual['Rate']], textposition='outside',
+                                    textfont=dict(color='#e8e8e8', size=11)))
+        qual_fig.update_layout(**plotly_layout, height=350, title="Qualification Rate by Channel")
+    return mix_fig, qual_fig
+
+def build_geographic_figures(cube):
+    import plotly.graph_objects as go
+    with span('performance.geographic', 'aggregate', rows=len(cube)):
+        country_leads = cube.rollup('country')[['lead_count', 'qualified_sum']].reset_index()
         country_leads.columns = ['Country', 'Leads', 'Qualified']
         country_leads['Rate'] = (country_leads['Qualified'] / country_leads['Leads'] * 100).round(1)
         country_leads = country_leads.sort_values('Leads', ascending=False).head(10)
-        
+    
+    with span('performance.geographic', 'figure'):
         fig = go.Figure(go.Bar(x=country_leads['Leads'], y=country_leads['Country'], orientation='h',
                               marker_color=colors['primary'],
                               text=[f"{l} ({r:.0f}%)" for l, r in zip(country_leads['Leads'], country_leads['Rate'])], 
                               textposition='outside', textfont=dict(color='#e8e8e8', size=10)))
         fig.update_layout(**plotly_layout, height=450, title="Top 10 Countries", yaxis=dict(autorange='reversed'))
-        st.plotly_chart(fig, use_container_width=True)
-    
-    with tabs[2]:
-        # Creative Performance
-        st.markdown("### Creative/Post Performance")
-        post_perf = data['post_perf_totals'].copy()
-        post_perf['roi_score'] = (post_perf['qualified_leads'] / post_perf['ad_spend_usd'] * 1000).round(3)
+    return (fig,)
+
+def build_creative_figures(data, regions=None):
+    """(post ROI ranking, post x region ROI heatmap) over `regions` (None: all), or None if no post ran there"""
+    import numpy as np
+    import plotly.graph_objects as go
+    from chart_layer import MAX_BARS, cap_categories
+    from post_matrix import add_ratios
+    matrix = data['post_matrix']
+    with span('performance.creative', 'aggregate', rows=len(matrix.posts)):
+        # Posts beyond the bar budget are pooled by spend; ROI is recomputed from the pooled totals
+        post_perf = add_ratios(cap_categories(matrix.by_post(regions), 'ad_spend_usd'))
         post_perf = post_perf.dropna(subset=['roi_score']).sort_values('roi_score', ascending=True)
-        
-        fig = go.Figure(go.Bar(x=post_perf['roi_score'], y=post_perf['post_id'], orientation='h',
-                              marker_color=[colors['success'] if x > post_perf['roi_score'].median() else colors['danger'] for x in post_perf['roi_score']],
-                              text=[f'{x:.2f}' for x in post_perf['roi_score']], textposition='outside',
+        if post_perf.empty:
+            return None
+        roi = post_perf['roi_score'].to_numpy()
+        bar_colors = np.where(roi > post_perf['roi_score'].median(), colors['success'], colors['danger'])
+        posts, region_labels, grid = matrix.grid(regions, max_rows=MAX_BARS, max_cols=MAX_BARS)
+    
+    with span('performance.creative', 'figure'):
+        fig = go.Figure(go.Bar(x=post_perf['roi_score'], y=post_perf.index, orientation='h',
+                              marker_color=bar_colors,
+                              text=np.char.mod('%.2f', roi), textposition='outside',
                               textfont=dict(color='#e8e8e8', size=10)))
         fig.update_layout(**plotly_layout, height=400, title="Post ROI Ranking", xaxis_title='ROI Score')
-        st.plotly_chart(fig, use_container_width=True)
     
-    with tabs[3]:
-        # Temporal Performance
-        st.markdown("### Weekly Trends")
-        weekly_data = leads.groupby('week_num').agg({'lead_id': 'count', 'is_qualified': 'mean'}).reset_index()
-        weekly_data.columns = ['Week', 'Leads', 'Qual Rate']
-        weekly_data['Qual Rate'] = (weekly_data['Qual Rate'] * 100).round(2)
-        weekly_data['4-Week MA'] = weekly_data['Leads'].rolling(window=4).mean()
-        
+    with span('performance.creative_heatmap', 'figure', rows=grid['roi_score'].size):
+        details = np.dstack([grid['ad_spend_usd'], grid['leads'], grid['eligible_leads'],
+                             grid['qualified_leads'], grid['cpql']])
+        heatmap = go.Figure(go.Heatmap(
+            z=grid['roi_score'], x=region_labels, y=posts, customdata=details,
+            colorscale='RdYlGn', colorbar=dict(title='ROI'), texttemplate='%{z:.2f}', hoverongaps=False,
+            hovertemplate=('<b>%{y}</b> in %{x}<br>ROI score %{z:.2f}<br>Spend $%{customdata[0]:,.0f}'
+                           '<br>Leads %{customdata[1]:.0f} · eligible %{customdata[2]:.0f} · qualified %{customdata[3]:.0f}'
+                           '<br>CPQL $%{customdata[4]:,.0f}<extra></extra>')))
+        heatmap.update_layout(**plotly_layout, height=max(320, 28 * len(posts) + 120), title="ROI Score by Post and Region",
+                              yaxis=dict(autorange='reversed'))
+    return fig, heatmap
+
+POST_COLUMNS = {'ad_spend_usd': 'Spend ($)', 'leads': 'Leads', 'eligible_leads': 'Eligible Leads',
+                'qualified_leads': 'Qualified Leads', 'roi_score': 'ROI Score', 'cpql': 'CPQL ($)'}
+
+def render_post_drilldown(matrix, regions):
+    st.markdown("#### Post Drill-down")
+    post = st.selectbox("Post", matrix.posts.tolist(), key="creative_post")
+    detail = matrix.post_regions(post, regions)
+    if detail.empty:
+        st.info(f"{post} did not run in the selected regions.")
+        return
+    money, count = st.column_config.NumberColumn(format="$%.2f"), st.column_config.NumberColumn(format="%.0f")
+    st.dataframe(detail.rename(columns=POST_COLUMNS), use_container_width=True,
+                 column_config={'Spend ($)': money, 'CPQL ($)': money, 'Leads': count, 'Eligible Leads': count,
+                                'Qualified Leads': count, 'ROI Score': st.column_config.NumberColumn(format="%.3f")})
+
+def build_temporal_figures(trend, grain):
+    import plotly.graph_objects as go
+    from chart_layer import line_trace
+    with span('performance.temporal', 'figure'):
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=weekly_data['Week'], y=weekly_data['Leads'], mode='lines+markers',
-                                name='Weekly Leads', line=dict(color=colors['primary'], width=2),
+        fig.add_trace(line_trace(trend['period'], trend['lead_count'], mode='lines+markers',
+                                name=f'{GRAIN_ADJECTIVES[grain]} Leads', line=dict(color=colors['primary'], width=2),
                                 fill='tozeroy', fillcolor='rgba(0, 212, 255, 0.1)', marker=dict(size=8)))
-        fig.add_trace(go.Scatter(x=weekly_data['Week'], y=weekly_data['4-Week MA'], mode='lines',
-                                name='4-Week MA', line=dict(color=colors['warning'], width=3, dash='dash')))
-        fig.update_layout(**plotly_layout, height=400, title="Weekly Lead Volume",
+        fig.add_trace(line_trace(trend['period'], trend['moving_avg'], mode='lines',
+                                name=moving_average_label(grain), line=dict(color=colors['warning'], width=3, dash='dash')))
+        fig.update_layout(**plotly_layout, height=400, title=f"{GRAIN_ADJECTIVES[grain]} Lead Volume",
+                         xaxis_title=GRAIN_AXIS_TITLES[grain],
                          legend=dict(orientation='h', y=-0.2, font=dict(color='#e8e8e8')))
-        st.plotly_chart(fig, use_container_width=True)
+    return (fig,)
+
+def build_funnel_figures(funnel):
+    import plotly.graph_objects as go
+    from chart_layer import line_trace
+    from funnel import STAGES
+    with span('performance.funnel', 'figure', rows=len(funnel['weeks'])):
+        stage_fig = go.Figure(go.Funnel(y=STAGES, x=funnel['stage_totals'], textinfo='value+percent previous',
+                                        marker=dict(color=[colors['primary'], colors['secondary'],
+                                                           colors['warning'], colors['success']]),
+                                        textfont=dict(color='#e8e8e8', size=12)))
+        stage_fig.update_layout(**plotly_layout, height=380, title="Lead Funnel")
+
+        rate_fig = go.Figure()
+        for k, color in enumerate([colors['secondary'], colors['warning'], colors['success']]):
+            rate_fig.add_trace(line_trace(funnel['weeks'], funnel['weekly_conversion'][:, k] * 100,
+                                          mode='lines+markers', name=f"{STAGES[k]} → {STAGES[k + 1]}",
+                                          line=dict(color=color, width=2), marker=dict(size=7)))
+        rate_fig.update_layout(**plotly_layout, height=380, title="Weekly Stage Conversion",
+                               xaxis_title='Week', yaxis_title='Conversion (%)',
+                               legend=dict(orientation='h', y=-0.25, font=dict(color='#e8e8e8')))
+    return stage_fig, rate_fig
+
+def compute_funnel(data, filters):
+    """(funnel of the filtered summary counts, its figures), or None when the slice has no summary leads"""
+    with span('funnel.query', 'aggregate', rows=data['funnel'].totals['channel', 'country'].size):
+        funnel = data['funnel'].query(filters)
+    if funnel is None:
+        return None
+    return funnel, build_funnel_figures(funnel)
+
+def render_funnel(data, filters):
+    import numpy as np
+    import pandas as pd
+    from funnel import STAGES
+    versions = data['table_versions']
+    key = ("🔻 Funnel", filter_key(filters), versions['weekly_channel_summary'], versions['channel_gs'],
+           versions['channel_sm'], versions['country_attr'])
+    found = figure_cache().get_or_build(key, lambda: compute_funnel(data, filters))
+    cube = data['funnel']
+    covered = ", ".join(cube.channels[cube.totals['channel', 'all'].sum(axis=(1, 2)) > 0])
+    st.caption(f"From the weekly channel summary ({covered}), weeks aligned to the cost reports' calendar."
+               + (f" {cube.unmatched_rows} rows outside that calendar are left out." if cube.unmatched_rows else ""))
+    if found is None:
+        st.warning("⚠️ The weekly channel summary has no leads for the current filters.")
+        return
+    funnel, figs = found
+
+    # Stage conversion of the latest week with statuses, against the week before it in the report
+    staged = np.flatnonzero(funnel['stages'][:, 0] > 0)
+    if len(staged):
+        latest = staged[-1]
+        for k, col in enumerate(st.columns(len(STAGES) - 1)):
+            rate, change = funnel['weekly_conversion'][latest, k], funnel['wow'][latest, k]
+            with col:
+                st.metric(f"{STAGES[k]} → {STAGES[k + 1]} (week {funnel['weeks'][latest]})",
+                          _format_metric(rate, "{:.0%}"),
+                          None if np.isnan(change) else f"{change * 100:+.0f} pts WoW")
+        col1, col2 = st.columns(2)
+        with col1:
+            show_chart(figs[0])
+        with col2:
+            show_chart(figs[1])
+    else:
+        st.info("ℹ️ The summary has no status breakdown for these leads, so there are no stage rates.")
+
+    weekly = pd.DataFrame(funnel['stages'], columns=STAGES, index=pd.Index(funnel['weeks'], name='Week'))
+    weekly['No Status'] = funnel['unstaged']
+    for k in range(len(STAGES) - 1):
+        weekly[f"{STAGES[k + 1]} Rate"] = funnel['weekly_conversion'][:, k] * 100
+    count, pct = st.column_config.NumberColumn(format="%.0f"), st.column_config.NumberColumn(format="%.0f%%")
+    st.dataframe(weekly, use_container_width=True,
+                 column_config={**{stage: count for stage in STAGES + ['No Status']},
+                                **{f"{stage} Rate": pct for stage in STAGES[1:]}})
+    if funnel['unstaged'].any():
+        st.caption("No Status: leads the summary reports without a status breakdown; counted as leads, "
+                   "outside the stage rates.")
+
+def compute_performance(data, filters):
+    """Figures for the filter-dependent Performance tabs, or None for an empty slice"""
+    cube = lead_source(data).slice(filters)
+    if cube.is_empty():
+        return None
+    return {
+        'channel': build_channel_figures(cube),
+        'geographic': build_geographic_figures(cube),
+        'temporal': build_temporal_figures(trend_slice(data, filters), filters['grain']),
+    }
+
+def render_performance(data, filters):
+    with span('lead_cube.slice', 'filter', rows=len(lead_source(data))):
+        cube = lead_source(data).slice(filters)
+    
+    st.markdown('<h1 style="text-align: center; margin-bottom: 32px;">📈 Performance Analytics</h1>', unsafe_allow_html=True)
+    show_filter_status(filters)
+    
+    if cube.is_empty():
+        st.warning("⚠️ No data for current filters.")
+        return
+    
+    # Only the selected view is computed; figures are memoized per (tab, filters, version of the tables read)
+    tab = st.radio("Performance view", PERFORMANCE_TABS, horizontal=True,
+                   label_visibility="collapsed", key="performance_tab")
+    versions = data['table_versions']
+    
+    if tab == "📡 Channel":
+        st.markdown("### Channel Performance")
+        figs = figure_cache().get_or_build(performance_key(data, filters, tab), lambda: build_channel_figures(cube))
+        col1, col2 = st.columns(2)
+        with col1:
+            show_chart(figs[0])
+        with col2:
+            show_chart(figs[1])
+    
+    elif tab == "🌍 Geographic":
+        st.markdown("### Geographic Performance")
+        figs = figure_cache().get_or_build(performance_key(data, filters, tab),
+                                           lambda: build_geographic_figures(cube))
+        show_chart(figs[0])
+    
+    elif tab == "🎨 Creative":
+        # Post figures ignore the sidebar filters and leads, so one build per region selection and post table versions
+        st.markdown("### Creative/Post Performance")
+        matrix = data['post_matrix']
+        selected = st.multiselect("Regions", matrix.regions.tolist(), default=matrix.regions.tolist(),
+                                  key="creative_regions")
+        if not selected:
+            st.warning("⚠️ Select at least one region.")
+            return
+        regions = None if matrix.is_all(selected) else tuple(sorted(selected))
+        figs = figure_cache().get_or_build((tab, versions['post_perf_totals'], versions['post_perf_regional'], regions),
+                                           lambda: build_creative_figures(data, regions))
+        if figs is None:
+            st.warning("⚠️ No post ran in the selected regions.")
+            return
+        show_chart(figs[0])
+        show_chart(figs[1])
+        render_post_drilldown(matrix, regions)
+    
+    elif tab == "⏱️ Temporal":
+        grain = filters['grain']
+        st.markdown(f"### {GRAIN_ADJECTIVES[grain]} Trends")
+        trend = trend_slice(data, filters)
+        figs = figure_cache().get_or_build(performance_key(data, filters, tab),
+                                           lambda: build_temporal_figures(trend, grain))
+        show_chart(figs[0])
+        show_partial_periods(trend)
+
+    elif tab == "🔻 Funnel":
+        # Summary counts, not lead rows: one query per filter set and version of the tables read
+        st.markdown("### Stage Conversion")
+        render_funnel(data, filters)
 
 # ============================================================================
 # PAGE 3: MODELS
 # ============================================================================
 
+SCORING_SEGMENTS = {
+    "Channel": 'channel',
+    "Region": 'region_group',
+    "Market Priority": 'market_priority',
+    "Platform": 'platform',
+    "Country": 'country',
+    "Post": 'post_id',
+}
+
+def compute_lead_scoring(data, filters, dimension):
+    """
+    (scorer, training-fit metrics on the filtered leads, holdout metrics on
+    the filtered leads in the holdout weeks or None, per-segment scores),
+    or None for an empty slice
+    """
+    import numpy as np
+    from scoring import TARGET, evaluate, segment_scores
+    scorer, probabilities, holdout_probabilities = lead_scores(data['data_version'], data)
+    # Each lead once, on its primary row
+    rows = filter_rows(data, filters)
+    primary = np.flatnonzero(data['master_enriched']['is_primary'].to_numpy())
+    rows = primary if rows is None else np.intersect1d(rows, primary, assume_unique=True)
+    leads = data['master_enriched'].take(rows)
+    if len(leads) == 0:
+        return None
+    with span('models.lead_scoring', 'aggregate', rows=len(leads)):
+        target = leads[TARGET].to_numpy()
+        metrics = evaluate(probabilities[rows], target, scorer.threshold)
+        segments = segment_scores(leads, probabilities[rows], dimension)
+        holdout = None
+        if holdout_probabilities is not None:
+            # Out of time: the holdout weeks scored by the model fit before them
+            recent = leads['week_num'].to_numpy() >= scorer.metrics['holdout']['from_week']
+            if recent.any():
+                holdout = evaluate(holdout_probabilities[rows[recent]], target[recent], scorer.holdout.threshold)
+    return scorer, metrics, holdout, segments
+
+def build_segment_figure(segments, label):
+    import plotly.graph_objects as go
+    segments = segments.head(12)
+    names = segments.index.astype(str)
+    with span('models.lead_scoring', 'figure'):
+        fig = go.Figure()
+        fig.add_trace(go.Bar(name='Predicted', x=names, y=segments['probability'] * 100,
+                            marker_color=colors['primary'],
+                            text=[f'{p:.0%}' for p in segments['probability']], textposition='outside',
+                            textfont=dict(color='#e8e8e8', size=11)))
+        fig.add_trace(go.Bar(name='Actual', x=names, y=segments['actual'] * 100,
+                            marker_color=colors['secondary']))
+        fig.update_layout(**plotly_layout, barmode='group', height=380,
+                         legend=dict(orientation='h', y=-0.25, font=dict(color='#e8e8e8', size=12)),
+                         xaxis_title=label, yaxis_title='Qualification Probability (%)')
+    return fig
+
+def _format_metric(value, pattern):
+    return "n/a" if value != value else pattern.format(value)
+
+def render_lead_scoring(data, filters):
+    st.markdown("### Lead Qualification Model")
+    if 'master_enriched' not in data:
+        st.info("Lead scoring needs the row-per-lead tables, which streaming ingestion (SBE_INGEST=stream) does not load.")
+        return
+    
+    show_filter_status(filters)
+    label = st.radio("Segment by", list(SCORING_SEGMENTS), horizontal=True, key="scoring_segment")
+    scoring = compute_lead_scoring(data, filters, SCORING_SEGMENTS[label])
+    if scoring is None:
+        st.warning("⚠️ No data for current filters.")
+        return
+    scorer, metrics, holdout, segments = scoring
+    overall = scorer.metrics.get('holdout')
+    
+    st.markdown("**Model:** Logistic regression on channel, country, region, priority, reachability, platform and post")
+    # Headline: out-of-time metrics on the filtered leads in the holdout weeks, the holdout
+    # over all leads next to them. Without holdout leads in view, the training fit of the view
+    shown = holdout or metrics
+    caption = "holdout" if holdout else "training fit"
+    reference = overall if holdout else None
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric(f"ROC-AUC ({caption})", _format_metric(shown['roc_auc'], "{:.2f}"),
+                  f"all leads {_format_metric(reference['roc_auc'], '{:.2f}')}" if reference else None,
+                  delta_color="off")
+    with col2:
+        st.metric(f"F1-Score ({caption})", _format_metric(shown['f1'], "{:.2f}"),
+                  f"all leads {reference['f1']:.2f}" if reference else None, delta_color="off")
+    with col3:
+        st.metric(f"Recall ({caption})", f"{shown['recall']:.0%}", f"precision {shown['precision']:.0%}",
+                  delta_color="off")
+    with col4:
+        st.metric("Leads Scored", f"{metrics['leads']:,}", f"{metrics['qualified_rate']:.1%} qualified", delta_color="off")
+    
+    top_feature = scorer.importance()[0][0].replace('_', ' ')
+    text = f"The model weighs <b>{top_feature}</b> most heavily."
+    if segments.empty:
+        st.info(f"No {label.lower()} is recorded for the leads in this view.")
+    else:
+        show_chart(build_segment_figure(segments, label))
+        text += (f" In the current view, <b>{segments.index[0]}</b> leads have the highest qualification "
+                 f"probability ({segments['probability'].iloc[0]:.0%}).")
+    if holdout:
+        text += (f" Holdout metrics score this view's leads from weeks {overall['from_week']}+ with a model trained "
+                 f"on earlier weeks; \"all leads\" is the same over every lead in those weeks "
+                 f"({overall['leads']:,}). On the whole view the training fit is ROC-AUC "
+                 f"{_format_metric(metrics['roc_auc'], '{:.2f}')}, F1 {metrics['f1']:.2f}.")
+    elif overall:
+        text += (f" This view has no leads in the holdout weeks ({overall['from_week']}+), so the metrics are the "
+                 f"training fit: the view scored by the model it was trained on.")
+    st.markdown(create_insight_card("Model Insights", text, "🎯"), unsafe_allow_html=True)
+
+@st.cache_resource(max_entries=2)
+def lead_forecast(version, _cube):
+    """Forecasts for every (channel, country) series; fitted once per data version"""
+    from forecasting import LeadForecast
+    return LeadForecast.build(_cube)
+
+def compute_forecast(data, filters):
+    """Forecast, interval and backtest for the filtered series, or None when none match"""
+    forecast = lead_forecast(data['data_version'], data['lead_cube'])
+    with span('models.forecast', 'aggregate', rows=len(forecast.keys)):
+        return forecast.slice(filters)
+
+def build_forecast_figure(fc):
+    import plotly.graph_objects as go
+    from chart_layer import line_trace
+    with span('models.forecast', 'figure'):
+        fig = go.Figure()
+        fig.add_trace(line_trace(fc['weeks'], fc['history'], mode='lines+markers',
+                                name='Weekly Leads', line=dict(color=colors['primary'], width=2),
+                                marker=dict(size=6)))
+        fig.add_trace(go.Scatter(x=fc['backtest_weeks'], y=fc['backtest'], mode='lines',
+                                name='Backtest', line=dict(color=colors['neutral'], width=2, dash='dot')))
+        band_weeks = list(fc['future_weeks']) + list(fc['future_weeks'][::-1])
+        fig.add_trace(go.Scatter(x=band_weeks, y=list(fc['upper']) + list(fc['lower'][::-1]),
+                                fill='toself', fillcolor='rgba(245, 158, 11, 0.2)', line=dict(width=0),
+                                hoverinfo='skip', name='80% Interval'))
+        fig.add_trace(go.Scatter(x=fc['future_weeks'], y=fc['mean'], mode='lines+markers',
+                                name='Forecast', line=dict(color=colors['warning'], width=3, dash='dash')))
+        fig.update_layout(**plotly_layout, height=400,
+                         legend=dict(orientation='h', y=-0.2, font=dict(color='#e8e8e8', size=11)),
+                         xaxis_title='Week Number', yaxis_title='Number of Leads')
+    return fig
+
+def render_forecasting(data, filters):
+    st.markdown("### Lead Volume Forecasting")
+    fc = compute_forecast(data, filters)
+    if fc is None:
+        st.warning("⚠️ No data for current filters.")
+        return
+    st.markdown("**Model:** Damped-trend exponential smoothing per channel × country series")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Backtest MAPE", "n/a" if fc['mape'] != fc['mape'] else f"{fc['mape']:.1f}%",
+                  None if fc['naive_mape'] != fc['naive_mape'] else f"4-week average {fc['naive_mape']:.1f}%",
+                  delta_color="off")
+    with col2:
+        st.metric(f"{len(fc['mean'])}-Week Forecast", f"{fc['mean'].sum():.0f} leads",
+                  f"~{fc['mean'].mean():.1f}/week", delta_color="off")
+    with col3:
+        st.metric("Series Modelled", f"{fc['series']}",
+                  f"next week {fc['lower'][0]:.0f}–{fc['upper'][0]:.0f}", delta_color="off")
+    
+    show_chart(build_forecast_figure(fc))
+    
+    st.markdown(create_insight_card(
+        "Forecast Note",
+        f"Backtest: the model is refitted without the last {len(fc['backtest'])} weeks and scored on them. "
+        f"With only {len(data['lead_cube'].cells['week_num'].unique())} weeks of history, use the forecast for "
+        "<b>directional planning</b>, not precise predictions.",
+        "📈"
+    ), unsafe_allow_html=True)
+
 def render_models(data, filters):
     st.markdown('<h1 style="text-align: center; margin-bottom: 32px;">🤖 Predictive Models</h1>', unsafe_allow_html=True)
     
     tabs = st.tabs(["🎯 Lead Qualification", "📈 Forecasting"])
     
     with tabs[0]:
-        st.markdown("### Lead Qualification Model")
-        st.markdown("**Best Model:** Random Forest + ADASYN")
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("F1-Score", "0.40", "+6% vs baseline")
-        with col2:
-            st.metric("ROC-AUC", "0.76", "Good discrimination")
-        with col3:
-            st.metric("Recall", "57%", "Catches majority")
-        
-        st.markdown(create_insight_card(
-            "Model Insights",
-            "The model identifies <b>is_reachable</b> as the top predictor. "
-            "Leads from <b>Google Search</b> and <b>Lebanon</b> have higher qualification probability.",
-            "🎯"
-        ), unsafe_allow_html=True)
+        render_lead_scoring(data, filters)
     
     with tabs[1]:
-        st.markdown("### Lead Volume Forecasting")
-        st.markdown("**Best Model:** Prophet + Regressors")
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("MAPE", "54.2%", "Fair accuracy")
-        with col2:
-            st.metric("Improvement", "53.8%", "vs baseline")
-        with col3:
-            st.metric("8-Week Forecast", "235 leads", "~29/week")
-        
-        st.markdown(create_insight_card(
-            "Forecast Note",
-            "Limited by 35 weeks of data. Accuracy will improve with more historical data. "
-            "Use for <b>directional planning</b>, not precise predictions.",
-            "📈"
-        ), unsafe_allow_html=True)
+        render_forecasting(data, filters)
 
 # ============================================================================
 # PAGE 4: RECOMMENDATIONS
@@ -689,34 +1170,107 @@ def render_recommendations(data, filters):
             "<b>Rationale:</b> Current 11.3% rate needs improvement<br><br>"
             "<b>Impact:</b> Better ROI on marketing spend", "📊"), unsafe_allow_html=True)
 
+# ============================================================================
+# CACHE WARMING
+# ============================================================================
+
+def warm_entries(data, filters):
+    """(figure cache key, builder) for the Overview and filtered Performance tabs under `filters`"""
+    cube = lead_source(data).slice(filters)
+    if cube.is_empty():
+        return []
+    return [
+        (overview_key(data, filters), lambda: compute_overview(data, filters)),
+        (performance_key(data, filters, "📡 Channel"), lambda: build_channel_figures(cube)),
+        (performance_key(data, filters, "🌍 Geographic"), lambda: build_geographic_figures(cube)),
+        (performance_key(data, filters, "⏱️ Temporal"),
+         lambda: build_temporal_figures(trend_slice(data, filters), filters['grain'])),
+    ]
+
+def start_cache_warmer(store):
+    """Warm the figure cache in the background once per loaded data version (SBE_WARM=0 disables)"""
+    import cache_warmer
+    if not cache_warmer.ENABLED:
+        return
+    data = store.tables
+    cache_warmer.warm(store.version, figure_cache(),
+                      lambda: cache_warmer.warm_plan(sidebar_options(data), cache_warmer.ranked_usage()),
+                      lambda filters: warm_entries(data, filters))
+
+def record_selection(filters):
+    """Log the sidebar selection when it changes; the cache warmer ranks combinations by it"""
+    from cache_warmer import record_usage
+    selection = (filter_key(filters), filters['grain'])
+    if st.session_state.get('_logged_selection') != selection:
+        st.session_state['_logged_selection'] = selection
+        record_usage(filters)
+
 # ============================================================================
 # MAIN APPLICATION
 # ============================================================================
 
 def main():
-    data = load_data()
-    
-    if data is None:
-        st.error("❌ Failed to load data. Please check that data files exist in the 'data' folder.")
-        st.info("Required files: channel_costs_GS.csv, channel_costs_SM.csv, country_attributes.csv, master_leads.csv, master_leads_weekly.csv, post_performance_totals_clean.csv, post_performance_regional_clean.csv, weekly_channel_summary.csv")
-        return
-    
-    page, filters = render_sidebar(data)
+    # The cache warmer holds off while any session's rerun is in progress
+    from cache_warmer import interactive
+    with interactive():
+        render_app()
+
+def render_app():
+    setup_page()
+    profiler = start_rerun(profiling_requested(st.query_params), _session_id())
     
-    if page == "📊 Overview":
-        render_overview(data, filters)
-    elif page == "📈 Performance":
-        render_performance(data, filters)
-    elif page == "🤖 Models":
-        render_models(data, filters)
-    elif page == "💡 Recommendations":
-        render_recommendations(data, filters)
+    # tracemalloc is process-wide: stop it on every exit, including the early return,
+    # page exceptions and the Rerun/StopException of a widget change mid-rerun
+    try:
+        render_sidebar_header()
+    
+        with span('load_data', 'load') as record, st.spinner("Loading data..."):
+            store = load_data()
+            set_rows(record, store.tables['lead_cube'].totals()['lead_count'] if store is not None else 0)
+    
+        if store is None:
+            st.error("❌ Failed to load data. Please check that data files exist in the 'data' folder.")
+            st.info("Required files: channel_costs_GS.csv, channel_costs_SM.csv, country_attributes.csv, master_leads.csv, master_leads_weekly.csv, master_leads_monthly.csv, post_performance_totals_clean.csv, post_performance_regional_clean.csv, weekly_channel_summary.csv")
+            return
+    
+        data = store.tables
+        page, filters = render_sidebar(data)
+        record_selection(filters)
+    
+        if page == "📊 Overview":
+            render_overview(data, filters)
+        elif page == "📈 Performance":
+            render_performance(data, filters)
+        elif page == "🤖 Models":
+            render_models(data, filters)
+        elif page == "💡 Recommendations":
+            render_recommendations(data, filters)
+    
+        st.markdown("""
+        <div style="text-align: center; padding: 24px; color: #94a3b8; font-size: 0.85rem; border-top: 1px solid #3d5a80; margin-top: 48px;">
+            SBE Marketing Intelligence Platform • AUB MSBA Capstone Project • December 2025
+        </div>
+        """, unsafe_allow_html=True)
     
-    st.markdown("""
-    <div style="text-align: center; padding: 24px; color: #94a3b8; font-size: 0.85rem; border-top: 1px solid #3d5a80; margin-top: 48px;">
-        SBE Marketing Intelligence Platform • AUB MSBA Capstone Project • December 2025
-    </div>
-    """, unsafe_allow_html=True)
+        from datastore import SharedDataMutated
+        try:
+            store.verify()
+        except SharedDataMutated:
+            shared_datastore.clear()  # don't keep serving the modified copy to other sessions
+            raise
+    
+        if profiler is not None:
+            render_panel(st, profiler, profiler.finish(page))
+    finally:
+        if profiler is not None:
+            profiler.stop()
+
+def _session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        from exporter import export_main
+        sys.exit(export_main(sys.argv[2:]))
     main()
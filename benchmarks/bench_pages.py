@@ -0,0 +1,262 @@
+"""
+Headless page benchmark for the SBE Marketing Intelligence Platform.
+
+Builds synthetic copies of the data directory with master_leads_weekly.csv
+and weekly_channel_summary.csv scaled 1x/10x/100x/1000x, then drives app.py
+through Streamlit's AppTest in one subprocess per scale. For every page and
+filter combination it records per-rerun latency and peak traced memory,
+alongside cold (CSV) and warm (snapshot) load times and per-file read
+times from the concurrent loader.
+
+Usage:
+    python benchmarks/bench_pages.py
+    python benchmarks/bench_pages.py --scales 1 10 --repeats 3 --output bench.json
+    python benchmarks/bench_pages.py --baseline old.json   # flag regressions
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import pandas as pd  # noqa: E402
+
+from data_loader import SNAPSHOT_DIRNAME, SOURCE_FILES, clean_tables, load_tables, read_sources  # noqa: E402
+
+PAGES = ["📊 Overview", "📈 Performance", "🤖 Models", "💡 Recommendations"]
+SCALED_FILES = ['master_leads_weekly.csv', 'weekly_channel_summary.csv']
+
+# Bump when the copies change shape so stale scaled directories are rebuilt
+SCALED_FORMAT = 2
+DEFAULT_SCALES = [1, 10, 100, 1000]
+
+# ============================================================================
+# SYNTHETIC DATA
+# ============================================================================
+
+def build_scaled_dir(scale, work_dir, source_dir=os.path.join(REPO_ROOT, 'data')):
+    """
+    Copy the data directory with the lead tables repeated `scale` times.
+    Every copy after the first gets its number appended to full_name, so
+    the copies are new people rather than duplicates of the same leads.
+    """
+    target = os.path.join(work_dir, f'scale_{scale}')
+    marker = os.path.join(target, f'.complete-{SCALED_FORMAT}')
+    # Rebuild when SOURCE_FILES has grown since the copy was made
+    if os.path.exists(marker) and all(os.path.exists(os.path.join(target, f)) for f in SOURCE_FILES.values()):
+        return target
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target)
+    for filename in SOURCE_FILES.values():
+        src = os.path.join(source_dir, filename)
+        if filename not in SCALED_FILES:
+            shutil.copy2(src, target)
+            continue
+        base = pd.read_csv(src)
+        copies = []
+        for i in range(scale):
+            chunk = base.copy()
+            if 'lead_id' in chunk:
+                chunk['lead_id'] = chunk['lead_id'] + f'_{i}'
+            if 'full_name' in chunk and i:
+                chunk['full_name'] = chunk['full_name'] + f' {i}'
+            copies.append(chunk)
+        pd.concat(copies, ignore_index=True).to_csv(os.path.join(target, filename), index=False)
+
+    open(marker, 'w').close()
+    return target
+
+
+def filter_matrix(min_week, max_week):
+    """Named filter settings covering each sidebar control"""
+    late = (max(min_week, max_week - 7), max_week)
+    full = (min_week, max_week)
+    return {
+        'all': ('All', 'All', 'All', full),
+        'channel': ('Google Search', 'All', 'All', full),
+        'country': ('All', 'Lebanon', 'All', full),
+        'priority': ('All', 'All', 'Primary', full),
+        'weeks': ('All', 'All', 'All', late),
+        'combined': ('Social Media', 'All', 'Primary', late),
+    }
+
+# ============================================================================
+# WORKER (one process per scale)
+# ============================================================================
+
+def _set_filters(at, page, combo):
+    channel, country, priority, week_range = combo
+    at.sidebar.radio[0].set_value(page)
+    at.sidebar.selectbox[0].set_value(channel)
+    at.sidebar.selectbox[1].set_value(country)
+    at.sidebar.selectbox[2].set_value(priority)
+    at.sidebar.slider[0].set_value(week_range)
+
+
+def _timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return elapsed
+
+
+def run_worker(data_dir, repeats, measure_memory):
+    # SBE_DATA_DIR is set by the driver so data_loader.BASE_DIR already points here
+    logging.disable(logging.WARNING)
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    clean_tables(read_sources(data_dir))
+    load_serial_s = time.perf_counter() - start
+    shutil.rmtree(os.path.join(data_dir, SNAPSHOT_DIRNAME), ignore_errors=True)
+    load_steps = {}
+    start = time.perf_counter()
+    tables, _ = load_tables(data_dir, timings=load_steps)
+    load_csv_s = time.perf_counter() - start
+    start = time.perf_counter()
+    load_tables(data_dir)
+    load_snapshot_s = time.perf_counter() - start
+    n_leads = len(tables['master_leads_weekly'])
+    min_week = int(tables['master_leads_weekly']['week_num'].min())
+    max_week = int(tables['master_leads_weekly']['week_num'].max())
+    del tables
+
+    at = AppTest.from_file(os.path.join(REPO_ROOT, 'app.py'), default_timeout=600)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    first_run_s = _timed_run(at)
+
+    results = []
+    for page in PAGES:
+        for name, combo in filter_matrix(min_week, max_week).items():
+            _set_filters(at, page, combo)
+            _timed_run(at)  # Settle widget state before timing
+            samples = [_timed_run(at) for _ in range(repeats)]
+
+            peak_mb = None
+            if measure_memory:
+                tracemalloc.start()
+                _timed_run(at)
+                peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+
+            results.append({
+                'page': page,
+                'filters': name,
+                'rerun_median_s': statistics.median(samples),
+                'rerun_min_s': min(samples),
+                'rerun_max_s': max(samples),
+                'peak_traced_mb': peak_mb,
+            })
+
+    return {
+        'n_leads': n_leads,
+        'load_serial_s': load_serial_s,
+        'load_csv_s': load_csv_s,
+        'load_steps_s': load_steps,
+        'load_snapshot_s': load_snapshot_s,
+        'first_run_s': first_run_s,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'reruns': results,
+    }
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print reruns that got slower than `threshold` x the baseline"""
+    old = {
+        (s['scale'], r['page'], r['filters']): r['rerun_median_s']
+        for s in baseline['scales'] for r in s['reruns']
+    }
+    regressions = 0
+    for s in results['scales']:
+        for r in s['reruns']:
+            before = old.get((s['scale'], r['page'], r['filters']))
+            if before and r['rerun_median_s'] > before * threshold:
+                regressions += 1
+                print(f"REGRESSION {s['scale']}x {r['page']} [{r['filters']}]: "
+                      f"{before * 1000:.1f}ms -> {r['rerun_median_s'] * 1000:.1f}ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    parser.add_argument('--output', default='bench_pages.json')
+    parser.add_argument('--baseline', help='previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio reported as a regression')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        json.dump(run_worker(args.worker, args.repeats, not args.no_memory), sys.stdout)
+        return 0
+
+    results = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'scales': [],
+    }
+    for scale in args.scales:
+        data_dir = build_scaled_dir(scale, args.work_dir)
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker', data_dir, '--repeats', str(args.repeats)]
+        if args.no_memory:
+            cmd.append('--no-memory')
+        env = dict(os.environ, SBE_DATA_DIR=data_dir)
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=REPO_ROOT, env=env).stdout
+        scale_result = json.loads(out)
+        scale_result['scale'] = scale
+        results['scales'].append(scale_result)
+
+        print(f"{scale}x ({scale_result['n_leads']:,} leads): load csv {scale_result['load_csv_s']:.2f}s, "
+              f"snapshot {scale_result['load_snapshot_s']:.2f}s, first run {scale_result['first_run_s']:.2f}s, "
+              f"max RSS {scale_result['max_rss_mb']:.0f}MB")
+        steps = sorted(scale_result['load_steps_s'].items(), key=lambda item: -item[1])
+        print(f"    concurrent csv load {scale_result['load_csv_s']:.2f}s vs serial {scale_result['load_serial_s']:.2f}s; "
+              f"slowest steps: " + ", ".join(f"{name} {sec * 1000:.0f}ms" for name, sec in steps[:4]))
+        for r in scale_result['reruns']:
+            mem = f", peak {r['peak_traced_mb']:.1f}MB" if r['peak_traced_mb'] is not None else ''
+            print(f"    {r['page']:<22} {r['filters']:<9} {r['rerun_median_s'] * 1000:8.1f}ms{mem}")
+
+    with open(args.output, 'w') as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            return 1 if compare(results, json.load(fh), args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
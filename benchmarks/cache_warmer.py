@@ -0,0 +1,118 @@
+"""
+Cache warmer: first-visit latency cold vs warmed, and the warmer's cost.
+
+Per scale, builds the data like the app and the warming plan (all filters
+at All, single-dimension selections, then combinations from the usage log
+given with --usage-log). Times the first visit of each planned combination
+(Overview plus the Channel, Geographic and Temporal tabs) against an empty
+figure cache, then runs the warmer to completion at full CPU share and
+times the same visits again. Finally measures interactive reruns
+(uncached Overview builds of planned selections, with think time between
+them) alone and with a warmer at SBE_WARM_CPU_SHARE filling a fresh cache
+alongside, to show what warming costs sessions using the app meanwhile.
+
+Usage:
+    python benchmarks/cache_warmer.py
+    python benchmarks/cache_warmer.py --scales 1 100 --seconds 10 --usage-log usage_log.jsonl
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+
+from bench_pages import build_scaled_dir  # noqa: E402
+from cache_warmer import CPU_SHARE, CacheWarmer, _rss_mb, interactive, ranked_usage, warm_plan  # noqa: E402
+from figure_cache import FigureLRU  # noqa: E402
+
+
+def _visits(app, data, plan, cache):
+    """First-visit ms per combination: every warmable result looked up in `cache`"""
+    times = []
+    for filters in plan:
+        start = time.perf_counter()
+        for key, builder in app.warm_entries(data, filters):
+            cache.get_or_build(key, builder)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.array(times)
+
+
+def _interactive(app, data, plan, seconds, think_ms):
+    """Rerun ms of uncached Overview builds for planned selections, `think_ms` apart on average"""
+    rng = random.Random(0)
+    times, deadline = [], time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        filters = rng.choice(plan)
+        start = time.perf_counter()
+        with interactive():
+            app.compute_overview(data, filters)
+        times.append((time.perf_counter() - start) * 1000)
+        time.sleep(rng.expovariate(1000 / think_ms))
+    return np.array(times)
+
+
+def _pct(times):
+    return f"{np.percentile(times, 50):>8.1f}{np.percentile(times, 95):>8.1f}{times.max():>8.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--usage-log', default='', help='usage log to rank combinations by (default: none)')
+    parser.add_argument('--seconds', type=float, default=10.0, help='duration of each interactive run')
+    parser.add_argument('--think-ms', type=float, default=200.0)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    import app
+
+    usage = ranked_usage(args.usage_log) if args.usage_log else []
+    for scale in args.scales:
+        data = app.build_data(build_scaled_dir(scale, args.work_dir))
+        options = app.sidebar_options(data)
+        plan = warm_plan(options, usage)
+        print(f"scale {scale}: {len(plan)} combinations planned ({len(usage)} from the usage log)")
+
+        cold = _visits(app, data, plan, FigureLRU(maxsize=4 * len(plan)))
+        cache = FigureLRU(maxsize=4 * len(plan))
+        rss = _rss_mb()
+        warmer = CacheWarmer(scale, cache, lambda: plan, lambda filters: app.warm_entries(data, filters),
+                             cpu_share=1.0, max_entries=4 * len(plan))
+        start = time.perf_counter()
+        warmer.start()
+        warmer.join()
+        warm_s = time.perf_counter() - start
+        rss_delta = _rss_mb() - rss if rss is not None else float('nan')
+        warmed = _visits(app, data, plan, cache)
+        print(f"  warmer: {warmer.built} entries, {warmer.combinations} combinations in {warm_s:.2f}s "
+              f"({warmer.stopped}), RSS +{rss_delta:.1f} MB")
+        print(f"  {'first visit ms':<22}{'p50':>8}{'p95':>8}{'max':>8}")
+        print(f"  {'cold':<22}{_pct(cold)}")
+        print(f"  {'warmed':<22}{_pct(warmed)}")
+
+        alone = _interactive(app, data, plan, args.seconds, args.think_ms)
+        warmer = CacheWarmer(f'{scale}-bg', FigureLRU(maxsize=4 * len(plan)), lambda: plan,
+                             lambda filters: app.warm_entries(data, filters), max_entries=4 * len(plan))
+        warmer.start()
+        shared = _interactive(app, data, plan, args.seconds, args.think_ms)
+        warmer.cancel()
+        warmer.join()
+        busy = warmer.busy_s / args.seconds
+        print(f"  {'interactive rerun ms':<22}{'p50':>8}{'p95':>8}{'max':>8}")
+        print(f"  {'alone':<22}{_pct(alone)}")
+        print(f"  {'while warming':<22}{_pct(shared)}   warmer busy {busy:.0%} of the run "
+              f"(share {CPU_SHARE:.0%}), {warmer.built} entries built\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
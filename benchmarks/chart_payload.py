@@ -0,0 +1,88 @@
+"""
+Chart layer: payload size and serialization cost with and without budgets.
+
+For synthetic lead series of increasing length (weekly seasonality, trend
+and noise), builds the trend trace as a plain go.Scatter and through
+chart_layer.line_trace, and reports JSON payload size, figure-to-JSON time
+and LTTB time, plus how much of the raw series' y range the decimated
+line keeps, next to plain every-k-th-point sampling to the same count.
+Then does the same for category bars with and without cap_categories.
+
+Browser render time cannot be measured headlessly; payload size is the
+server-side proxy, and is also logged per chart by the profiler
+(SBE_PROFILE=1, 'payload KB' column).
+
+Usage:
+    python benchmarks/chart_payload.py
+    python benchmarks/chart_payload.py --points 1000 100000 --categories 50 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import plotly.graph_objects as go  # noqa: E402
+
+from chart_layer import MAX_BARS, MAX_POINTS, cap_categories, line_trace, lttb  # noqa: E402
+
+
+def synthetic_series(n, rng):
+    t = np.arange(n)
+    return np.maximum(40 + 0.001 * t + 15 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 6, n), 0).round()
+
+
+def _serialize(fig):
+    start = time.perf_counter()
+    payload = fig.to_json()
+    return len(payload) / 1024, (time.perf_counter() - start) * 1000
+
+
+def _range_kept(y, keep):
+    """Share of the raw y range (peak to trough) still drawn after decimation"""
+    return np.ptp(y[keep]) / (np.ptp(y) or 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--categories', type=int, nargs='+', default=[10, 100, 1_000, 10_000])
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    print(f"max points {MAX_POINTS}, max bars {MAX_BARS}\n")
+    print(f"{'points':>10}{'raw KB':>10}{'raw ms':>9}{'sent':>7}{'trace':>11}{'KB':>9}{'lttb ms':>9}{'json ms':>9}"
+          f"{'range kept':>12}{'stride kept':>13}")
+    for n in args.points:
+        x, y = np.arange(n), synthetic_series(n, rng)
+        raw_kb, raw_ms = _serialize(go.Figure(go.Scatter(x=x, y=y, mode='lines+markers')))
+        start = time.perf_counter()
+        trace = line_trace(x, y, mode='lines+markers')
+        lttb_ms = (time.perf_counter() - start) * 1000
+        kb, json_ms = _serialize(go.Figure(trace))
+        keep = lttb(x, y, MAX_POINTS)
+        stride = np.linspace(0, n - 1, len(keep)).astype(int)
+        print(f"{n:>10,}{raw_kb:>10.1f}{raw_ms:>9.1f}{len(trace.x):>7}{trace.type:>11}{kb:>9.1f}{lttb_ms:>9.1f}"
+              f"{json_ms:>9.1f}{_range_kept(y, keep):>12.1%}{_range_kept(y, stride):>13.1%}")
+
+    print(f"\n{'bars':>10}{'raw KB':>10}{'raw ms':>9}{'sent':>7}{'KB':>9}{'cap ms':>9}{'json ms':>9}")
+    for n in args.categories:
+        frame = pd.DataFrame({'leads': rng.zipf(1.6, n).astype(float)},
+                             index=pd.Index([f"Post{i}" for i in range(n)], name='post_id'))
+        raw_kb, raw_ms = _serialize(go.Figure(go.Bar(x=frame['leads'], y=frame.index, orientation='h')))
+        start = time.perf_counter()
+        capped = cap_categories(frame, 'leads')
+        cap_ms = (time.perf_counter() - start) * 1000
+        kb, json_ms = _serialize(go.Figure(go.Bar(x=capped['leads'], y=capped.index, orientation='h')))
+        assert capped['leads'].sum() == frame['leads'].sum()
+        print(f"{n:>10,}{raw_kb:>10.1f}{raw_ms:>9.1f}{len(capped):>7}{kb:>9.1f}{cap_ms:>9.2f}{json_ms:>9.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
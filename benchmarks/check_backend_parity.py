@@ -0,0 +1,169 @@
+"""
+Parity check between the pandas (LeadCube + FilterIndex) and SQLite backends.
+
+For every channel x priority x country x week-range combination in a filter
+matrix, compares the KPI totals, distinct counts, every single-dimension
+roll-up that feeds a chart series, and the filtered row set returned by
+app.filter_rows. Then renders the same combinations through the app with
+SBE_BACKEND set to pandas and to sqlite and compares the Overview KPIs
+(spend, CPL and CPQL from the cost ledger included) and the figure data of
+the Overview and the Channel, Geographic and Temporal tabs. Exits non-zero
+on the first mismatch and reports per-query latency for both backends.
+
+Usage:
+    python benchmarks/check_backend_parity.py
+    python benchmarks/check_backend_parity.py --scale 100
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from time_rollup import GRAINS  # noqa: E402
+
+ROLLUP_DIMS = ['channel', 'country', 'week_num']
+
+
+def filter_matrix(tables):
+    leads = tables['master_leads_weekly']
+    channels = ['All'] + sorted(leads['channel'].dropna().unique().tolist())
+    priorities = ['All'] + sorted(tables['country_attr']['market_priority'].dropna().unique().tolist())
+    top = leads['country'].value_counts().index[:3].tolist()
+    countries = ['All'] + top + ['Atlantis']  # Atlantis: a value with no leads
+    lo, hi = int(leads['week_num'].min()), int(leads['week_num'].max())
+    ranges = [(lo, hi), (lo, lo + 5), (hi - 7, hi), (lo + 10, lo + 10)]
+    combinations = itertools.product(channels, countries, priorities, ranges)
+    for (channel, country, priority, week_range), grain in zip(combinations, itertools.cycle(GRAINS)):
+        yield {'channel': channel, 'country': country, 'priority': priority, 'week_range': week_range,
+               'grain': grain}
+
+
+def _snapshot(view):
+    """Everything a page reads from a slice, in comparable form"""
+    result = {'empty': view.is_empty(), 'totals': view.totals()}
+    if result['empty']:
+        return result
+    result['weeks'] = view.nunique('week_num')
+    result['countries'] = view.nunique('country')
+    for dim in ROLLUP_DIMS:
+        frame = view.rollup(dim).reset_index()
+        frame[dim] = frame[dim].astype(str) if dim != 'week_num' else frame[dim].astype('int64')
+        result[dim] = frame.reset_index(drop=True)
+    return result
+
+
+def _equal(a, b):
+    if a.keys() != b.keys():
+        return False
+    for key in a:
+        if isinstance(a[key], pd.DataFrame):
+            try:
+                pd.testing.assert_frame_equal(a[key], b[key], check_dtype=False)
+            except AssertionError:
+                return False
+        elif a[key] != b[key]:
+            return False
+    return True
+
+
+def _pages(app, data, filters, backend):
+    """(Overview KPIs, {figure: plotly JSON}) the app builds for `filters` on `backend`; None for an empty slice"""
+    app.BACKEND = backend
+    overview, performance = app.compute_overview(data, filters), app.compute_performance(data, filters)
+    if overview is None or performance is None:
+        assert overview is None and performance is None
+        return None
+    kpis, figures = overview
+    figures = {f'overview.{name}': fig for name, fig in figures.items()}
+    for tab, figs in performance.items():
+        figures.update((f'{tab}.{i}', fig) for i, fig in enumerate(figs))
+    return kpis, {name: json.loads(fig.to_json()) for name, fig in figures.items()}
+
+
+def _pages_mismatch(expected, actual):
+    """Name of the first KPI or figure that differs, or None"""
+    if expected is None or actual is None:
+        return None if expected is actual else 'empty slice'
+    for name, value in expected[0].items():
+        other = actual[0][name]
+        if not (value == other or (isinstance(value, float) and math.isclose(value, other, rel_tol=1e-9))):
+            return f"KPI {name}: {value} != {other}"
+    for name, figure in expected[1].items():
+        if figure != actual[1][name]:
+            return f"figure {name}"
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default=os.path.join(REPO_ROOT, 'data'))
+    parser.add_argument('--scale', type=int, help='use a synthetic copy scaled by this factor')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    data_dir = args.data_dir
+    if args.scale:
+        from bench_pages import build_scaled_dir
+        data_dir = build_scaled_dir(args.scale, args.work_dir)
+
+    logging.disable(logging.WARNING)
+    import app
+    tables = app.build_data(data_dir, ingest="memory")
+    leads, cube, index = tables['master_leads_weekly'], tables['lead_cube'], tables['filter_index']
+    start = time.perf_counter()
+    # The store the app itself uses under SBE_BACKEND=sqlite
+    store = app.sqlite_store(tables['table_versions']['master_leads_weekly'], tables)
+    print(f"{len(leads):,} leads; SQLite build {time.perf_counter() - start:.2f}s, {len(cube):,} cube cells")
+
+    timings = {'pandas': 0.0, 'sqlite': 0.0}
+    page_timings = dict(timings)
+    checked = 0
+    for filters in filter_matrix(tables):
+        start = time.perf_counter()
+        expected = _snapshot(cube.slice(filters))
+        expected_rows = index.select(filters)
+        timings['pandas'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = _snapshot(store.slice(filters))
+        actual_rows = store.select_rows(filters)
+        timings['sqlite'] += time.perf_counter() - start
+
+        rows_match = (expected_rows is None and actual_rows is None) or (
+            expected_rows is not None and actual_rows is not None and np.array_equal(expected_rows, actual_rows))
+        if not (_equal(expected, actual) and rows_match):
+            print(f"MISMATCH for {filters}")
+            return 1
+
+        pages = {}
+        for backend in page_timings:
+            start = time.perf_counter()
+            pages[backend] = _pages(app, tables, filters, backend)
+            page_timings[backend] += time.perf_counter() - start
+        mismatch = _pages_mismatch(pages['pandas'], pages['sqlite'])
+        if mismatch:
+            print(f"PAGE MISMATCH for {filters}: {mismatch}")
+            return 1
+        checked += 1
+
+    print(f"{checked} filter combinations match (slices, row sets, Overview KPIs and figures)")
+    print(f"  {'':<7} {'slice ms':>10} {'pages ms':>10}")
+    for backend, seconds in timings.items():
+        print(f"  {backend:<7} {seconds / checked * 1000:10.2f} {page_timings[backend] / checked * 1000:10.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Cost ledger: filtered spend sums back to the total, and lookup cost.
+
+Reports the channel-weeks with spend but no leads (allocated by the
+channel's country mix, see cost_ledger.py). Then, per scale and for a set
+of week ranges, checks that each channel's spend summed over every country,
+and over every market priority, equals its unfiltered spend, and times one
+spend_by_channel lookup unfiltered, by country and by priority against
+re-allocating the channel x week spend from the filtered cube on each call.
+
+Usage:
+    python benchmarks/cost_ledger.py
+    python benchmarks/cost_ledger.py --scales 1 100 1000
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+
+from bench_pages import build_scaled_dir  # noqa: E402
+from cost_ledger import CostLedger  # noqa: E402
+from cube import LeadCube  # noqa: E402
+from data_loader import load_tables  # noqa: E402
+
+ALL = {'channel': 'All', 'country': 'All', 'priority': 'All'}
+
+
+def _ms(fn, repeats=200):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def reallocate(ledger, cube, filters):
+    """The per-call path: split every channel-week by the filtered cube's lead share"""
+    lo, hi = ledger._week_bounds(filters['week_range'])
+    passing = np.zeros_like(ledger.leads)
+    ledger._fill(passing, ledger.channels, ledger.first_week,
+                 cube.slice(filters).rollup('channel', 'week_num')['lead_count'])
+    share = np.divide(passing, ledger.leads, out=np.zeros_like(passing), where=ledger.leads > 0)
+    return (ledger.spend * share)[:, lo:hi].sum(axis=1)
+
+
+def check_sums(ledger, week_ranges):
+    """Filter combinations whose per-channel spend does not add up to the unfiltered spend"""
+    wrong = []
+    for week_range in week_ranges:
+        total = ledger.spend_by_channel({**ALL, 'week_range': week_range})
+        for key, values in (('country', ledger.countries), ('priority', ledger.priorities)):
+            parts = [ledger.spend_by_channel({**ALL, key: value, 'week_range': week_range}) for value in values]
+            for channel, spend in total.items():
+                if not math.isclose(sum(p[channel] for p in parts), spend, rel_tol=1e-9, abs_tol=1e-6):
+                    wrong.append((key, week_range, channel))
+    return wrong
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    print(f"{'scale':>6}{'leads':>12}{'no-lead $':>15}{'build ms':>10}{'all ms':>9}{'country ms':>12}"
+          f"{'priority ms':>13}{'per-call ms':>13}")
+    failed = False
+    for scale in args.scales:
+        tables, _ = load_tables(build_scaled_dir(scale, args.work_dir))
+        cube = LeadCube.build(tables['master_leads_weekly'], tables['country_attr'])
+        start = time.perf_counter()
+        ledger = CostLedger.build(tables['channels_combined'], cube)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        first, last = ledger.first_week, ledger.first_week + ledger.spend.shape[1] - 1
+        mid = (first + last) // 2
+        week_ranges = [(first, last), (first, mid), (mid + 1, last), (mid, mid)]
+        wrong = check_sums(ledger, week_ranges)
+        if wrong:
+            print(f"MISMATCH at {scale}x: spend does not sum to the total for {wrong[:5]}")
+            failed = True
+
+        # Channel-week spend without leads; a per-call split by filtered leads drops it
+        no_lead = ledger.spend[ledger.leads == 0].sum()
+        country = {**ALL, 'country': ledger.countries[0], 'week_range': week_ranges[1]}
+        priority = {**ALL, 'priority': ledger.priorities[0], 'week_range': week_ranges[1]}
+        print(f"{scale:>6}{int(ledger.leads.sum()):>12,}{no_lead:>15,.2f}{build_ms:>10.1f}"
+              f"{_ms(lambda: ledger.spend_by_channel({**ALL, 'week_range': week_ranges[1]})):>9.3f}"
+              f"{_ms(lambda: ledger.spend_by_channel(country)):>12.3f}"
+              f"{_ms(lambda: ledger.spend_by_channel(priority)):>13.3f}"
+              f"{_ms(lambda: reallocate(ledger, cube, country), repeats=20):>13.3f}")
+    if not failed:
+        print("per-country and per-priority spend sums to the unfiltered spend at every scale")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
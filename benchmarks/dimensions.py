@@ -0,0 +1,89 @@
+"""
+Dimension dictionary: ingest cost and what shared codes buy.
+
+Per scale, reads the raw source CSVs once, then times
+DimensionDictionary.build over them and encoding every table with it.
+Next to that it times the two cross-table operations the shared codes
+serve: the master_leads_weekly x country_attr join behind master_enriched
+(shared categorical keys vs the same columns as plain strings) and a
+channel filter (category-code comparison vs string comparison). Ends with
+the issues the dictionary reports for the data.
+
+Usage:
+    python benchmarks/dimensions.py
+    python benchmarks/dimensions.py --scales 1 100 1000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import pandas as pd  # noqa: E402
+
+from bench_pages import build_scaled_dir  # noqa: E402
+from data_loader import SOURCE_FILES, read_source  # noqa: E402
+from dimensions import TABLE_DIMENSIONS, DimensionDictionary  # noqa: E402
+
+
+def _ms(fn, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def _encode_all(dictionary, raw):
+    return {name: dictionary.encode(frame.copy(), name) for name, frame in raw.items()}
+
+
+def _as_strings(frame, columns):
+    return frame.assign(**{col: frame[col].astype('str') for col in columns})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    print(f"{'scale':>6}{'leads':>12}{'build ms':>10}{'encode ms':>11}{'join str ms':>13}{'join code ms':>14}"
+          f"{'filter str ms':>15}{'filter code ms':>16}")
+    for scale in args.scales:
+        data_dir = build_scaled_dir(scale, args.work_dir)
+        raw = {name: read_source(data_dir, name) for name in SOURCE_FILES if name in TABLE_DIMENSIONS}
+        build_ms, dictionary = _ms(lambda: DimensionDictionary.build(raw), repeats=3)
+        encode_ms, tables = _ms(lambda: _encode_all(dictionary, raw), repeats=3)
+
+        leads, countries = tables['master_leads_weekly'], tables['country_attr']
+        plain_leads, plain_countries = _as_strings(leads, ['country']), _as_strings(countries, ['country'])
+        str_join_ms, by_string = _ms(lambda: plain_leads.merge(plain_countries, on='country', how='left',
+                                                               suffixes=('', '_country')))
+        code_join_ms, by_code = _ms(lambda: leads.merge(countries, on='country', how='left',
+                                                        suffixes=('', '_country')))
+        pd.testing.assert_series_equal(by_code['market_priority'].astype('str'),
+                                       by_string['market_priority'].astype('str'))
+
+        channel = plain_leads['channel'].astype('str')
+        code = dictionary.codes('channel', ['Google Search'])[0]
+        str_filter_ms, by_string = _ms(lambda: (channel == 'Google Search').to_numpy())
+        code_filter_ms, by_code = _ms(lambda: leads['channel'].cat.codes.to_numpy() == code)
+        assert (by_string == by_code).all()
+        print(f"{scale:>6}{len(leads):>12,}{build_ms:>10.1f}{encode_ms:>11.1f}{str_join_ms:>13.2f}"
+              f"{code_join_ms:>14.2f}{str_filter_ms:>15.2f}{code_filter_ms:>16.2f}")
+
+    issues = dictionary.issues
+    print(f"\n{len(issues)} dimension issues at scale {args.scales[-1]}:")
+    if len(issues):
+        print(issues.to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Forecasting engine backtest: accuracy and batched fit time.
+
+Rolling-origin backtest on the real (channel, country) weekly series: for
+each origin the engine is fitted on the weeks before it and forecasts the
+next --horizon weeks. MAPE is reported for the all-leads total and per
+channel, next to a 4-week-average baseline and the share of actual weeks
+inside the 80% interval. Fit time is then measured on the real panel and
+on larger synthetic panels (Poisson resamples of the real series).
+
+Usage:
+    python benchmarks/forecast_backtest.py
+    python benchmarks/forecast_backtest.py --origins 4 --series 100 1000 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+
+from cube import LeadCube  # noqa: E402
+from data_loader import BASE_DIR, load_tables  # noqa: E402
+from forecasting import HORIZON, Z_SCORES, fit_forecast, mape, weekly_matrix  # noqa: E402
+
+
+def _backtest(counts, rows, origins, horizon):
+    """(model MAPE, baseline MAPE, interval coverage) of the summed `rows`, averaged over origins"""
+    model, naive, covered = [], [], []
+    for origin in origins:
+        _, mean, variance = fit_forecast(counts[:, :origin], horizon)
+        actual = counts[rows, origin:origin + horizon].sum(axis=0)
+        predicted = mean[rows].sum(axis=0)
+        spread = Z_SCORES[0.8] * np.sqrt(variance[rows].sum(axis=0))
+        model.append(mape(actual, predicted))
+        naive.append(mape(actual, np.full(horizon, counts[rows, origin - 4:origin].sum(axis=0).mean())))
+        covered.append(np.mean(np.abs(actual - predicted) <= spread))
+    return np.nanmean(model), np.nanmean(naive), np.mean(covered)
+
+
+def _fit_time(counts, horizon, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fit_forecast(counts, horizon)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default=BASE_DIR)
+    parser.add_argument('--horizon', type=int, default=HORIZON)
+    parser.add_argument('--origins', type=int, default=3, help='backtest origins, spaced 4 weeks apart')
+    parser.add_argument('--series', type=int, nargs='+', default=[500, 5000])
+    args = parser.parse_args(argv)
+
+    tables, _ = load_tables(args.data_dir)
+    cube = LeadCube.build(tables['master_leads_weekly'], tables['country_attr'])
+    keys, weeks, counts = weekly_matrix(cube)
+    last_origin = counts.shape[1] - args.horizon
+    origins = [last_origin - 4 * i for i in range(args.origins)][::-1]
+    print(f"{len(keys)} series x {len(weeks)} weeks; origins at weeks {', '.join(str(weeks[o]) for o in origins)}, "
+          f"horizon {args.horizon}\n")
+
+    print(f"{'slice':<16}{'MAPE %':>9}{'4-wk avg %':>12}{'80% cover':>11}")
+    slices = [('All leads', np.ones(len(keys), dtype=bool))]
+    slices += [(channel, (keys['channel'] == channel).to_numpy()) for channel in keys['channel'].dropna().unique()]
+    for name, rows in slices:
+        model, naive, covered = _backtest(counts, rows, origins, args.horizon)
+        print(f"{name:<16}{model:>9.1f}{naive:>12.1f}{covered:>11.0%}")
+
+    print(f"\n{'series':>8}{'fit ms':>9}")
+    rng = np.random.default_rng(0)
+    print(f"{len(counts):>8}{_fit_time(counts, args.horizon) * 1000:>9.2f}")
+    for n in args.series:
+        panel = rng.poisson(counts[rng.integers(0, len(counts), n)]).astype(float)
+        print(f"{n:>8}{_fit_time(panel, args.horizon) * 1000:>9.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Funnel engine: build and query cost as weeks, channels and countries grow.
+
+Generates a synthetic weekly channel summary (every channel x week x
+country reporting lead counts per status, some countries without a status
+breakdown like the real file) and times FunnelCube.build and one query per
+filter shape: everything, one channel, one country, one priority, and a
+channel x priority slice over part of the weeks. Checks each query's stage
+totals against a pandas groupby of the same rows.
+
+Usage:
+    python benchmarks/funnel.py
+    python benchmarks/funnel.py --sizes 52x2x4 520x10x200 --target-ms 1
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from funnel import STAGES, STATUS_DEPTH, FunnelCube  # noqa: E402
+
+PRIORITIES = ['Primary', 'Secondary', 'Tertiary']
+
+
+def _categorical(values, categories):
+    return pd.Categorical(values, categories=pd.Index(sorted(categories), dtype='str'))
+
+
+def synthetic_summary(n_weeks, n_channels, n_countries, rng):
+    """(summary, cost calendar, country_attr) shaped like the encoded weekly tables"""
+    weeks = np.arange(1, n_weeks + 1)
+    ranges = np.array([f"Week {w} dates" for w in weeks])
+    channels = [f"Channel{i}" for i in range(n_channels)]
+    countries = [f"Country{i}" for i in range(n_countries)]
+    statuses = list(STATUS_DEPTH)
+    # A quarter of the countries report totals only
+    breakdown = rng.random(n_countries) > 0.25
+    c, w, k, s = (axis.ravel() for axis in np.meshgrid(np.arange(n_channels), np.arange(n_weeks),
+                                                        np.arange(n_countries), np.arange(len(statuses)),
+                                                        indexing='ij'))
+    status = np.where(breakdown[k], np.array(statuses, dtype=object)[s], None)
+    keep = breakdown[k] | (s == 0)
+    summary = pd.DataFrame({
+        'channel': _categorical(np.array(channels)[c[keep]], channels),
+        'week_number': weeks[w[keep]],
+        'week_date_range': ranges[w[keep]],
+        'country': _categorical(np.array(countries)[k[keep]], countries),
+        'status': _categorical(status[keep], statuses),
+        'lead_count': rng.poisson(3, keep.sum()).astype(float),
+    })
+    calendar = pd.DataFrame({'week_number': weeks, 'week_date_range': ranges})
+    country_attr = pd.DataFrame({
+        'country': _categorical(countries, countries),
+        'market_priority': _categorical(rng.choice(PRIORITIES, n_countries), PRIORITIES),
+    })
+    return summary, calendar, country_attr
+
+
+def _ms(fn, repeats=200):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def _expected(summary, country_attr, filters):
+    """Stage totals of the same slice by pandas filtering and groupby"""
+    rows = summary.merge(country_attr, on='country', how='left')
+    lo, hi = filters['week_range']
+    mask = rows['week_number'].between(lo, hi)
+    for column in ['channel', 'country', 'priority']:
+        if filters[column] != 'All':
+            mask &= rows['market_priority' if column == 'priority' else column] == filters[column]
+    by_status = rows[mask].groupby('status', observed=True)['lead_count'].sum()
+    depth = by_status.index.map(STATUS_DEPTH).to_numpy()
+    return np.array([by_status.to_numpy()[depth >= stage].sum() for stage in range(len(STAGES))])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['35x2x4', '260x5x50', '520x10x200'],
+                        help='WEEKSxCHANNELSxCOUNTRIES')
+    parser.add_argument('--target-ms', type=float, default=1.0, help='query latency budget')
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    shapes = {
+        'all': {},
+        'channel': {'channel': 'Channel1'},
+        'country': {'country': 'Country2'},
+        'priority': {'priority': 'Primary'},
+        'chan x prio': {'channel': 'Channel0', 'priority': 'Secondary', 'week_range': 'half'},
+    }
+    print(f"{'weeks':>6}{'chan':>5}{'countries':>10}{'rows':>11}{'build ms':>10}"
+          + "".join(f"{name + ' ms':>15}" for name in shapes))
+    slowest = 0.0
+    for size in args.sizes:
+        n_weeks, n_channels, n_countries = (int(n) for n in size.split('x'))
+        summary, calendar, country_attr = synthetic_summary(n_weeks, n_channels, n_countries, rng)
+        build_ms, cube = _ms(lambda: FunnelCube.build(summary, calendar, country_attr), repeats=1)
+        timings = []
+        for shape in shapes.values():
+            filters = {'channel': 'All', 'country': 'All', 'priority': 'All', 'week_range': (1, n_weeks), **shape}
+            if filters['week_range'] == 'half':
+                filters['week_range'] = (n_weeks // 4, n_weeks // 4 + n_weeks // 2)
+            query_ms, funnel = _ms(lambda: cube.query(filters))
+            np.testing.assert_allclose(funnel['stage_totals'], _expected(summary, country_attr, filters))
+            timings.append(query_ms)
+        slowest = max(slowest, *timings)
+        print(f"{n_weeks:>6,}{n_channels:>5,}{n_countries:>10,}{len(summary):>11,}{build_ms:>10.1f}"
+              + "".join(f"{ms:>15.3f}" for ms in timings))
+    print("stage totals match a pandas groupby of the same rows")
+    print(f"slowest query {slowest:.3f} ms ({'within' if slowest < args.target_ms else 'over'} "
+          f"the {args.target_ms:g} ms budget)")
+    return 0 if slowest < args.target_ms else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Incremental batch ingestion: exactness and refresh cost.
+
+For each scale, drops a synthetic new weekly report batch into the drop
+folder and compares incremental.refresh_data against a full build_data of
+the same data, where the batch rows are appended to master_leads_weekly.csv
+instead. The lead table, cube, cost ledger, filter selections and time
+rollups must be identical. It then re-exports the batch with half its
+rows, so the batch replaces itself, and checks again. Respelled returning
+leads make the batch re-key known leads. A half-written CSV dropped next
+to the batch must be skipped with its error logged while the batch is
+still applied, also when the app starts with both in the folder.
+Refresh time should track the batch size, not the history.
+
+Usage:
+    python benchmarks/incremental_refresh.py
+    python benchmarks/incremental_refresh.py --scales 1 100 1000 --batch-rows 500
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from bench_pages import build_scaled_dir  # noqa: E402
+from data_loader import SOURCE_FILES  # noqa: E402
+from incremental import DROP_DIRNAME, refresh_data  # noqa: E402
+from time_rollup import GRAINS  # noqa: E402
+
+WEEKLY = SOURCE_FILES['master_leads_weekly']
+BATCH_NAME = 'SBE - MS report - April 7-13_parsed.csv'
+CORRUPT_NAME = 'SBE - MS report - April 14-20_parsed.csv'
+FILTERS = [
+    {'channel': 'Google Search', 'country': 'All', 'priority': 'All', 'week_range': (14, 49)},
+    {'channel': 'All', 'country': 'Lebanon', 'priority': 'All', 'week_range': (40, 49)},
+    {'channel': 'All', 'country': 'All', 'priority': 'Primary', 'week_range': (49, 49)},
+]
+
+
+def _make_batch(source_dir, rows):
+    """
+    A new week: the last week's leads relabelled as week 49, repeated to
+    `rows`. The first copy are returning leads, every third respelled with
+    an 'e' for its first 'a' ("Ahmad" / "Ehmad"), a variant that joins the
+    known lead in the registry; later copies get a number appended to their
+    names, so they are new ones.
+    """
+    weekly = pd.read_csv(os.path.join(source_dir, WEEKLY))
+    last = weekly[weekly['week_number'] == 'Week 48'].reset_index(drop=True)
+    respelled = last['full_name'].where(last.index % 3 > 0, last['full_name'].str.replace('a', 'e', n=1))
+    copies = [last.assign(full_name=last['full_name'] + f' N{i}') if i else last.assign(full_name=respelled)
+              for i in range(rows // len(last) + 1)]
+    batch = pd.concat(copies, ignore_index=True).head(rows)
+    batch['week_number'] = 'Week 49'
+    batch['source_file'] = 'SBE - MS report - April 7-13_parsed.xlsx'
+    batch['lead_id'] = [f'WL_N{i:06d}' for i in range(len(batch))]
+    return batch
+
+
+def _link_dir(data_dir, target):
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target)
+    for filename in SOURCE_FILES.values():
+        os.symlink(os.path.join(data_dir, filename), os.path.join(target, filename))
+
+
+def _monolithic(data_dir, batch, work_dir):
+    """Reference directory with the batch rows appended to the weekly CSV"""
+    target = os.path.join(work_dir, 'incr_reference')
+    _link_dir(data_dir, target)
+    os.remove(os.path.join(target, WEEKLY))
+    weekly = pd.read_csv(os.path.join(data_dir, WEEKLY))
+    pd.concat([weekly, batch], ignore_index=True).to_csv(os.path.join(target, WEEKLY), index=False)
+    return target
+
+
+def _check(actual, expected):
+    pd.testing.assert_frame_equal(actual['master_leads_weekly'], expected['master_leads_weekly'])
+    pd.testing.assert_frame_equal(actual['master_enriched'], expected['master_enriched'])
+    pd.testing.assert_frame_equal(actual['lead_cube'].cells, expected['lead_cube'].cells)
+    assert np.array_equal(actual['cost_ledger'].leads, expected['cost_ledger'].leads)
+    for filters in FILTERS:
+        assert np.array_equal(actual['filter_index'].select(filters), expected['filter_index'].select(filters))
+        for grain in GRAINS:
+            pd.testing.assert_frame_equal(actual['time_rollup'].slice(filters, grain),
+                                          expected['time_rollup'].slice(filters, grain))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--batch-rows', type=int, default=200)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    import app
+
+    print(f"{'scale':>6}{'leads':>12}{'batch':>8}{'full build s':>14}{'refresh s':>11}{'replace s':>11}")
+    for scale in args.scales:
+        data_dir = build_scaled_dir(scale, args.work_dir)
+        batch = _make_batch(data_dir, args.batch_rows)
+        live_dir = os.path.join(args.work_dir, 'incr_live')
+        _link_dir(data_dir, live_dir)
+        drop = os.path.join(live_dir, DROP_DIRNAME)
+        os.makedirs(drop)
+
+        base = app.build_data(live_dir)
+        batch.to_csv(os.path.join(drop, BATCH_NAME), index=False)
+        start = time.perf_counter()
+        refreshed = refresh_data(base, drop)
+        refresh_s = time.perf_counter() - start
+
+        reference_dir = _monolithic(data_dir, batch, args.work_dir)
+        start = time.perf_counter()
+        expected = app.build_data(reference_dir)
+        full_s = time.perf_counter() - start
+        _check(refreshed, expected)
+
+        # A half-written export next to the batch is skipped; the batch still gets in
+        with open(os.path.join(drop, CORRUPT_NAME), 'w', encoding='utf-8') as f:
+            f.write(batch.to_csv(index=False)[:40])
+        for skipped in (refresh_data(base, drop), app.build_data(live_dir)):
+            _check(skipped, expected)
+            assert 'error' in skipped['ingested_batches'][CORRUPT_NAME]
+            assert skipped['data_version'] == refreshed['data_version']
+        os.remove(os.path.join(drop, CORRUPT_NAME))
+
+        # Re-export the same week with half the rows: the batch replaces its own leads
+        half = batch.head(len(batch) // 2)
+        half.to_csv(os.path.join(drop, BATCH_NAME), index=False)
+        start = time.perf_counter()
+        replaced = refresh_data(refreshed, drop)
+        replace_s = time.perf_counter() - start
+        _check(replaced, app.build_data(_monolithic(data_dir, half, args.work_dir)))
+        assert replaced['data_version'] != refreshed['data_version'] != base['data_version']
+        assert replaced['table_versions']['post_perf_totals'] == base['table_versions']['post_perf_totals']
+
+        print(f"{scale:>6}{len(expected['master_leads_weekly']):>12,}{len(batch):>8}"
+              f"{full_s:>14.3f}{refresh_s:>11.3f}{replace_s:>11.3f}")
+    print("incremental results identical to a full build at every scale")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
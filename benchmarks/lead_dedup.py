@@ -0,0 +1,184 @@
+"""
+Lead de-duplication: cross-file overlap, throughput and all-pairs recall.
+
+Checks lead_uids on name pairs that must (or must not) be one lead: one
+consonant skeleton but different names, spelling variants of one name and
+Arabic next to Latin spellings. Reports how many rows of each lead export
+collapse into canonical leads and how many leads the exports share.
+Then, per scale, times reading the name variants of a scaled weekly export
+and resolving them (dedup.read_name_keys, resolve_variants): rows/s, and
+the tracemalloc peak, which follows the chunk size plus 8 bytes per row
+for the variants and the registry of distinct names rather than the file
+size. Finally compares the blocked
+matcher with an all-pairs matcher (difflib ratio of the normalized names
+within a country) on samples of the weekly leads: pairs compared, time,
+the duplicate pairs each finds and the blocked matcher's recall against
+all-pairs, listing the pairs only all-pairs finds in the last sample.
+"same block" counts the all-pairs matches whose names share a block; a
+ratio of 0.85 also accepts names one consonant apart ("Kamran" /
+"Imran"), which the blocked matcher never compares.
+
+Usage:
+    python benchmarks/lead_dedup.py
+    python benchmarks/lead_dedup.py --scales 1 100 1000 --samples 250 500 --chunk-rows 100000
+"""
+
+import argparse
+import difflib
+import itertools
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from bench_pages import build_scaled_dir  # noqa: E402
+from data_loader import BASE_DIR, IDENTITY_PERIODS, SOURCE_FILES  # noqa: E402
+from dedup import (CHUNK_ROWS, NAME_COLUMNS, lead_uids, lookup_uids, name_keys, normalize_token,  # noqa: E402
+                   read_name_keys, resolve_variants)
+
+MATCH_RATIO = 0.85
+
+# (name, name, same lead?) within one country
+NAME_CASES = [
+    ('Mohamad Haddad', 'Mahmoud Haddad', False),
+    ('Ibrar Ali', 'Abrar Ali', False),
+    ('Rami Saleh', 'Rima Saleh', False),
+    ('احمد حيدر', 'Ahmad Ahmad Haidar', False),
+    ('Ahmad Haidar', 'Ahmad Ahmad Haidar', False),
+    ('Karim Haddad', 'Kareem Haddad', True),
+    ('Mohammed Mansour', 'Muhammad Mansour', True),
+    ('Hasan Haydar', 'Hassan Heidar', True),
+    ('Ismail Nour', 'Ismael Noor', True),
+    ('Mahbubur Rahman', 'Mahabubur Rahman', True),
+    ('Khaled Saad', 'Khalid Saad', True),
+    ('Samir Khoury', 'Samar Khoury', False),
+    ('خالد Khaled Kanaan', 'Khaled Kanaan', True),
+    ('محمد حيدر', 'محمّد حيدر', True),
+]
+
+
+def name_cases():
+    names = [name for a, b, _ in NAME_CASES for name in (a, b)]
+    uids = lead_uids(pd.DataFrame({'lead_id': [f'L{i}' for i in range(len(names))], 'full_name': names,
+                                   'country': 'Lebanon'}))
+    failed = 0
+    for (a, b, same), (ua, ub) in zip(NAME_CASES, uids.reshape(-1, 2)):
+        ok = (ua == ub) == same
+        failed += not ok
+        print(f"{'ok' if ok else 'FAIL':<6}{'same' if same else 'different':<11}{a} / {b}")
+    print(f"{len(NAME_CASES) - failed} of {len(NAME_CASES)} name cases as expected\n")
+    return failed
+
+
+def read_uids(paths, chunk_rows=CHUNK_ROWS):
+    """lead_uids per file, resolved over the names of all of them as data_loader does"""
+    keys = {path: read_name_keys(path, chunk_rows) for path in paths}
+    registry = resolve_variants(pd.concat([variants for _, variants in keys.values()], ignore_index=True))
+    return {path: lookup_uids(variants, registry) for path, (variants, _) in keys.items()}, registry
+
+
+def overlap(data_dir):
+    paths = {name: os.path.join(data_dir, SOURCE_FILES[name]) for name in IDENTITY_PERIODS}
+    uids = dict(zip(paths, read_uids(paths.values())[0].values()))
+    print(f"{'export':<24}{'rows':>8}{'leads':>8}")
+    for name, ids in uids.items():
+        print(f"{name:<24}{len(ids):>8,}{len(np.unique(ids)):>8,}")
+    for a, b in itertools.combinations(uids, 2):
+        print(f"leads in both {a} and {b}: {len(np.intersect1d(uids[a], uids[b])):,}")
+    every = np.unique(np.concatenate(list(uids.values())))
+    print(f"distinct leads across all exports: {len(every):,}\n")
+
+
+def throughput(scales, work_dir, chunk_rows):
+    print(f"{'scale':>6}{'rows':>12}{'variants':>10}{'blocks':>10}{'leads':>12}{'seconds':>9}{'rows/s':>12}"
+          f"{'peak MB':>9}")
+    for scale in scales:
+        path = os.path.join(build_scaled_dir(scale, work_dir), SOURCE_FILES['master_leads_weekly'])
+        start = time.perf_counter()
+        uids, registry = read_uids([path], chunk_rows)
+        uids = uids[path]
+        elapsed = time.perf_counter() - start
+        # Traced separately: tracemalloc slows allocation-heavy code several times over
+        tracemalloc.start()
+        read_uids([path], chunk_rows)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        print(f"{scale:>6}{len(uids):>12,}{len(registry):>10,}{registry['block'].nunique():>10,}"
+              f"{len(np.unique(uids)):>12,}{elapsed:>9.2f}{len(uids) / elapsed:>12,.0f}{peak:>9.1f}")
+
+
+def _pairs(keys):
+    """Unordered row pairs sharing a key"""
+    pairs = set()
+    for group in pd.Series(range(len(keys))).groupby(keys).groups.values():
+        pairs.update(itertools.combinations(sorted(group), 2))
+    return pairs
+
+
+def all_pairs(leads):
+    """Duplicate pairs by comparing every pair of names in the same country"""
+    names = [' '.join(normalize_token(t) for t in str(n).split()) for n in leads['full_name']]
+    countries = leads['country'].to_numpy()
+    pairs, compared = set(), 0
+    for i, j in itertools.combinations(range(len(leads)), 2):
+        compared += 1
+        if countries[i] == countries[j] and difflib.SequenceMatcher(None, names[i], names[j]).ratio() >= MATCH_RATIO:
+            pairs.add((i, j))
+    return pairs, compared
+
+
+def row_blocks(leads):
+    """(block per row, variant pairs the blocked matcher compares: every pair within a block)"""
+    variants, table = name_keys(leads)
+    sizes = table['block'].value_counts().to_numpy()
+    return table.set_index('variant')['block'].loc[variants].to_numpy(), int((sizes * (sizes - 1) // 2).sum())
+
+
+def baseline(samples, data_dir):
+    weekly = pd.read_csv(os.path.join(data_dir, SOURCE_FILES['master_leads_weekly']), usecols=NAME_COLUMNS,
+                         dtype='str')
+    print(f"\n{'sample':>7}{'in-block':>10}{'block ms':>10}{'blocked':>9}{'compared':>11}{'pairs ms':>10}"
+          f"{'all-pairs':>11}{'same block':>12}{'both':>6}{'recall':>8}")
+    for size in samples:
+        leads = weekly.sample(min(size, len(weekly)), random_state=0).reset_index(drop=True)
+        start = time.perf_counter()
+        blocked = _pairs(lead_uids(leads))
+        block_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        matched, compared = all_pairs(leads)
+        pairs_ms = (time.perf_counter() - start) * 1000
+        blocks, in_block = row_blocks(leads)
+        same_block = sum(blocks[i] == blocks[j] for i, j in matched)
+        recall = len(blocked & matched) / len(matched) if matched else 1.0
+        print(f"{len(leads):>7,}{in_block:>10,}{block_ms:>10.1f}{len(blocked):>9,}{compared:>11,}"
+              f"{pairs_ms:>10.0f}{len(matched):>11,}{same_block:>12,}{len(blocked & matched):>6,}{recall:>8.0%}")
+    print("\npairs only all-pairs finds in the last sample:")
+    for i, j in sorted(matched - blocked):
+        where = 'same block' if blocks[i] == blocks[j] else 'other blocks'
+        print(f"  {leads['full_name'][i]} / {leads['full_name'][j]} ({leads['country'][i]}, {where})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--samples', type=int, nargs='+', default=[250, 500, 1000])
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    failed = name_cases()
+    overlap(BASE_DIR)
+    throughput(args.scales, args.work_dir, args.chunk_rows)
+    baseline(args.samples, BASE_DIR)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
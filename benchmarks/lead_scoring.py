@@ -0,0 +1,89 @@
+"""
+Lead-qualification scorer: training, artifact and batch scoring cost.
+
+For each scale, loads master_enriched, trains the scorer (including the
+holdout fit), saves and reloads the artifact, then scores every lead in one
+pass and computes the Models page metrics and per-channel segments. Scores
+are checked against a dense one-hot matrix product on a sample, and the
+reloaded artifact must score identically; its holdout model, scoring the
+holdout weeks as the Models page does, must reproduce the stored holdout
+metrics. Exits non-zero when scoring at
+least a million leads takes a second or more.
+
+Usage:
+    python benchmarks/lead_scoring.py
+    python benchmarks/lead_scoring.py --scales 1 1000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+
+from bench_pages import build_scaled_dir  # noqa: E402
+from data_loader import load_tables  # noqa: E402
+from scoring import TARGET, LeadScorer, evaluate, load_or_train, segment_scores  # noqa: E402
+
+SAMPLE_ROWS = 20_000
+BUDGET_S = 1.0
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _dense_reference(scorer, leads):
+    """Probabilities via an explicit one-hot design matrix"""
+    design = np.zeros((len(leads), int(scorer.offsets[-1])))
+    np.put_along_axis(design, scorer.encode(leads), 1.0, axis=1)
+    return 1.0 / (1.0 + np.exp(-(design @ scorer.weights + scorer.intercept)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'scale':>6}{'leads':>12}{'train s':>9}{'load s':>8}{'score s':>9}{'metrics s':>11}{'segments s':>12}"
+          f"{'holdout AUC':>13}")
+    for scale in args.scales:
+        leads = load_tables(build_scaled_dir(scale, args.work_dir))[0]['master_enriched']
+        with tempfile.TemporaryDirectory() as model_dir:
+            scorer, train_s = _timed(load_or_train, leads, 'bench', model_dir)
+            reloaded, load_s = _timed(load_or_train, leads, 'bench', model_dir)
+
+        probabilities, score_s = _timed(scorer.score, leads)
+        _, metrics_s = _timed(evaluate, probabilities, leads[TARGET].to_numpy(), scorer.threshold)
+        _, segments_s = _timed(segment_scores, leads, probabilities, 'channel')
+
+        sample = leads.head(SAMPLE_ROWS)
+        assert np.allclose(probabilities[:SAMPLE_ROWS], _dense_reference(scorer, sample))
+        assert np.array_equal(reloaded.score(leads), probabilities)
+        assert isinstance(reloaded, LeadScorer) and reloaded.metrics == scorer.metrics
+        # The Models page's live holdout metrics, unfiltered, reproduce the stored ones
+        holdout_metrics = scorer.metrics['holdout']
+        recent = leads[(leads['is_primary'] == 1) & (leads['week_num'] >= holdout_metrics['from_week'])]
+        live = evaluate(reloaded.holdout.score(recent), recent[TARGET].to_numpy(), reloaded.holdout.threshold)
+        assert all(np.isclose(live[k], holdout_metrics[k]) for k in live)
+
+        holdout = scorer.metrics.get('holdout', {}).get('roc_auc', float('nan'))
+        print(f"{scale:>6}{len(leads):>12,}{train_s:>9.3f}{load_s:>8.3f}{score_s:>9.3f}{metrics_s:>11.3f}"
+              f"{segments_s:>12.3f}{holdout:>13.3f}")
+        if len(leads) >= 1_000_000 and score_s >= BUDGET_S:
+            print(f"FAIL: scoring {len(leads):,} leads took {score_s:.2f}s (budget {BUDGET_S:.0f}s)")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""
+Concurrent-session load test against a local Streamlit server.
+
+Starts `streamlit run app.py` on a synthetic scaled copy of the data
+directory (bench_pages.build_scaled_dir) and connects N simulated users to
+it over Streamlit's websocket protocol, the way the browser does. Each user
+replays randomized sidebar interactions (page, channel, country, priority,
+week range, time grain), waits for the rerun to finish, then thinks for a
+random pause before the next one. For every session count it reports
+rerun throughput, p50/p95/p99 rerun latency (overall and per interaction)
+and the server's RSS sampled over the run.
+
+The server runs with the profiler on (SBE_PROFILE=1, without tracemalloc),
+so the report also breaks the server-side rerun time into stages: when
+load, filter or aggregate times grow with the session count, that stage is
+where the sessions contend. The gap between client latency and server rerun
+time is queueing and delta transport.
+
+All clients run in this one process, on one event loop; on a small machine
+they share the CPU with the server, so compare runs made on the same box.
+
+Usage:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --scales 1 100 --sessions 1 4 16 32 --duration 60 --think-ms 0
+    python benchmarks/load_test.py --url http://localhost:8501 --pid 1234   # an already running server
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+try:
+    import websockets  # noqa: E402
+except ImportError:  # streamlit served over tornado before it depended on websockets
+    sys.exit("benchmarks/load_test.py needs the websockets package: pip install -r requirements.txt")
+from streamlit.proto.BackMsg_pb2 import BackMsg  # noqa: E402
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg  # noqa: E402
+
+from bench_pages import build_scaled_dir  # noqa: E402
+
+# Sidebar widget label -> (interaction, relative frequency); the week slider
+# is what many people move at once
+SIDEBAR_WIDGETS = {
+    'Select Page': ('page', 2),
+    '📡 Channel': ('channel', 2),
+    '🌍 Country': ('country', 2),
+    '⭐ Market Priority': ('priority', 1),
+    '📅 Week Range': ('week_range', 4),
+    '🗓️ Time Grain': ('grain', 1),
+}
+WIDGET_TYPES = ('radio', 'selectbox', 'slider')
+
+PERCENTILES = (50, 95, 99)
+STAGES = ['load', 'filter', 'aggregate', 'figure', 'chart']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid):
+    """Resident set size of a process from /proc, or None off Linux"""
+    try:
+        with open(f'/proc/{pid}/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def start_server(data_dir, port, spans_path, log):
+    env = dict(os.environ, SBE_DATA_DIR=data_dir, SBE_PROFILE='1', SBE_PROFILE_MEMORY='0',
+               SBE_PROFILE_LOG=spans_path)
+    cmd = [sys.executable, '-m', 'streamlit', 'run', os.path.join(REPO_ROOT, 'app.py'),
+           '--server.headless=true', f'--server.port={port}', '--server.address=127.0.0.1',
+           '--server.fileWatcherType=none', '--browser.gatherUsageStats=false']
+    proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"streamlit exited with {proc.returncode}; see {log.name}")
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("streamlit did not come up within 120s")
+
+
+class Session:
+    """One simulated browser tab: the sidebar widgets it has seen and the values it has set"""
+
+    def __init__(self, ws, rng):
+        self.ws = ws
+        self.rng = rng
+        self.widgets = {}
+        self.values = {}
+
+    async def rerun(self):
+        """Send the current widget values and wait for the script to finish: (seconds, exceptions)"""
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        for label, value in self.values.items():
+            kind, proto = self.widgets[label]
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = proto.id
+            if kind == 'slider':
+                state.double_array_value.data[:] = value
+            else:
+                state.string_value = value
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        errors = 0
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(await self.ws.recv())
+            kind = fwd.WhichOneof('type')
+            if kind == 'script_finished':
+                return time.perf_counter() - start, errors
+            if kind != 'delta' or fwd.delta.WhichOneof('type') != 'new_element':
+                continue
+            element = fwd.delta.new_element
+            element_type = element.WhichOneof('type')
+            if element_type == 'exception':
+                errors += 1
+            elif element_type in WIDGET_TYPES and getattr(element, element_type).label in SIDEBAR_WIDGETS:
+                proto = getattr(element, element_type)
+                self.widgets[proto.label] = (element_type, proto)
+
+    def interact(self):
+        """Set one sidebar widget to a random value; returns the interaction name"""
+        labels = [label for label in SIDEBAR_WIDGETS if label in self.widgets]
+        label = self.rng.choices(labels, weights=[SIDEBAR_WIDGETS[label][1] for label in labels])[0]
+        kind, proto = self.widgets[label]
+        if kind == 'slider':
+            lo, hi = sorted(self.rng.randint(int(proto.min), int(proto.max)) for _ in range(2))
+            self.values[label] = [float(lo), float(hi)]
+        else:
+            self.values[label] = self.rng.choice(list(proto.options))
+        return SIDEBAR_WIDGETS[label][0]
+
+
+async def _user(url, rng, deadline, think_s, results):
+    async with websockets.connect(f'{url}/_stcore/stream', subprotocols=['streamlit'], max_size=None) as ws:
+        session = Session(ws, rng)
+        elapsed, errors = await session.rerun()
+        results['connect'].append(elapsed)
+        results['errors'] += errors
+        while time.perf_counter() < deadline:
+            action = session.interact()
+            elapsed, errors = await session.rerun()
+            results['reruns'].append((action, elapsed))
+            results['errors'] += errors
+            if think_s:
+                await asyncio.sleep(rng.uniform(0, 2 * think_s))
+
+
+async def _sample_rss(pid, interval, samples, stop):
+    start = time.perf_counter()
+    while not stop.is_set():
+        samples.append((round(time.perf_counter() - start, 1), rss_mb(pid)))
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(url, pid, sessions, duration, think_s, seed, sample_s):
+    results = {'connect': [], 'reruns': [], 'errors': 0}
+    samples, stop = [], asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(pid, sample_s, samples, stop))
+    start = time.time()
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(_user(url, random.Random(seed + i), deadline, think_s, results)
+                           for i in range(sessions)))
+    stop.set()
+    await sampler
+    results['window'] = (start, time.time())
+    results['rss'] = samples
+    return results
+
+
+def _percentiles(values):
+    if not len(values):
+        return {p: None for p in PERCENTILES}
+    return {p: float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def stage_summary(spans_path, since, until):
+    """Server-side p50/p95/p99 ms per stage and for the whole rerun, over reruns logged in [since, until]"""
+    reruns = {}
+    try:
+        with open(spans_path) as fh:
+            for line in fh:
+                record = json.loads(line)
+                if not since <= record['ts'] <= until:
+                    continue
+                rerun = reruns.setdefault(record['rerun_id'], {'rerun': record['rerun_ms']})
+                if record['depth'] == 0:
+                    rerun[record['stage']] = rerun.get(record['stage'], 0.0) + record['wall_ms']
+    except OSError:
+        return {}
+    return {stage: _percentiles([r.get(stage, 0.0) for r in reruns.values()]) for stage in ['rerun', *STAGES]}
+
+
+def _ms(value):
+    return f"{value * 1000:.0f}" if value is not None else '-'
+
+
+def report_level(sessions, results, stages):
+    start, end = results['window']
+    latencies = [elapsed for _, elapsed in results['reruns']]
+    pct = _percentiles(latencies)
+    rss = [mb for _, mb in results['rss'] if mb is not None]
+    level = {
+        'sessions': sessions,
+        'reruns': len(latencies),
+        'reruns_per_s': len(latencies) / (end - start),
+        'latency_s': pct,
+        'max_s': max(latencies) if latencies else None,
+        'connect_s': _percentiles(results['connect']),
+        'errors': results['errors'],
+        'rss_mb': results['rss'],
+        'rss_peak_mb': max(rss) if rss else None,
+        'by_interaction': {action: _percentiles([e for a, e in results['reruns'] if a == action])
+                           for action in sorted({a for a, _ in results['reruns']})},
+        'server_ms': stages,
+    }
+    print(f"{sessions:>9}{level['reruns']:>8}{level['reruns_per_s']:>9.1f}"
+          + ''.join(f"{_ms(pct[p]):>8}" for p in PERCENTILES)
+          + f"{_ms(level['max_s']):>8}{level['errors']:>7}"
+          + (f"{level['rss_peak_mb']:>10.0f}" if rss else f"{'-':>10}"))
+    for action, p in level['by_interaction'].items():
+        print(f"{'':>9}  {action:<12}" + ' '.join(f"p{q} {_ms(p[q])}" for q in PERCENTILES))
+    if stages:
+        print(f"{'':>9}  server ms  " + '  '.join(
+            f"{stage} {stages[stage][50]:.0f}/{stages[stage][99]:.0f}" for stage in stages if stages[stage][50] is not None)
+            + "  (p50/p99)")
+    if rss:
+        step = max(1, len(results['rss']) // 12)
+        print(f"{'':>9}  RSS MB     " + ' '.join(f"{t:.0f}s:{mb:.0f}" for t, mb in results['rss'][::step]
+                                                  if mb is not None))
+    return level
+
+
+def run_levels(url, pid, spans_path, args):
+    print(f"{'sessions':>9}{'reruns':>8}{'rerun/s':>9}" + ''.join(f"{'p' + str(p) + ' ms':>8}" for p in PERCENTILES)
+          + f"{'max ms':>8}{'errors':>7}{'RSS peak':>10}")
+    levels = []
+    for sessions in args.sessions:
+        results = asyncio.run(run_level(url, pid, sessions, args.duration, args.think_ms / 1000, args.seed,
+                                        args.sample_s))
+        stages = stage_summary(spans_path, *results['window']) if spans_path else {}
+        levels.append(report_level(sessions, results, stages))
+    return levels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 100])
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--duration', type=float, default=30, help='seconds per session count')
+    parser.add_argument('--think-ms', type=float, default=500, help='mean pause between interactions')
+    parser.add_argument('--sample-s', type=float, default=1.0, help='RSS sampling interval')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    parser.add_argument('--url', help='test a running server instead of starting one per scale')
+    parser.add_argument('--pid', type=int, help='process id of the --url server, for RSS')
+    parser.add_argument('--spans-log', help="the --url server's SBE_PROFILE_LOG, for the stage breakdown")
+    parser.add_argument('--output', default='bench_load.json')
+    args = parser.parse_args(argv)
+
+    results = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'cpus': os.cpu_count(),
+               'think_ms': args.think_ms, 'duration_s': args.duration, 'runs': []}
+    if args.url:
+        url = args.url.replace('http', 'ws', 1).rstrip('/')
+        print(f"server {args.url}")
+        results['runs'].append({'url': args.url, 'levels': run_levels(url, args.pid, args.spans_log, args)})
+    for scale in ([] if args.url else args.scales):
+        data_dir = build_scaled_dir(scale, args.work_dir)
+        spans_path = os.path.join(args.work_dir, f'load_spans_{scale}.jsonl')
+        if os.path.exists(spans_path):
+            os.remove(spans_path)
+        port = free_port()
+        with open(os.path.join(args.work_dir, f'load_server_{scale}.log'), 'w') as log:
+            proc = start_server(data_dir, port, spans_path, log)
+            try:
+                url = f'ws://127.0.0.1:{port}'
+                idle = rss_mb(proc.pid)
+                # One session pays for the cold load before any level is timed
+                cold = asyncio.run(run_level(url, proc.pid, 1, 0, 0, args.seed, args.sample_s))
+                print(f"\nscale {scale}: server RSS idle {idle or 0:.0f} MB, cold first rerun "
+                      f"{cold['connect'][0]:.2f}s, RSS after load {rss_mb(proc.pid) or 0:.0f} MB")
+                levels = run_levels(url, proc.pid, spans_path, args)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+        results['runs'].append({'scale': scale, 'idle_rss_mb': idle, 'cold_first_rerun_s': cold['connect'][0],
+                                'levels': levels})
+
+    with open(args.output, 'w') as fh:
+        json.dump(results, fh, indent=2)
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
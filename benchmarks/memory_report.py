@@ -0,0 +1,93 @@
+"""
+Before/after memory report for the lead table load schema.
+
+"Before" reads every CSV with pandas defaults and all columns, as app.py
+did originally; "after" uses data_loader.READ_SCHEMAS (column projection,
+categoricals, int8 flags, int16 week_num). Both go through clean_tables so
+master_enriched is included. Sizes are deep memory_usage() totals.
+
+Usage:
+    python benchmarks/memory_report.py
+    python benchmarks/memory_report.py --scale 100   # synthetic 100x leads
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import pandas as pd  # noqa: E402
+
+import data_loader  # noqa: E402
+from data_loader import IDENTITY_PERIODS, SOURCE_FILES, clean_tables, read_identities  # noqa: E402
+
+LEAD_TABLES = ['master_leads', 'master_leads_weekly', 'master_enriched']
+
+
+def _load(data_dir, schemas):
+    start = time.perf_counter()
+    raw = {
+        name: pd.read_csv(os.path.join(data_dir, filename), **schemas.get(name, {}))
+        for name, filename in SOURCE_FILES.items()
+    }
+    raw.update({f'ids:{name}': read_identities(data_dir, name) for name in IDENTITY_PERIODS})
+    tables = clean_tables(raw)
+    return tables, time.perf_counter() - start
+
+
+def _mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def report(data_dir):
+    before, before_s = _load(data_dir, {})
+    after, after_s = _load(data_dir, data_loader.READ_SCHEMAS)
+
+    print(f"{'table':<24}{'rows':>10}{'cols':>12}{'before MB':>12}{'after MB':>12}{'ratio':>8}")
+    totals = [0.0, 0.0]
+    for name in sorted(after):
+        b, a = _mb(before[name]), _mb(after[name])
+        totals[0] += b
+        totals[1] += a
+        marker = ' *' if name in LEAD_TABLES else ''
+        cols = f"{before[name].shape[1]}->{after[name].shape[1]}"
+        print(f"{name + marker:<24}{len(after[name]):>10,}{cols:>12}{b:>12.2f}{a:>12.2f}{b / a if a else 0:>7.1f}x")
+    print(f"{'total':<24}{'':>10}{'':>12}{totals[0]:>12.2f}{totals[1]:>12.2f}{totals[0] / totals[1]:>7.1f}x")
+    print(f"load + clean time: {before_s:.2f}s -> {after_s:.2f}s   (* lead tables)")
+
+    leads_before, leads_after = before['master_leads_weekly'], after['master_leads_weekly']
+    for label, fn in [
+        ("groupby(channel, country).is_qualified.sum()",
+         lambda df: df.groupby(['channel', 'country'], observed=True)['is_qualified'].sum()),
+        ("channel == 'Google Search' mask", lambda df: df['channel'] == 'Google Search'),
+    ]:
+        timings = []
+        for df in (leads_before, leads_after):
+            start = time.perf_counter()
+            for _ in range(20):
+                fn(df)
+            timings.append((time.perf_counter() - start) / 20 * 1000)
+        print(f"{label:<48}{timings[0]:>8.2f}ms -> {timings[1]:.2f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default=os.path.join(REPO_ROOT, 'data'))
+    parser.add_argument('--scale', type=int, help='use a synthetic copy scaled by this factor')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    data_dir = args.data_dir
+    if args.scale:
+        from bench_pages import build_scaled_dir
+        data_dir = build_scaled_dir(args.scale, args.work_dir)
+    report(data_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Post x region matrix: build and query cost as posts and regions grow.
+
+Generates synthetic regional post exports (each post runs in a random
+subset of regions, with some blank values like the real file) and times
+PostRegionMatrix.build, a per-post ranking over all regions and over half
+of them, the pooled heatmap grid, and ROI bar colors by array comparison
+next to the per-row list comprehension the Creative tab used before. Also
+checks the matrix sums against a pandas groupby of the same rows.
+
+Usage:
+    python benchmarks/post_matrix.py
+    python benchmarks/post_matrix.py --sizes 100x10 5000x1000 --density 0.2
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from chart_layer import MAX_BARS  # noqa: E402
+from post_matrix import POST_MEASURES, PostRegionMatrix  # noqa: E402
+
+
+def synthetic_exports(n_posts, n_regions, density, rng):
+    """(regional rows, per-post totals) shaped like the post performance exports"""
+    posts = np.array([f"Post{i}" for i in range(n_posts)])
+    regions = np.array([f"Region{j}" for j in range(n_regions)])
+    ran = rng.random((n_posts, n_regions)) < density
+    ran[np.arange(n_posts), rng.integers(0, n_regions, n_posts)] = True
+    p, r = np.nonzero(ran)
+    spend = rng.gamma(2.0, 400.0, len(p)).round(2)
+    leads = rng.poisson(spend / 40).astype(float)
+    eligible = rng.binomial(leads.astype(int), 0.3).astype(float)
+    qualified = rng.binomial(eligible.astype(int), 0.4).astype(float)
+    regional = pd.DataFrame({'post_id': posts[p], 'post_type': 'Conversion', 'region': regions[r],
+                             'ad_spend_usd': spend, 'leads': leads, 'eligible_leads': eligible,
+                             'qualified_leads': qualified})
+    for measure in ['eligible_leads', 'qualified_leads']:
+        regional.loc[rng.random(len(regional)) < 0.1, measure] = np.nan
+    totals = regional.groupby('post_id', sort=False)[POST_MEASURES].sum().reset_index()
+    totals.insert(1, 'post_type', 'Conversion')
+    return regional, totals
+
+
+def _ms(fn, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def _list_colors(roi):
+    return ['#22c55e' if x > roi.median() else '#ef4444' for x in roi]
+
+
+def _array_colors(roi):
+    return np.where(roi.to_numpy() > roi.median(), '#22c55e', '#ef4444')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['13x5', '100x10', '1000x100', '5000x1000'],
+                        help='POSTSxREGIONS')
+    parser.add_argument('--density', type=float, default=0.3, help='share of regions each post runs in')
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    print(f"{'posts':>7}{'regions':>8}{'rows':>11}{'build ms':>10}{'all ms':>8}{'half ms':>9}{'grid ms':>9}"
+          f"{'list colors ms':>16}{'array colors ms':>17}")
+    for size in args.sizes:
+        n_posts, n_regions = (int(n) for n in size.split('x'))
+        regional, totals = synthetic_exports(n_posts, n_regions, args.density, rng)
+        build_ms, matrix = _ms(lambda: PostRegionMatrix.build(regional, totals), repeats=1)
+        half = tuple(matrix.regions[::2])
+        all_ms, ranked = _ms(lambda: matrix.by_post())
+        half_ms, sliced = _ms(lambda: matrix.by_post(half))
+        grid_ms, _ = _ms(lambda: matrix.grid(half, max_rows=MAX_BARS, max_cols=MAX_BARS))
+        roi = ranked['roi_score'].dropna()
+        list_ms, _ = _ms(lambda: _list_colors(roi), repeats=1)
+        array_ms, _ = _ms(lambda: _array_colors(roi))
+
+        expected = regional[regional['region'].isin(half)].groupby('post_id')[POST_MEASURES].sum(min_count=1)
+        actual = sliced[POST_MEASURES].dropna(how='all')
+        pd.testing.assert_frame_equal(actual.sort_index(), expected.sort_index(), check_names=False)
+        print(f"{n_posts:>7,}{n_regions:>8,}{len(regional):>11,}{build_ms:>10.1f}{all_ms:>8.2f}{half_ms:>9.2f}"
+              f"{grid_ms:>9.2f}{list_ms:>16.1f}{array_ms:>17.2f}")
+    print("region slices match a pandas groupby of the same rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
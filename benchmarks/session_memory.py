@@ -0,0 +1,85 @@
+"""
+Per-session memory overhead of the data cache, before and after the shared
+datastore.
+
+"Before" wraps app.build_data in st.cache_data, as load_data was originally:
+every call unpickles a private copy of all tables. "After" is app.load_data,
+which returns the one read-only DataStore from st.cache_resource. For N
+simulated concurrent sessions, each loads the data, takes the filtered lead
+rows (app.filter_rows) and keeps them alive (as an in-flight rerun would); the report shows the
+traced memory held per session and the median load latency.
+
+Usage:
+    python benchmarks/session_memory.py
+    python benchmarks/session_memory.py --sessions 50 --scale 100
+"""
+
+import argparse
+import gc
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+FILTERS = {'channel': 'Google Search', 'country': 'All', 'priority': 'All', 'week_range': (14, 48)}
+
+
+def _measure(load, tables_of, sessions):
+    """(bytes held per session, median load ms) for `sessions` live sessions"""
+    import app
+
+    tables_of(load())  # warm the cache outside the measurement
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    held, latencies = [], []
+    for _ in range(sessions):
+        start = time.perf_counter()
+        data = tables_of(load())
+        latencies.append((time.perf_counter() - start) * 1000)
+        rows = app.filter_rows(data, FILTERS)
+        held.append(data['master_enriched'] if rows is None else data['master_enriched'].take(rows))
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return (current - base) / sessions, statistics.median(latencies)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--scale', type=int, help='use a synthetic copy scaled by this factor')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    if args.scale:
+        import data_loader
+        from bench_pages import build_scaled_dir
+        # load_data reads data_loader.BASE_DIR, so point it at the copy
+        data_loader.BASE_DIR = build_scaled_dir(args.scale, args.work_dir)
+
+    import streamlit as st
+    import app
+
+    logging.disable(logging.WARNING)  # bare-mode "no ScriptRunContext" noise
+
+    legacy_load = st.cache_data(app.build_data)
+    before = _measure(legacy_load, lambda data: data, args.sessions)
+    after = _measure(app.load_data, lambda store: store.tables, args.sessions)
+    shared = app.load_data().nbytes()
+
+    print(f"{args.sessions} sessions; shared datastore holds {shared / 2**20:.2f} MB once per process")
+    print(f"{'':<26}{'KB/session':>12}{'load ms':>10}")
+    print(f"{'before (cache_data copy)':<26}{before[0] / 1024:>12.1f}{before[1]:>10.2f}")
+    print(f"{'after (shared datastore)':<26}{after[0] / 1024:>12.1f}{after[1]:>10.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Cold-start benchmark: import-time profile and time to first paint.
+
+Every sample is a fresh interpreter, like a container scaled up from zero.
+The worker imports Streamlit (paid by `streamlit run` before app.py runs),
+then executes app.py once through AppTest with the page preselected, and
+records when the first delta (the first element a browser would paint) is
+enqueued and when the script finishes. Separately, `python -X importtime`
+lists what `import app` itself pulls in.
+
+Usage:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --repeats 5 --output startup.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_ROOT, 'app.py')
+
+PAGES = ["📊 Overview", "📈 Performance", "🤖 Models", "💡 Recommendations"]
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'plotly.graph_objects', 'plotly.express']
+
+
+def run_worker(page):
+    start = time.perf_counter()
+    logging.disable(logging.WARNING)
+    from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+    from streamlit.testing.v1 import AppTest
+    streamlit_s = time.perf_counter() - start
+
+    first_delta = []
+    enqueue = ForwardMsgQueue.enqueue
+
+    def timed_enqueue(self, msg):
+        if not first_delta and msg.WhichOneof('type') == 'delta':
+            first_delta.append(time.perf_counter())
+        return enqueue(self, msg)
+
+    ForwardMsgQueue.enqueue = timed_enqueue
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    at.session_state['page'] = page
+    start = time.perf_counter()
+    at.run()
+    finished = time.perf_counter()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return {
+        'streamlit_import_s': streamlit_s,
+        'first_paint_s': first_delta[0] - start,
+        'full_render_s': finished - start,
+        'loaded': [m for m in HEAVY_MODULES if m in sys.modules],
+    }
+
+
+def import_profile(top=12):
+    """(cumulative ms of `import app`, [(ms, module)] for its direct imports)"""
+    cmd = [sys.executable, '-X', 'importtime', '-c', 'import streamlit; import app']
+    err = subprocess.run(cmd, cwd=REPO_ROOT, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if line.startswith('import time:') and '[us]' not in line:
+            _, cumulative, name = line.split(':', 1)[1].split('|')
+            rows.append((int(cumulative) / 1000, name.rstrip()))
+    app_at = max(i for i, (_, name) in enumerate(rows) if name == ' app')
+    block_start = max((i for i, (_, name) in enumerate(rows[:app_at]) if not name.startswith('  ')), default=-1) + 1
+    children = [(ms, name.strip()) for ms, name in rows[block_start:app_at] if name.startswith('   ') and not name.startswith('    ')]
+    return rows[app_at][0], sorted(children, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        json.dump(run_worker(args.worker), sys.stdout)
+        return 0
+
+    total_ms, children = import_profile()
+    print(f"import app: {total_ms:.0f}ms cumulative (after streamlit)")
+    for ms, name in children:
+        print(f"    {ms:8.1f}ms  {name}")
+
+    results = {'import_app_ms': total_ms, 'import_children_ms': dict((n, ms) for ms, n in children), 'pages': {}}
+    print(f"\n{'page':<22}{'first paint s':>15}{'full render s':>15}  heavy modules loaded")
+    for page in PAGES:
+        samples = []
+        for _ in range(args.repeats):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', page],
+                                 cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout
+            samples.append(json.loads(out))
+        summary = {
+            'first_paint_s': statistics.median(s['first_paint_s'] for s in samples),
+            'full_render_s': statistics.median(s['full_render_s'] for s in samples),
+            'streamlit_import_s': statistics.median(s['streamlit_import_s'] for s in samples),
+            'loaded': samples[-1]['loaded'],
+        }
+        results['pages'][page] = summary
+        print(f"{page:<22}{summary['first_paint_s']:>15.3f}{summary['full_render_s']:>15.3f}  {', '.join(summary['loaded'])}")
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Peak memory and exactness of streaming vs in-memory lead ingestion.
+
+For each scale, builds the lead cube and cost ledger twice: from the fully
+loaded tables (data_loader.load_tables, no snapshot) and by streaming
+master_leads_weekly.csv in chunks (streaming.load_streaming). Reports the
+tracemalloc peak and wall time of both, and exits non-zero if the cube
+cells or ledger matrices differ.
+
+Usage:
+    python benchmarks/stream_ingest.py
+    python benchmarks/stream_ingest.py --scales 10 100 1000 --chunk-rows 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from bench_pages import build_scaled_dir  # noqa: E402
+from cost_ledger import CostLedger  # noqa: E402
+from cube import LeadCube  # noqa: E402
+from data_loader import load_tables  # noqa: E402
+from streaming import CHUNK_ROWS, load_streaming  # noqa: E402
+
+
+def _in_memory(data_dir, chunk_rows):
+    tables, _ = load_tables(data_dir, use_snapshot=False)
+    return tables, LeadCube.build(tables['master_leads_weekly'], tables['country_attr'])
+
+
+def _streaming(data_dir, chunk_rows):
+    tables, _ = load_streaming(data_dir, chunk_rows)
+    return tables, LeadCube.from_counts(tables.pop('lead_counts'), tables['country_attr'])
+
+
+def _measure(build, data_dir, chunk_rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    tables, cube = build(data_dir, chunk_rows)
+    ledger = CostLedger.build(tables['channels_combined'], cube)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return cube, ledger, elapsed, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    print(f"{'scale':>6}{'leads':>12}{'memory MB':>11}{'stream MB':>11}{'memory s':>10}{'stream s':>10}")
+    for scale in args.scales:
+        data_dir = build_scaled_dir(scale, args.work_dir)
+        cube_a, ledger_a, secs_a, peak_a = _measure(_in_memory, data_dir, args.chunk_rows)
+        cube_b, ledger_b, secs_b, peak_b = _measure(_streaming, data_dir, args.chunk_rows)
+        try:
+            pd.testing.assert_frame_equal(cube_a.cells, cube_b.cells)
+        except AssertionError as err:
+            print(f"MISMATCH in cube cells at {scale}x: {err}")
+            return 1
+        if not (np.array_equal(ledger_a.leads, ledger_b.leads) and np.array_equal(ledger_a.spend, ledger_b.spend)):
+            print(f"MISMATCH in cost ledger at {scale}x")
+            return 1
+        print(f"{scale:>6}{cube_a.totals()['lead_count']:>12,}{peak_a / 2**20:>11.1f}{peak_b / 2**20:>11.1f}"
+              f"{secs_a:>10.2f}{secs_b:>10.2f}")
+    print("cube cells and cost ledger identical at every scale")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
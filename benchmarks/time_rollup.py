@@ -0,0 +1,103 @@
+"""
+Time hierarchy: calendar check and cost of switching grain.
+
+Checks that the report-week calendar (time_rollup.week_start) agrees with
+the start date in every week's source_file name, and prints the monthly
+rollup of the weekly export next to master_leads_monthly.csv (a separate
+export, so small differences are expected). Then, per scale, times a grain
+switch as TimeRollup.slice against regrouping the raw weekly leads by
+period with pandas, and checks the two agree.
+
+Usage:
+    python benchmarks/time_rollup.py
+    python benchmarks/time_rollup.py --scales 1 100 1000
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from bench_pages import build_scaled_dir  # noqa: E402
+from cube import LeadCube  # noqa: E402
+from data_loader import BASE_DIR, load_tables  # noqa: E402
+from time_rollup import GRAINS, TimeRollup, period_labels, week_start  # noqa: E402
+
+FILTERS = {'channel': 'All', 'country': 'All', 'priority': 'All', 'week_range': (14, 48)}
+
+
+def check_calendar(leads):
+    """Week numbers whose source_file start date disagrees with week_start"""
+    labels = leads.groupby('week_num', observed=True)['source_file'].first()
+    starts = pd.DatetimeIndex(week_start(labels.index.to_numpy()))
+    wrong = []
+    for (week, label), start in zip(labels.items(), starts):
+        match = re.search(r'report - ([A-Za-z]+)\s*(\d+)', str(label))
+        if not match or match.group(1)[:3] != start.strftime('%b') or int(match.group(2)) != start.day:
+            wrong.append(week)
+    return wrong
+
+
+def regroup(leads, grain):
+    """The pre-rollup path: label every lead and group the raw rows"""
+    leads = leads[leads['is_primary'] == 1]
+    weeks = leads['week_num'].to_numpy()
+    unique, inverse = np.unique(weeks, return_inverse=True)
+    period = period_labels(unique, grain)[inverse]
+    return leads.groupby(period, sort=False)['is_qualified'].agg(['size', 'sum'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'sbe_bench'))
+    args = parser.parse_args(argv)
+
+    tables, _ = load_tables(BASE_DIR)
+    leads = tables['master_leads_weekly']
+    wrong = check_calendar(leads)
+    print(f"calendar: {leads['week_num'].nunique() - len(wrong)}/{leads['week_num'].nunique()} report weeks match "
+          f"their source_file start date" + (f"; mismatched weeks {wrong}" if wrong else ""))
+
+    rollup = TimeRollup.build(LeadCube.build(leads, tables['country_attr']))
+    months = rollup.slice(FILTERS, 'Month').set_index('period')['lead_count']
+    monthly = tables['master_leads_monthly']
+    monthly = monthly.loc[monthly['is_primary'] == 1, 'month_year'].astype(str)
+    exported = monthly.value_counts().rename(lambda m: pd.Period(m, 'M').strftime('%b %Y'))
+    print(f"\n{'month':<10}{'weekly rollup':>15}{'monthly export':>16}")
+    for month in months.index:
+        print(f"{month:<10}{months[month]:>15,}{exported.get(month, 0):>16,}")
+
+    print(f"\n{'scale':>6}{'leads':>12}{'build ms':>10}" + ''.join(f"{g + ' ms':>11}{'regroup ms':>12}" for g in GRAINS))
+    for scale in args.scales:
+        tables, _ = load_tables(build_scaled_dir(scale, args.work_dir))
+        leads = tables['master_leads_weekly']
+        cube = LeadCube.build(leads, tables['country_attr'])
+        start = time.perf_counter()
+        rollup = TimeRollup.build(cube)
+        row = f"{scale:>6}{len(leads):>12,}{(time.perf_counter() - start) * 1000:>10.1f}"
+        for grain in GRAINS:
+            start = time.perf_counter()
+            trend = rollup.slice(FILTERS, grain)
+            slice_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            grouped = regroup(leads, grain)
+            regroup_ms = (time.perf_counter() - start) * 1000
+            grouped = grouped.reindex(trend['period'].to_numpy())
+            assert np.array_equal(grouped['size'].to_numpy(), trend['lead_count'].to_numpy())
+            assert np.array_equal(grouped['sum'].to_numpy(), trend['qualified_sum'].to_numpy())
+            row += f"{slice_ms:>11.2f}{regroup_ms:>12.2f}"
+        print(row)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,274 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - CACHE WARMER
+# Builds likely Overview/Performance results in the background after a load
+# ============================================================================
+#
+# Without warming, the first session to pick a filter combination after a
+# deploy or data refresh pays for the slice, rollups and figure builds.
+# Once load_data has a data version, a daemon thread walks a plan: every
+# filter at All, then each single-dimension selection over the full week
+# range (most used values first), then the combinations sessions picked
+# most often according to the usage log (SBE_USAGE_LOG, JSONL, one line
+# per changed sidebar selection; only the last SBE_USAGE_WINDOW lines are
+# read). Results go into the shared figure cache under the keys the pages
+# look up.
+#
+# Limits: the thread waits while any interactive rerun is running and
+# sleeps between builds so it uses at most SBE_WARM_CPU_SHARE of a core.
+# It adds at most SBE_WARM_MAX_ENTRIES cache entries, never evicts for them
+# (warmed entries sit at the least-recently-used end) and stops once the
+# process RSS passes SBE_WARM_MAX_RSS_MB (0: no ceiling). A newer data
+# version stops the previous warmer. SBE_WARM=0 disables warming.
+# Measured by benchmarks/cache_warmer.py.
+
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+from figure_cache import filter_key
+
+ENABLED = os.environ.get("SBE_WARM", "1") not in ("", "0")
+CPU_SHARE = float(os.environ.get("SBE_WARM_CPU_SHARE", "0.25"))
+MAX_ENTRIES = int(os.environ.get("SBE_WARM_MAX_ENTRIES", "128"))
+MAX_RSS_MB = float(os.environ.get("SBE_WARM_MAX_RSS_MB", "0"))
+USAGE_LOG = os.environ.get("SBE_USAGE_LOG", "usage_log.jsonl")
+USAGE_WINDOW = int(os.environ.get("SBE_USAGE_WINDOW", "5000"))
+
+DIMENSIONS = ('channel', 'country', 'priority')
+# Quiet time after the last interactive rerun before a build starts
+IDLE_GRACE = 0.2
+
+_log_lock = threading.Lock()
+_active = 0
+_active_lock = threading.Lock()
+_idle = threading.Event()
+_idle.set()
+_last_rerun_end = 0.0
+_warmer = None
+_warmer_lock = threading.Lock()
+
+# ============================================================================
+# INTERACTIVE RERUNS
+# ============================================================================
+
+@contextlib.contextmanager
+def interactive():
+    """Marks a script rerun in progress; the warmer does not start builds until none is"""
+    global _active, _last_rerun_end
+    with _active_lock:
+        _active += 1
+        _idle.clear()
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active -= 1
+            _last_rerun_end = time.monotonic()
+            if _active == 0:
+                _idle.set()
+
+
+def _wait_idle(cancelled):
+    """Block until no rerun has run for IDLE_GRACE seconds; False if cancelled meanwhile"""
+    while not cancelled.is_set():
+        if not _idle.wait(IDLE_GRACE):
+            continue
+        quiet = time.monotonic() - _last_rerun_end
+        if quiet >= IDLE_GRACE:
+            return True
+        cancelled.wait(IDLE_GRACE - quiet)
+    return False
+
+# ============================================================================
+# USAGE LOG
+# ============================================================================
+
+def _selection(filters):
+    return filter_key(filters) + (filters['grain'],)
+
+
+def record_usage(filters, path=USAGE_LOG):
+    """Append one sidebar selection to the usage log"""
+    if not path:
+        return
+    channel, country, priority, week_min, week_max, grain = _selection(filters)
+    line = json.dumps({'ts': time.time(), 'channel': channel, 'country': country, 'priority': priority,
+                       'week_range': [week_min, week_max], 'grain': grain})
+    try:
+        with _log_lock, open(path, 'a') as fh:
+            fh.write(line + '\n')
+    except OSError:
+        pass
+
+
+def ranked_usage(path=USAGE_LOG, window=USAGE_WINDOW):
+    """
+    [(filters, count)] over the last `window` logged selections, most
+    frequent first. A log past twice the window is cut back to it.
+    """
+    lines, total = collections.deque(maxlen=window), 0
+    try:
+        with _log_lock, open(path) as fh:
+            for line in fh:
+                lines.append(line)
+                total += 1
+            if total > 2 * window:
+                with open(path + '.tmp', 'w') as out:
+                    out.writelines(lines)
+                os.replace(path + '.tmp', path)
+    except OSError:
+        return []
+    counts = collections.Counter()
+    for line in lines:
+        try:
+            entry = json.loads(line)
+            week_min, week_max = entry['week_range']
+            counts[(entry['channel'], entry['country'], entry['priority'], int(week_min), int(week_max),
+                    entry['grain'])] += 1
+        except (ValueError, KeyError, TypeError):
+            continue
+    return [({'channel': channel, 'country': country, 'priority': priority, 'week_range': (week_min, week_max),
+              'grain': grain}, count)
+            for (channel, country, priority, week_min, week_max, grain), count in counts.most_common()]
+
+# ============================================================================
+# PLAN
+# ============================================================================
+
+def warm_plan(options, usage=()):
+    """
+    Filter dicts in warming order for the sidebar `options`: everything at
+    All, each single-dimension selection over the full week range, then the
+    logged `usage` combinations. Logged values the data no longer offers are
+    dropped and week ranges are clipped to the current bounds.
+    """
+    week_min, week_max = (int(week) for week in options['week_bounds'])
+    default = {'channel': 'All', 'country': 'All', 'priority': 'All', 'week_range': (week_min, week_max),
+               'grain': options['grains'][0]}
+    used = collections.Counter()
+    for filters, count in usage:
+        for dim in DIMENSIONS:
+            used[dim, filters[dim]] += count
+    singles = sorted(((dim, value) for dim in DIMENSIONS for value in options[dim] if value != 'All'),
+                     key=lambda single: -used[single])
+
+    logged = []
+    for filters, _ in usage:
+        if filters['grain'] not in options['grains'] or any(filters[dim] not in options[dim] for dim in DIMENSIONS):
+            continue
+        low, high = max(filters['week_range'][0], week_min), min(filters['week_range'][1], week_max)
+        if low <= high:
+            logged.append({**filters, 'week_range': (low, high)})
+
+    plan, seen = [], set()
+    for filters in [default] + [{**default, dim: value} for dim, value in singles] + logged:
+        if _selection(filters) not in seen:
+            seen.add(_selection(filters))
+            plan.append(filters)
+    return plan
+
+# ============================================================================
+# WARMER
+# ============================================================================
+
+def _rss_mb():
+    """Resident set size of this process in MB, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class CacheWarmer(threading.Thread):
+    """
+    Fills a FigureLRU for one data version. `plan()` returns filter dicts
+    in order; `entries(filters)` returns (key, builder) pairs for them. Both
+    run on this thread, inside the idle wait and CPU budget.
+    """
+
+    def __init__(self, version, cache, plan, entries, cpu_share=CPU_SHARE, max_entries=MAX_ENTRIES,
+                 max_rss_mb=MAX_RSS_MB):
+        super().__init__(name=f'cache-warmer-{version}', daemon=True)
+        self.version = version
+        self.cache = cache
+        self._plan = plan
+        self._entries = entries
+        self.cpu_share = min(max(cpu_share, 0.01), 1.0)
+        self.max_entries = max_entries
+        self.max_rss_mb = max_rss_mb
+        self._cancelled = threading.Event()
+        self.built = 0
+        self.combinations = 0
+        self.busy_s = 0.0
+        self.stopped = None
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _timed(self, work):
+        """Run `work` once the app is idle, then sleep to hold the CPU share; (ok, result)"""
+        if not _wait_idle(self._cancelled):
+            return False, None
+        start = time.perf_counter()
+        result = work()
+        elapsed = time.perf_counter() - start
+        self.busy_s += elapsed
+        return not self._cancelled.wait(elapsed * (1 - self.cpu_share) / self.cpu_share), result
+
+    def _limit_reached(self):
+        if self.built >= self.max_entries:
+            return 'entry budget'
+        if len(self.cache) >= self.cache.maxsize:
+            return 'cache full'
+        if self.max_rss_mb:
+            rss = _rss_mb()
+            if rss is not None and rss >= self.max_rss_mb:
+                return 'memory ceiling'
+        return None
+
+    def _warm(self):
+        ok, plan = self._timed(self._plan)
+        for filters in plan if ok else ():
+            ok, entries = self._timed(lambda: self._entries(filters))
+            for key, builder in entries if ok else ():
+                stopped = self._limit_reached()
+                if stopped:
+                    return stopped
+                ok, built = self._timed(lambda: self.cache.prefill(key, builder))
+                if not ok:
+                    break
+                self.built += built
+            if not ok:
+                return 'cancelled'
+            self.combinations += 1
+        return 'cancelled' if not ok else 'plan done'
+
+    def run(self):
+        try:
+            self.stopped = self._warm()
+        except Exception as e:  # a failed build must not take the server down; sessions build on demand
+            self.stopped = f'error: {e!r}'
+
+
+def warm(version, cache, plan, entries, **limits):
+    """Start a CacheWarmer for `version` unless one already has; cancels the one for an older version"""
+    global _warmer
+    with _warmer_lock:
+        if _warmer is not None and _warmer.version == version:
+            return _warmer
+        if _warmer is not None:
+            _warmer.cancel()
+        _warmer = CacheWarmer(version, cache, plan, entries, **limits)
+        _warmer.start()
+        return _warmer
+
+
+def current_warmer():
+    return _warmer
@@ -0,0 +1,90 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - CHART LAYER
+# Point and category budgets for Plotly traces sent to the browser
+# ============================================================================
+#
+# Every point of a trace is serialized to JSON, sent over the websocket and
+# drawn by the browser, so figures are bounded here rather than at the data
+# layer. Line series longer than SBE_CHART_MAX_POINTS are decimated with
+# Largest-Triangle-Three-Buckets (LTTB), which keeps the peaks and troughs
+# that give a series its shape, and are drawn with WebGL (Scattergl) instead
+# of SVG. Category charts with more than SBE_CHART_MAX_BARS rows keep the
+# largest ones and fold the rest into an "Other" row. The weekly, monthly
+# and quarterly series and the current category counts are all under the
+# defaults, so these only engage at larger scales.
+# Measured by benchmarks/chart_payload.py.
+
+import os
+
+import numpy as np
+
+MAX_POINTS = int(os.environ.get("SBE_CHART_MAX_POINTS", "2000"))
+MAX_BARS = int(os.environ.get("SBE_CHART_MAX_BARS", "25"))
+OTHER_LABEL = "Other"
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of at most `threshold` points of (x, y) chosen by LTTB, first
+    and last included. NaN values of y are skipped; x must be increasing.
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    finite = np.flatnonzero(np.isfinite(y))
+    n = len(finite)
+    if threshold >= n or n <= 2:
+        return finite
+    threshold = max(threshold, 3)
+    fx, fy = x[finite], y[finite]
+    # Interior points split into threshold - 2 buckets of near-equal size
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    sizes = np.diff(edges)
+    # Third vertex per bucket: mean of the next bucket, the last point for the final one
+    cx = np.append(np.add.reduceat(fx[1:n - 1], edges[:-1] - 1) / sizes, fx[-1])[1:]
+    cy = np.append(np.add.reduceat(fy[1:n - 1], edges[:-1] - 1) / sizes, fy[-1])[1:]
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        ax, ay = fx[previous], fy[previous]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((ax - cx[b]) * (fy[lo:hi] - ay) - (ax - fx[lo:hi]) * (cy[b] - ay))
+        previous = lo + int(area.argmax())
+        selected[b + 1] = previous
+    return finite[selected]
+
+
+def line_trace(x, y, max_points=MAX_POINTS, **kwargs):
+    """
+    go.Scatter for (x, y), or a decimated go.Scattergl when the series has
+    more than `max_points` points. Markers are dropped when decimating: at
+    that density they hide the line. Non-numeric x (period labels) is
+    decimated by position.
+    """
+    import plotly.graph_objects as go
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    if len(y) <= max_points:
+        return go.Scatter(x=x, y=y, **kwargs)
+    position = x if np.issubdtype(x.dtype, np.number) else np.arange(len(x))
+    keep = lttb(position, y, max_points)
+    kwargs.pop('marker', None)
+    if 'mode' in kwargs:
+        kwargs['mode'] = 'lines'
+    return go.Scattergl(x=x[keep], y=y[keep], **kwargs)
+
+
+def cap_categories(frame, by, max_bars=MAX_BARS):
+    """
+    Index-labelled frame of additive measures limited to `max_bars` rows:
+    the largest max_bars - 1 by `by`, then an OTHER_LABEL row summing the
+    rest. Ratios must be recomputed from the summed measures afterwards.
+    Returned unchanged when already within the limit.
+    """
+    import pandas as pd
+    if len(frame) <= max_bars:
+        return frame
+    ranked = frame.sort_values(by, ascending=False)
+    top, rest = ranked.iloc[:max_bars - 1], ranked.iloc[max_bars - 1:]
+    other = pd.DataFrame([rest.sum(numeric_only=True)], index=pd.Index([OTHER_LABEL], name=frame.index.name))
+    return pd.concat([top, other])
@@ -0,0 +1,139 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - COST LEDGER
+# Weekly spend per channel with cumulative sums for range lookups
+# ============================================================================
+
+import numpy as np
+import pandas as pd
+
+
+class CostLedger:
+    """
+    Spend per (channel, week_num) on a dense week axis.
+
+    Week-range spend is a difference of cumulative sums. Costs carry no
+    country, so each channel-week's spend is allocated to countries by the
+    share of that week's channel leads from each country. A channel-week
+    with spend but no leads is allocated by the channel's country mix over
+    all weeks (the mix of every lead when the channel has none), so the
+    countries' spend sums to the unfiltered spend whenever every lead has a
+    country. The allocation is summed per country and per market priority
+    and cumulated once at build time; a filtered lookup is then the same
+    two-sum difference as an unfiltered one.
+    """
+
+    def __init__(self, channels, first_week, spend, leads, countries, country_priority, priorities, allocated):
+        self.channels = channels
+        self.first_week = first_week
+        self.spend = spend
+        self.leads = leads
+        self.countries = countries
+        self.country_priority = country_priority
+        self.priorities = priorities
+        # cumulative[:, i] = spend over the first i weeks
+        self.cumulative = self._cumulate(spend)
+        # by_country[k] / by_priority[p]: the same for the spend allocated to country k / priority p
+        self.by_country = self._cumulate(allocated)
+        priority_spend = np.zeros((len(priorities),) + spend.shape)
+        known = country_priority >= 0
+        np.add.at(priority_spend, country_priority[known], allocated[known])
+        self.by_priority = self._cumulate(priority_spend)
+
+    @staticmethod
+    def _cumulate(spend):
+        cumulative = np.zeros(spend.shape[:-1] + (spend.shape[-1] + 1,))
+        np.cumsum(spend, axis=-1, out=cumulative[..., 1:])
+        return cumulative
+
+    @classmethod
+    def build(cls, channels_combined, cube):
+        """
+        `cube` is the LeadCube; its (channel, country, week_num) roll-up gives
+        the lead denominators. Cost channels already use the lead spelling
+        (dimensions.py).
+        """
+        costs = channels_combined.dropna(subset=['channel', 'week_number']).copy()
+        costs['week_number'] = costs['week_number'].astype(int)
+
+        channels = sorted(costs['channel'].unique())
+        first_week = int(costs['week_number'].min())
+        n_weeks = int(costs['week_number'].max()) - first_week + 1
+
+        c_idx = np.searchsorted(channels, costs['channel'].to_numpy())
+        w_idx = costs['week_number'].to_numpy() - first_week
+        spend = np.zeros((len(channels), n_weeks))
+        np.add.at(spend, (c_idx, w_idx), costs['budget_usd'].fillna(0).to_numpy())
+
+        lead_counts = np.zeros((len(channels), n_weeks))
+        cls._fill(lead_counts, channels, first_week,
+                  cube.rollup('channel', 'week_num')['lead_count'])
+
+        # Lead counts per country x channel x week
+        cells = cube.cells.dropna(subset=['country'])
+        countries = sorted(cells['country'].unique())
+        country_leads = np.zeros((len(countries), len(channels), n_weeks))
+        c = pd.Index(channels).get_indexer(cells['channel'])
+        w = cells['week_num'].to_numpy().astype(int) - first_week
+        keep = (c >= 0) & (w >= 0) & (w < n_weeks)
+        k = pd.Index(countries).get_indexer(cells['country'])
+        np.add.at(country_leads, (k[keep], c[keep], w[keep]), cells['lead_count'].to_numpy()[keep])
+
+        # Country mix per channel over all weeks, for channel-weeks without leads
+        mix = country_leads.sum(axis=2)
+        overall = mix.sum(axis=1, keepdims=True)
+        mix = np.where(mix.sum(axis=0) > 0, mix, overall)
+        mix = np.divide(mix, mix.sum(axis=0), out=np.zeros_like(mix), where=mix.sum(axis=0) > 0)
+        share = np.divide(country_leads, lead_counts, out=np.zeros_like(country_leads), where=lead_counts > 0)
+        share = np.where(lead_counts > 0, share, mix[:, :, None])
+
+        attr = cells.drop_duplicates('country')
+        priorities = sorted(cells['market_priority'].dropna().unique())
+        country_priority = pd.Index(priorities).get_indexer(
+            attr.set_index('country')['market_priority'].reindex(countries))
+        return cls(channels, first_week, spend, lead_counts, countries, country_priority, priorities,
+                   share * spend)
+
+    @staticmethod
+    def _fill(matrix, channels, first_week, counts):
+        """Scatter a (channel, week_num)-indexed Series into a channel x week matrix"""
+        n_weeks = matrix.shape[1]
+        for (channel, week), value in counts.items():
+            w = int(week) - first_week
+            if channel in channels and 0 <= w < n_weeks:
+                matrix[channels.index(channel), w] = value
+
+    def _week_bounds(self, week_range):
+        n_weeks = self.spend.shape[1]
+        lo = min(max(int(week_range[0]) - self.first_week, 0), n_weeks)
+        hi = min(max(int(week_range[1]) - self.first_week + 1, lo), n_weeks)
+        return lo, hi
+
+    def _cumulative(self, filters):
+        """The cumulative spend matrix for the country or priority filter, or None when nothing passes"""
+        if filters['country'] != 'All':
+            if filters['country'] not in self.countries:
+                return None
+            k = self.countries.index(filters['country'])
+            if filters['priority'] != 'All' and (self.country_priority[k] < 0 or
+                                                 self.priorities[self.country_priority[k]] != filters['priority']):
+                return None
+            return self.by_country[k]
+        if filters['priority'] != 'All':
+            if filters['priority'] not in self.priorities:
+                return None
+            return self.by_priority[self.priorities.index(filters['priority'])]
+        return self.cumulative
+
+    def spend_by_channel(self, filters):
+        """{channel: spend} for the channels with cost data, scoped to the filters"""
+        lo, hi = self._week_bounds(filters['week_range'])
+        if filters['channel'] == 'All':
+            selected = range(len(self.channels))
+        elif filters['channel'] in self.channels:
+            selected = [self.channels.index(filters['channel'])]
+        else:
+            return {}
+        cumulative = self._cumulative(filters)
+        if cumulative is None:
+            return {self.channels[c]: 0.0 for c in selected}
+        return {self.channels[c]: float(cumulative[c, hi] - cumulative[c, lo]) for c in selected}
@@ -0,0 +1,131 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - LEAD CUBE
+# Pre-aggregated lead measures for the KPI and chart code
+# ============================================================================
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ['channel', 'country', 'market_priority', 'week_num']
+MEASURES = ['lead_count', 'qualified_sum', 'reachable_sum']
+
+# Sidebar filter key -> cube dimension
+FILTER_DIMENSIONS = {'channel': 'channel', 'country': 'country', 'priority': 'market_priority'}
+
+# Dimensions identifying one weekly time series
+SERIES_KEYS = ['channel', 'country', 'market_priority']
+
+
+def lead_counts(leads):
+    """
+    One row of MEASURES per lead row, keyed by the country-independent
+    dimensions. Only a lead's primary row (is_primary, see dedup.py) counts;
+    its repeat rows carry zeros.
+    """
+    primary = leads['is_primary'].astype('int64')
+    return pd.DataFrame({
+        'channel': leads['channel'],
+        'country': leads['country'],
+        'week_num': leads['week_num'],
+        'lead_count': primary,
+        'qualified_sum': leads['is_qualified'].astype('int64') * primary,
+        'reachable_sum': leads['is_reachable'].astype('int64') * primary,
+    })
+
+
+def series_mask(keys, filters):
+    """Boolean mask of the `keys` rows (one per series) matching the sidebar filters"""
+    mask = np.ones(len(keys), dtype=bool)
+    for key, dim in FILTER_DIMENSIONS.items():
+        if filters[key] != 'All':
+            mask &= (keys[dim] == filters[key]).to_numpy()
+    return mask
+
+
+class LeadCube:
+    """
+    Lead counts and qualified/reachable sums per
+    (channel, country, market_priority, week_num) cell.
+
+    Only cells with leads are stored, counted once per lead_uid. Missing
+    dimension values are kept as their own cells so totals match the
+    number of primary rows; roll-ups drop them the same way a groupby on
+    the raw leads would.
+    """
+
+    def __init__(self, cells):
+        self.cells = cells
+
+    @classmethod
+    def build(cls, leads, country_attr):
+        return cls.from_counts(lead_counts(leads), country_attr)
+
+    @classmethod
+    def from_counts(cls, counts, country_attr):
+        """
+        Cube from (channel, country, week_num) rows carrying partial MEASURES.
+        Cells and categories left without leads are dropped.
+        """
+        priority = country_attr.drop_duplicates('country').set_index('country')['market_priority']
+        frame = counts.assign(market_priority=counts['country'].map(priority))
+        cells = frame.groupby(DIMENSIONS, dropna=False, observed=True, sort=True)[MEASURES].sum().reset_index()
+        cells = cells[cells['lead_count'] != 0].reset_index(drop=True)
+        for dim in ('channel', 'country'):
+            if isinstance(cells[dim].dtype, pd.CategoricalDtype):
+                cells[dim] = cells[dim].cat.remove_unused_categories()
+        return cls(cells)
+
+    def merge(self, delta, country_attr):
+        """
+        Cube with `delta` (lead_counts rows; negated measures remove leads)
+        folded in, matching a cube built from scratch over the same leads.
+        """
+        counts = pd.concat([self.cells.drop(columns='market_priority'), delta], ignore_index=True)
+        for dim in ('channel', 'country'):
+            values = counts[dim].astype(object)
+            counts[dim] = values.astype(pd.CategoricalDtype(sorted(values.dropna().unique())))
+        return LeadCube.from_counts(counts, country_attr)
+
+    def slice(self, filters):
+        """Cells matching the sidebar filters"""
+        cells = self.cells
+        mask = (cells['week_num'] >= filters['week_range'][0]) & (cells['week_num'] <= filters['week_range'][1])
+        for key, dim in FILTER_DIMENSIONS.items():
+            if filters[key] != 'All':
+                mask &= cells[dim] == filters[key]
+        return LeadCube(cells[mask])
+
+    def series(self, measures=MEASURES):
+        """
+        (series keys, week numbers, {measure: series x week array}) with one
+        row per SERIES_KEYS combination and every week from the first to the
+        last, zero where a series had no leads.
+        """
+        cells = self.cells
+        grouped = cells.groupby(SERIES_KEYS, observed=True, dropna=False, sort=True)
+        series = grouped.ngroup().to_numpy()
+        keys = grouped.size().index.to_frame(index=False)
+        first, last = int(cells['week_num'].min()), int(cells['week_num'].max())
+        columns = cells['week_num'].to_numpy() - first
+        matrices = {}
+        for measure in measures:
+            matrix = np.zeros((len(keys), last - first + 1), dtype=cells[measure].dtype)
+            np.add.at(matrix, (series, columns), cells[measure].to_numpy())
+            matrices[measure] = matrix
+        return keys, np.arange(first, last + 1), matrices
+
+    def __len__(self):
+        return len(self.cells)
+
+    def is_empty(self):
+        return len(self.cells) == 0
+
+    def totals(self):
+        return {m: int(self.cells[m].sum()) for m in MEASURES}
+
+    def rollup(self, *dims):
+        """Measures summed over every dimension not in `dims`"""
+        return self.cells.groupby(list(dims), observed=True)[MEASURES].sum()
+
+    def nunique(self, dim):
+        return self.cells[dim].nunique()
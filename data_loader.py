@@ -0,0 +1,448 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - DATA LOADER
+# Reads, cleans and snapshots the dashboard tables
+# ============================================================================
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from dedup import attach_identity, lookup_uids, read_name_keys, resolve_variants
+from dimensions import TABLE_DIMENSIONS, DimensionDictionary
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    feather = None
+
+# Relative path for Streamlit Cloud; SBE_DATA_DIR points benchmarks at synthetic data
+BASE_DIR = os.environ.get("SBE_DATA_DIR", "data")
+SNAPSHOT_DIRNAME = ".snapshot"
+
+# Bump whenever the cleaning logic changes so stale snapshots are rebuilt
+SNAPSHOT_FORMAT = 8
+
+SOURCE_FILES = {
+    'channel_gs': 'channel_costs_GS.csv',
+    'channel_sm': 'channel_costs_SM.csv',
+    'country_attr': 'country_attributes.csv',
+    'master_leads': 'master_leads.csv',
+    'master_leads_weekly': 'master_leads_weekly.csv',
+    'master_leads_monthly': 'master_leads_monthly.csv',
+    'post_perf_totals': 'post_performance_totals_clean.csv',
+    'post_perf_regional': 'post_performance_regional_clean.csv',
+    'weekly_channel_summary': 'weekly_channel_summary.csv',
+}
+
+# ============================================================================
+# LOAD SCHEMA
+# ============================================================================
+
+# Personal name and free-text columns no page uses; never materialized
+LEAD_UNUSED_COLUMNS = {'first_name', 'last_name', 'full_name', 'notes'}
+
+# Low-cardinality lead strings load as categoricals, flags as int8
+LEAD_DTYPES = {
+    'country': 'category',
+    'channel': 'category',
+    'program': 'category',
+    'ad_type': 'category',
+    'platform': 'category',
+    'region': 'category',
+    'post_id': 'category',
+    'reachability': 'category',
+    'status': 'category',
+    'source_file': 'category',
+    'is_reachable': 'int8',
+    'is_qualified': 'int8',
+}
+
+READ_SCHEMAS = {
+    'master_leads': {
+        'usecols': lambda column: column not in LEAD_UNUSED_COLUMNS,
+        'dtype': {
+            **LEAD_DTYPES,
+            'campaign_name': 'category',
+            'report_type': 'category',
+            'date_captured': 'category',
+            'source': 'category',
+            'campaign_type': 'category',
+        },
+    },
+    'master_leads_weekly': {
+        'usecols': lambda column: column not in LEAD_UNUSED_COLUMNS,
+        'dtype': {**LEAD_DTYPES, 'week_number': 'category'},
+    },
+    'master_leads_monthly': {
+        'usecols': lambda column: column not in LEAD_UNUSED_COLUMNS,
+        'dtype': {**LEAD_DTYPES, 'month_year': 'category'},
+    },
+    'country_attr': {
+        'dtype': {'market_priority': 'category', 'region_group': 'category', 'primary_channel': 'category'},
+    },
+}
+
+# Lead exports that get a lead_uid (see dedup.py), and the column whose
+# earliest value marks each lead's primary row
+IDENTITY_PERIODS = {
+    'master_leads': 'date_captured',
+    'master_leads_weekly': 'week_num',
+    'master_leads_monthly': 'month_year',
+}
+
+# ============================================================================
+# CSV READ + CLEAN
+# ============================================================================
+#
+# Loading is a small dependency graph. "csv:<name>" nodes read one source
+# file and "ids:<name>" nodes the name variants of one lead export, which
+# "lead_variants" resolves into the lead registry; the cleaning steps below
+# consume them, and every step starts as soon as its inputs
+# exist. Tables without a cleaning step are the CSV as read. The
+# "dimensions" node builds the DimensionDictionary (dimensions.py) from
+# every dimension source the load reads, and each table's dimension
+# columns are encoded with it.
+
+def sort_categories(frame):
+    """
+    Put categorical columns in sorted category order. read_csv only sorts
+    within its internal parse chunks, so large files otherwise list late
+    values last; streaming and incremental ingestion rely on this order.
+    """
+    for col, dtype in frame.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not dtype.categories.is_monotonic_increasing:
+            frame[col] = frame[col].cat.reorder_categories(dtype.categories.sort_values())
+    return frame
+
+
+def read_source(base_dir, name):
+    return sort_categories(pd.read_csv(os.path.join(base_dir, SOURCE_FILES[name]), **READ_SCHEMAS.get(name, {})))
+
+
+def read_identities(base_dir, name):
+    return read_name_keys(os.path.join(base_dir, SOURCE_FILES[name]))
+
+
+def read_sources(base_dir=BASE_DIR):
+    """Read the raw CSVs into a dict keyed like SOURCE_FILES, plus the "ids:<name>" name variants"""
+    raw = {name: read_source(base_dir, name) for name in SOURCE_FILES}
+    raw.update({f'ids:{name}': read_identities(base_dir, name) for name in IDENTITY_PERIODS})
+    return raw
+
+
+def build_dictionary(*frames, names=()):
+    """DimensionDictionary over the raw frames of the tables in `names`"""
+    return DimensionDictionary.build(dict(zip(names, frames)))
+
+
+def dimension_issues(dictionary):
+    return dictionary.issues
+
+
+def encode_table(frame, dictionary, name):
+    return dictionary.encode(frame, name)
+
+
+def _clean_channel_gs(channel_gs, dictionary):
+    channel_gs['cpl'] = pd.to_numeric(channel_gs['cpl'].replace('#DIV/0!', np.nan), errors='coerce')
+    return dictionary.encode(channel_gs.dropna(subset=['channel']).reset_index(drop=True), 'channel_gs')
+
+
+def _combine_channels(channel_gs, channel_sm):
+    channels_combined = pd.concat([channel_gs, channel_sm], ignore_index=True)
+    channels_combined['cpl'] = pd.to_numeric(channels_combined['cpl'], errors='coerce')
+    return channels_combined
+
+
+def add_week_num(master_leads_weekly):
+    master_leads_weekly['week_num'] = master_leads_weekly['week_number'].str.extract(r'(\d+)', expand=False).astype('int16')
+    return master_leads_weekly
+
+
+def resolve_leads(*keys):
+    """Lead registry (dedup.resolve_variants) over the name variants of every lead export"""
+    return resolve_variants(pd.concat([variants for _, variants in keys], ignore_index=True))
+
+
+def clean_leads(frame, keys, lead_variants, dictionary, name):
+    return attach_identity(dictionary.encode(frame, name), lookup_uids(keys[0], lead_variants), IDENTITY_PERIODS[name])
+
+
+def clean_weekly_leads(master_leads_weekly, keys, lead_variants, dictionary):
+    return clean_leads(add_week_num(master_leads_weekly), keys, lead_variants, dictionary, 'master_leads_weekly')
+
+
+def enrich_countries(master_leads_weekly, country_attr):
+    master_enriched = master_leads_weekly.merge(country_attr, on='country', how='left', suffixes=('', '_country'))
+    # Both keys share the country dtype, so the join runs on codes; a batch
+    # value outside the dictionary widens it, so keep the lead table's dtype
+    master_enriched['country'] = master_enriched['country'].astype(master_leads_weekly['country'].dtype)
+    return master_enriched
+
+
+# Reference and fact tables that only need their dimension columns encoded
+ENCODED_SOURCES = ['channel_sm', 'country_attr', 'post_perf_totals', 'post_perf_regional', 'weekly_channel_summary']
+
+# table -> (input nodes, step)
+CLEAN_STEPS = {
+    'channel_gs': (('csv:channel_gs', 'dimensions'), _clean_channel_gs),
+    **{name: ((f'csv:{name}', 'dimensions'), partial(encode_table, name=name)) for name in ENCODED_SOURCES},
+    'channels_combined': (('channel_gs', 'channel_sm'), _combine_channels),
+    'lead_variants': (tuple(f'ids:{name}' for name in IDENTITY_PERIODS), resolve_leads),
+    'master_leads': (('csv:master_leads', 'ids:master_leads', 'lead_variants', 'dimensions'),
+                     partial(clean_leads, name='master_leads')),
+    'master_leads_weekly': (('csv:master_leads_weekly', 'ids:master_leads_weekly', 'lead_variants', 'dimensions'),
+                            clean_weekly_leads),
+    'master_leads_monthly': (('csv:master_leads_monthly', 'ids:master_leads_monthly', 'lead_variants', 'dimensions'),
+                             partial(clean_leads, name='master_leads_monthly')),
+    'master_enriched': (('master_leads_weekly', 'country_attr'), enrich_countries),
+    'dimension_issues': (('dimensions',), dimension_issues),
+}
+
+TABLES = list(dict.fromkeys([*SOURCE_FILES, *CLEAN_STEPS]))
+
+# Row-per-lead tables; everything else is small reference data
+LEAD_TABLES = ['master_leads', 'master_leads_weekly', 'master_leads_monthly', 'master_enriched']
+
+
+def _timed(node, step, args, timings):
+    start = time.perf_counter()
+    result = step(*args)
+    if timings is not None:
+        timings[node] = time.perf_counter() - start
+    return result
+
+
+def run_graph(graph, executor=None, timings=None):
+    """
+    Evaluate {node: (dependencies, step)} and return {node: result}.
+
+    With an executor, each node is submitted the moment its last dependency
+    finishes; without one the nodes run serially in dependency order.
+    `timings`, if given, receives the seconds each step took.
+    """
+    results, pending, running = {}, dict(graph), {}
+    while pending or running:
+        ready = [node for node, (deps, _) in pending.items() if all(d in results for d in deps)]
+        if not ready and not running:
+            raise ValueError(f"Unresolvable load steps: {', '.join(sorted(pending))}")
+        for node in ready:
+            deps, step = pending.pop(node)
+            args = [results[d] for d in deps]
+            if executor is None:
+                results[node] = _timed(node, step, args, timings)
+            else:
+                running[executor.submit(_timed, node, step, args, timings)] = node
+        if running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+def _tables_from(results, names=TABLES):
+    return {name: results[name] if name in results else results[f'csv:{name}'] for name in names}
+
+
+def _with_dictionary(graph):
+    """`graph` plus the "dimensions" node, reading every dimension source the graph reads"""
+    names = [name for name in TABLE_DIMENSIONS if f'csv:{name}' in graph]
+    return {**graph, 'dimensions': (tuple(f'csv:{name}' for name in names), partial(build_dictionary, names=names))}
+
+
+def _subgraph(graph, names):
+    """Only the nodes needed to produce the tables in `names`"""
+    needed, stack = set(), [name if name in graph else f'csv:{name}' for name in names]
+    while stack:
+        node = stack.pop()
+        if node not in needed:
+            needed.add(node)
+            stack.extend(graph[node][0])
+    return {node: graph[node] for node in graph if node in needed}
+
+
+def clean_tables(raw):
+    """Turn the raw CSV frames into the tables the pages consume"""
+    graph = {name if ':' in name else f'csv:{name}': ((), partial(lambda frame: frame, frame))
+             for name, frame in raw.items()}
+    return _tables_from(run_graph(_with_dictionary({**graph, **CLEAN_STEPS})))
+
+
+def build_tables(base_dir=BASE_DIR, workers=None, timings=None, names=TABLES):
+    """
+    Read the source CSVs on a thread pool and clean as inputs arrive.
+
+    pandas' C parser releases the GIL while tokenizing, so threads overlap
+    the reads without pickling frames between processes. `names` limits the
+    load to those tables and the files they depend on; the dimension
+    dictionary then covers only those files.
+    """
+    graph = {f'csv:{name}': ((), partial(read_source, base_dir, name)) for name in SOURCE_FILES}
+    graph.update({f'ids:{name}': ((), partial(read_identities, base_dir, name)) for name in IDENTITY_PERIODS})
+    graph['dimensions'] = ((), build_dictionary)
+    graph = _with_dictionary(_subgraph({**graph, **CLEAN_STEPS}, names))
+    with ThreadPoolExecutor(max_workers=workers or min(len(SOURCE_FILES), (os.cpu_count() or 1) + 4)) as executor:
+        return _tables_from(run_graph(graph, executor, timings), names)
+
+# ============================================================================
+# SOURCE FINGERPRINTS
+# ============================================================================
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(base_dir=BASE_DIR, previous=None):
+    """
+    Return {filename: {size, mtime_ns, sha256}} for every source CSV.
+
+    Files whose size and mtime match `previous` reuse its hash, so an
+    unchanged tree costs one stat() per file rather than a full read.
+    """
+    previous = previous or {}
+    fingerprint = {}
+    for filename in SOURCE_FILES.values():
+        path = os.path.join(base_dir, filename)
+        stat = os.stat(path)
+        old = previous.get(filename)
+        if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+            sha = old['sha256']
+        else:
+            sha = _file_sha256(path)
+        fingerprint[filename] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha}
+    return fingerprint
+
+
+def data_version(fingerprint):
+    """Short content hash identifying one version of the source data"""
+    digest = hashlib.sha256(f"format={SNAPSHOT_FORMAT}".encode())
+    for filename in sorted(fingerprint):
+        digest.update(f"{filename}:{fingerprint[filename]['sha256']}".encode())
+    return digest.hexdigest()[:12]
+
+
+# Last fingerprint per data directory, so polling the version is stat()-only
+_last_fingerprint = {}
+
+
+def current_version(base_dir=BASE_DIR):
+    """Version of the source files on disk now; cheap enough to call on every rerun"""
+    fingerprint = source_fingerprint(base_dir, _last_fingerprint.get(base_dir))
+    _last_fingerprint[base_dir] = fingerprint
+    return data_version(fingerprint)
+
+
+def table_versions(base_dir=BASE_DIR):
+    """Per-table content versions, so a cache can depend on only the tables it reads"""
+    fingerprint = source_fingerprint(base_dir, _last_fingerprint.get(base_dir))
+    _last_fingerprint[base_dir] = fingerprint
+    return {name: fingerprint[filename]['sha256'][:12] for name, filename in SOURCE_FILES.items()}
+
+# ============================================================================
+# COLUMNAR SNAPSHOT (Arrow IPC / Feather)
+# ============================================================================
+
+def _snapshot_dir(base_dir):
+    return os.path.join(base_dir, SNAPSHOT_DIRNAME)
+
+
+def _read_manifest(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, 'manifest.json')) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        return None
+    return manifest
+
+
+def _write_manifest(snapshot_dir, manifest):
+    tmp_path = os.path.join(snapshot_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(snapshot_dir, 'manifest.json'))
+
+
+def write_snapshot(tables, fingerprint, base_dir=BASE_DIR):
+    """Persist cleaned tables as uncompressed Feather files plus a manifest"""
+    snapshot_dir = _snapshot_dir(base_dir)
+    tmp_dir = snapshot_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for name, df in tables.items():
+        # Uncompressed so the reader can memory-map the column buffers
+        feather.write_feather(df.reset_index(drop=True), os.path.join(tmp_dir, f'{name}.feather'),
+                              compression='uncompressed')
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'version': data_version(fingerprint),
+        'sources': fingerprint,
+        'tables': sorted(tables),
+    }
+    _write_manifest(tmp_dir, manifest)
+
+    # Swap the whole directory so readers never see a half-written snapshot
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    os.replace(tmp_dir, snapshot_dir)
+    return manifest
+
+
+def read_snapshot(manifest, base_dir=BASE_DIR):
+    snapshot_dir = _snapshot_dir(base_dir)
+    return {
+        name: feather.read_feather(os.path.join(snapshot_dir, f'{name}.feather'), memory_map=True)
+        for name in manifest['tables']
+    }
+
+
+def load_tables(base_dir=BASE_DIR, use_snapshot=True, timings=None):
+    """
+    Return (tables, version) for the data directory.
+
+    Reads the columnar snapshot when the source CSVs are unchanged and
+    rebuilds it from CSV otherwise. Falls back to a plain CSV load when
+    pyarrow is unavailable or the snapshot directory is not writable.
+    `timings` receives per-step seconds ("csv:<name>" for file reads).
+    """
+    if not use_snapshot or feather is None:
+        fingerprint = source_fingerprint(base_dir)
+        return build_tables(base_dir, timings=timings), data_version(fingerprint)
+
+    snapshot_dir = _snapshot_dir(base_dir)
+    manifest = _read_manifest(snapshot_dir)
+    previous = manifest['sources'] if manifest else None
+    fingerprint = source_fingerprint(base_dir, previous)
+
+    if manifest and data_version(fingerprint) == manifest['version']:
+        if fingerprint != previous:
+            # Touched but byte-identical files: refresh stat info, keep tables
+            manifest['sources'] = fingerprint
+            try:
+                _write_manifest(snapshot_dir, manifest)
+            except OSError:
+                pass
+        try:
+            return _timed('snapshot', read_snapshot, (manifest, base_dir), timings), manifest['version']
+        except (OSError, ValueError):
+            pass  # Damaged snapshot: rebuild below
+
+    tables = build_tables(base_dir, timings=timings)
+    try:
+        write_snapshot(tables, fingerprint, base_dir)
+    except OSError:
+        pass  # Read-only deployments still work, just without the snapshot
+    return tables, data_version(fingerprint)
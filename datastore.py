@@ -0,0 +1,114 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - SHARED DATASTORE
+# One immutable copy of the loaded tables per process, shared by all sessions
+# ============================================================================
+#
+# st.cache_data pickles its return value and hands every caller a fresh copy;
+# the datastore lives in st.cache_resource instead, so sessions read the same
+# frames. Sharing is only safe if nobody writes to them: each frame is
+# replaced by one over read-only views of its numpy buffers (in-place value
+# writes raise), and verify() catches structural changes such as added
+# columns or in-place sorts. Only public pandas API is used, so this does
+# not depend on pandas' internal block layout.
+
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+
+class SharedDataMutated(RuntimeError):
+    """Page code modified a frame owned by the shared datastore"""
+
+
+def _freeze_array(values):
+    if isinstance(values, np.ndarray):
+        values.flags.writeable = False
+
+
+def _frozen_view(values):
+    """Read-only view of an ndarray; the caller's array stays as it was"""
+    values = values.view()
+    values.flags.writeable = False
+    return values
+
+
+def _frozen_column(column):
+    # numpy dtypes and categorical codes get read-only views; other extension
+    # arrays (Arrow-backed strings, nullable integers) are kept as they are
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(_frozen_view(column.cat.codes.to_numpy()), dtype=column.dtype,
+                                         validate=False)
+    if isinstance(column.dtype, np.dtype):
+        return _frozen_view(column.to_numpy())
+    return column.array
+
+
+def freeze_frame(df):
+    """
+    Copy of `df` over read-only views of its column buffers: in-place value
+    writes to it raise. Built with public pandas API only (no copy of the
+    data), so the caller swaps it in for `df`.
+    """
+    columns = {i: _frozen_column(df.iloc[:, i]) for i in range(df.shape[1])}
+    frozen = pd.DataFrame(columns, index=df.index, copy=False)
+    frozen.columns = df.columns
+    frozen.attrs = df.attrs
+    return frozen
+
+
+def _signature(df):
+    # Cheap enough to check on every rerun: catches column adds/drops,
+    # dtype changes and in-place operations that swap the index
+    return (tuple(df.columns), df.shape, id(df.index), tuple(str(t) for t in df.dtypes))
+
+
+class DataStore:
+    """
+    Read-only tables plus derived structures for one data version.
+
+    `tables` is a mapping proxy over the dict app.build_data returns, so
+    pages index it exactly as before; a dict(data) copy is a shallow copy
+    of references, not of frames.
+    """
+
+    def __init__(self, tables, version):
+        self.version = version
+        self._frames = {}
+        self._frozen = {}
+        for name, value in tables.items():
+            if isinstance(value, pd.DataFrame):
+                tables[name] = self._freeze_frame(name, value)
+            elif hasattr(value, '__dict__'):
+                self._freeze_object(name, value)
+        self._signatures = {name: _signature(df) for name, df in self._frames.items()}
+        self.tables = MappingProxyType(tables)
+
+    def _freeze_frame(self, name, df):
+        # A frame referenced from two places (a table and an object attribute) gets one frozen copy
+        if id(df) not in self._frozen:
+            self._frozen[id(df)] = (df, freeze_frame(df))
+        self._frames[name] = frozen = self._frozen[id(df)][1]
+        return frozen
+
+    def _freeze_object(self, name, obj):
+        # Filter index, lead cube and cost ledger: arrays, dicts of arrays and frames
+        for attr, value in vars(obj).items():
+            if isinstance(value, pd.DataFrame):
+                setattr(obj, attr, self._freeze_frame(f'{name}.{attr}', value))
+            elif isinstance(value, np.ndarray):
+                _freeze_array(value)
+            elif isinstance(value, dict):
+                for inner in value.values():
+                    if isinstance(inner, np.ndarray):
+                        _freeze_array(inner)
+
+    def verify(self):
+        """Raise SharedDataMutated if any shared frame changed shape, columns or dtypes"""
+        changed = [name for name, df in self._frames.items() if _signature(df) != self._signatures[name]]
+        if changed:
+            raise SharedDataMutated(f"Shared data was modified in place: {', '.join(sorted(changed))}")
+
+    def nbytes(self):
+        """Deep memory of the shared frames"""
+        return int(sum(df.memory_usage(deep=True).sum() for df in self._frames.values()))
@@ -0,0 +1,455 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - LEAD DE-DUPLICATION
+# Canonical lead ids across the lead exports from normalized names
+# ============================================================================
+#
+# master_leads.csv, master_leads_weekly.csv and master_leads_monthly.csv
+# list the same people under their own id schemes (LEAD_, WL_, ML_), and a
+# person can appear in several weekly reports. Every row gets a lead_uid
+# computed from its name and country alone:
+#
+#   1. Names are tokenized and each distinct token normalized once: accents
+#      and Arabic diacritics stripped, Arabic letters transliterated,
+#      honorifics dropped, "Al"/"El" joined to the next token.
+#   2. Each token is reduced to a consonant skeleton (first letter, then
+#      consonants with vowels and doubled letters dropped, then whether it
+#      ends in an i-sound). The hash of the normalized country and the
+#      skeleton sequence is the row's block: "Mohamad Haddad" and "Mahmoud
+#      Haddad" share one. Names too short for a reliable block fall back to
+#      a hash of the exact normalized tokens in any order.
+#   3. Each token also gets its spelling(): consonants as in the skeleton
+#      with each run of vowels kept as one sound class. The hash of the block
+#      and the spelling sequence is the row's name variant.
+#   4. Variants are compared only within their block, by name_distance():
+#      vowels inserted or deleted, token by token, with 'e' free to read as
+#      'a' or 'i' and any consonant or other vowel difference a mismatch.
+#      Within MAX_VOWEL_EDITS they are one lead: "Muhammad" / "Mohammed",
+#      "Khaled" / "Khalid", "Mahbubur" / "Mahabubur", but not "Mohamad" /
+#      "Mahmoud" or "Ibrar" / "Abrar". Arabic script does not write short
+#      vowels, so an Arabic token only matches another Arabic spelling; next
+#      to its own Latin spelling in one name ("خالد Khaled Kanaan") it is
+#      dropped. A Latin token repeated ("Ahmad Ahmad Haidar") is a different
+#      name and is kept.
+#   5. Matches join transitively, and each lead's uid is its smallest variant.
+#
+# Rows are hashed in chunks and only their int64 variant is kept; the name
+# columns never reach the tables. The distinct variants, with their block
+# and spellings, form the lead registry (resolve_variants), resolved over
+# every lead export at once so ids agree across files. Pairs are compared
+# only inside a block, so the cost follows the number of spellings of one
+# skeleton rather than the number of leads. Because matching is transitive,
+# a new variant can join two leads; incremental ingestion re-resolves only
+# the blocks its batches touch (update_registry).
+# Measured by benchmarks/lead_dedup.py.
+
+import itertools
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+NAME_COLUMNS = ['lead_id', 'full_name', 'country']
+CHUNK_ROWS = 250_000
+
+# Honorifics carry no identity; common abbreviations are spelled out
+TITLES = {'mr', 'mrs', 'ms', 'miss', 'dr', 'eng', 'arch', 'prof'}
+ABBREVIATIONS = {'md': 'mohammad', 'mohd': 'mohammad', 'muhd': 'mohammad'}
+
+# Spelling keys need at least this many tokens and skeleton letters
+MIN_SKELETON_TOKENS = 2
+MIN_SKELETON_LETTERS = 4
+# Variants of one block are one lead within this many vowel insertions or deletions
+MAX_VOWEL_EDITS = 1
+
+# Alternate spellings of dimension values -> the value the tables use
+COUNTRY_ALIASES = {
+    'saudi arabia': 'KSA',
+    'kingdom of saudi arabia': 'KSA',
+    'united arab emirates': 'UAE',
+    'emirates': 'UAE',
+    'syria': 'Syrian Arab Republic',
+    'lebanese republic': 'Lebanon',
+    'state of qatar': 'Qatar',
+}
+CHANNEL_ALIASES = {
+    'google': 'Google Search',
+    'google ads': 'Google Search',
+    'google_search': 'Google Search',
+    'search': 'Google Search',
+    'meta': 'Social Media',
+    'facebook': 'Social Media',
+    'instagram': 'Social Media',
+    'social': 'Social Media',
+    'social_media': 'Social Media',
+    'linkedin ads': 'LinkedIn',
+    'website': 'Organic',
+}
+
+# Arabic letters -> Latin, by sound; short vowels are not written in Arabic
+ARABIC_LATIN = {
+    'ا': 'a', 'أ': 'a', 'إ': 'a', 'آ': 'a', 'ٱ': 'a', 'ى': 'a', 'ة': 'a', 'ع': 'a',
+    'ء': '', 'ؤ': '', 'ئ': '',
+    'ب': 'b', 'پ': 'p', 'ت': 't', 'ث': 'th', 'ج': 'j', 'ح': 'h', 'خ': 'kh', 'د': 'd',
+    'ذ': 'dh', 'ر': 'r', 'ز': 'z', 'س': 's', 'ش': 'sh', 'ص': 's', 'ض': 'd', 'ط': 't',
+    'ظ': 'z', 'غ': 'gh', 'ف': 'f', 'ق': 'q', 'ك': 'k', 'ک': 'k', 'گ': 'g', 'ل': 'l',
+    'م': 'm', 'ن': 'n', 'ه': 'h', 'و': 'w', 'ي': 'y', 'ی': 'y', 'چ': 'ch',
+    **{chr(0x0660 + d): str(d) for d in range(10)},
+}
+_TRANSLITERATE = str.maketrans(ARABIC_LATIN)
+
+# Applied in order before vowels are dropped. Digraphs become one upper-case
+# symbol: "Shalhoub" and "Salhab" are different names.
+SKELETON_DIGRAPHS = [('kh', 'K'), ('gh', 'G'), ('sh', 'S'), ('ch', 'S'), ('ph', 'f'), ('th', 'T'),
+                     ('dh', 'D'), ('q', 'k'), ('c', 'k'), ('z', 's'), ('v', 'f'), ('p', 'b')]
+SKELETON_VOWELS = set('aeiouyw')
+# Vowel runs -> sound class in spelling(); other runs map letter by letter
+# (o -> u) with repeats collapsed. 'e' stays: it reads as 'a' or as 'i'.
+SPELLING_VOWEL_RUNS = {'ee': 'i', 'ie': 'i', 'oo': 'u', 'ou': 'u', 'ae': 'ai', 'ei': 'ai'}
+_VOWEL_CLASS = str.maketrans('o', 'u')
+_VOWELS = set('aeiu')
+_SILENT_E = {('e', 'a'), ('a', 'e'), ('e', 'i'), ('i', 'e')}
+# y and w closing a vowel are part of it ("Haydar", "Dawlat"), as is a final y ("Aly")
+_GLIDES = [(re.compile(r'(?<=[aeiou])y(?![aeiou])|(?<=[^aeiou])y$'), 'i'),
+           (re.compile(r'(?<=[aeiou])w(?![aeiou])'), 'u')]
+_SOUNDS = re.compile(r'[aeiou]+|[^aeiou]')
+# "الله" is written without the vowel its Latin spellings carry
+ARABIC_WORDS = {'لله': 'llah'}
+
+_SEPARATORS = r"\S*@\S*|[.\-_,;:/'’`()\[\]\"]"
+
+
+def normalize_label(value, aliases):
+    """Trimmed, single-spaced value, or its canonical spelling from `aliases`"""
+    if not isinstance(value, str):
+        return value
+    text = ' '.join(value.split())
+    return aliases.get(text.casefold(), text)
+
+
+def normalize_dimensions(frame):
+    """Lead frame with alternate country and channel spellings folded in"""
+    for col, aliases in (('country', COUNTRY_ALIASES), ('channel', CHANNEL_ALIASES)):
+        if col not in frame:
+            continue
+        values = frame[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories
+            canonical = [normalize_label(c, aliases) for c in categories]
+            if list(categories) != canonical:
+                merged = sorted(set(canonical))
+                codes = pd.Index(merged).get_indexer(canonical)
+                frame[col] = pd.Categorical.from_codes(np.where(values.cat.codes < 0, -1, codes[values.cat.codes]),
+                                                       categories=merged)
+        else:
+            codes, uniques = pd.factorize(values)
+            canonical = np.array([normalize_label(v, aliases) for v in uniques] + [None], dtype=object)
+            frame[col] = pd.array(canonical[codes], dtype=values.dtype)
+    return frame
+
+
+def normalize_token(token):
+    """Lower-case Latin spelling of one name token; '' for tokens that carry no identity"""
+    text = unicodedata.normalize('NFKD', token)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch) and ch != 'ـ')
+    for word, latin in ARABIC_WORDS.items():
+        text = text.replace(word, latin)
+    text = text.lower().translate(_TRANSLITERATE)
+    text = ''.join(ch for ch in text if ch.isascii() and ch.isalnum())
+    if text in TITLES:
+        return ''
+    return ABBREVIATIONS.get(text, text)
+
+
+def skeleton(token):
+    """
+    First letter then the consonants, vowels dropped and doubles collapsed,
+    plus 'i' when the token ends in an i-sound ("Ali" / "علي", "Chrabieh" /
+    "شرابيه"). A final h is silent: "Fatimah" / "Fatima". Tokens that are
+    not all letters are kept as they are.
+    """
+    if not token.isalpha():
+        return token
+    token = token.rstrip('h') if len(token) > 2 else token
+    for digraph, letter in SKELETON_DIGRAPHS:
+        token = token.replace(digraph, letter)
+    # A leading vowel (or Arabic ain) is kept, but its spelling is not
+    head = 'a' if token[0] in SKELETON_VOWELS else token[0]
+    letters = [head]
+    for ch in token[1:]:
+        if ch not in SKELETON_VOWELS and ch != letters[-1]:
+            letters.append(ch)
+    ending = len(token) - len(token.rstrip(''.join(SKELETON_VOWELS)))
+    if len(token) > 1 and ending and set(token[-ending:]) & {'i', 'y'}:
+        letters.append('i')
+    return ''.join(letters)
+
+
+def spelling(token):
+    """
+    Consonants as in skeleton() with each run of vowels reduced to one sound
+    class: "Mohammed" reads "muhamed", "Kareem" / "Karim" read "karim",
+    "Mahmoud" reads "mahmud". Tokens that are not all letters are kept as
+    they are.
+    """
+    if not token.isalpha():
+        return token
+    token = token.rstrip('h') if len(token) > 2 else token
+    for pattern, vowel in _GLIDES:
+        token = pattern.sub(vowel, token)
+    for digraph, letter in SKELETON_DIGRAPHS:
+        token = token.replace(digraph, letter)
+    sounds = []
+    for sound in _SOUNDS.findall(token):
+        if sound[0] in 'aeiou':
+            sound = SPELLING_VOWEL_RUNS.get(sound) or re.sub(r'(.)\1+', r'\1', sound.translate(_VOWEL_CLASS))
+        if not sounds or sound != sounds[-1]:
+            sounds.append(sound)
+    return ''.join(sounds)
+
+
+def _is_arabic(token):
+    return any('\u0600' <= ch <= '\u06ff' for ch in token)
+
+
+def _mix(a, b):
+    """Order-dependent 64-bit combination of two hash arrays (splitmix64 finalizer)"""
+    with np.errstate(over='ignore'):
+        x = (np.asarray(a, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)) ^ b
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _hash_strings(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def _row_sums(values, offsets):
+    """Per-row wrapping sum of `values`, rows given as list offsets"""
+    total = np.concatenate([[np.uint64(0)], np.cumsum(values, dtype=np.uint64)])
+    return total[offsets[1:]] - total[offsets[:-1]]
+
+
+# Salts keep the block, exact and fallback keys in separate hash domains
+_BLOCK_SALT, _EXACT_SALT, _ROW_SALT = np.uint64(1), np.uint64(2), np.uint64(3)
+
+# One row per name variant: its block, its id and the spellings it is compared by
+VARIANT_COLUMNS = ['block', 'variant', 'name']
+
+
+def name_keys(frame):
+    """
+    (variant per row, variants) for a frame with NAME_COLUMNS. A row's
+    variant is an int64 hash of its country and token spellings; `variants`
+    lists each distinct one (VARIANT_COLUMNS) with its block, the hash of the
+    country and skeleton sequence, and its spellings joined by spaces. Names
+    too short for a skeleton key, and rows without a name, are a block of
+    their own with an empty name.
+    """
+    names = pa.array(frame['full_name'].astype('str'), type=pa.large_string(), from_pandas=True)
+    if isinstance(names, pa.ChunkedArray):
+        names = names.combine_chunks()
+    names = pc.replace_substring_regex(pc.utf8_lower(pc.fill_null(names, '')), _SEPARATORS, ' ')
+    names = pc.replace_substring_regex(names, r'\b(al|el) +', r'\1')
+    parts = pc.utf8_split_whitespace(names)
+    offsets = parts.offsets.to_numpy()
+    tokens = pc.dictionary_encode(parts.flatten())
+
+    # Normalize each distinct token once
+    dictionary = tokens.dictionary.to_pylist()
+    normalized = [normalize_token(t) for t in dictionary]
+    skeletons = [skeleton(t) for t in normalized]
+    arabic = np.array([_is_arabic(t) for t in dictionary])
+    # Arabic tokens carry no short vowels to compare; they match Arabic spellings only
+    spellings = [s + '~' if a else spelling(t) for t, s, a in zip(normalized, skeletons, arabic)]
+    valid = np.array([bool(t) for t in normalized])
+    codes = tokens.indices.to_numpy()
+    exact = np.where(valid, _hash_strings(normalized), 0)[codes]
+    token_count = _row_sums(valid[codes].astype(np.uint64), offsets)
+
+    # Token sequence per row, an Arabic token next to its Latin spelling dropped
+    skeleton_codes, _ = pd.factorize(np.asarray(skeletons, dtype=object))
+    keep = valid[codes]
+    row = np.repeat(np.arange(len(frame)), np.diff(offsets))[keep]
+    kept, script = codes[keep], arabic[codes[keep]]
+    pair = ((row[1:] == row[:-1]) & (skeleton_codes[kept[1:]] == skeleton_codes[kept[:-1]])
+            & (script[1:] != script[:-1]))
+    step = np.ones(len(kept), dtype=bool)
+    step[:-1] &= ~(pair & script[:-1])
+    step[1:] &= ~(pair & script[1:])
+    row, kept = row[step], kept[step]
+    starts = np.searchsorted(row, row, side='left')
+    position = (np.arange(len(row)) - starts).astype(np.uint64)
+    skeleton_sum = np.zeros(len(frame), dtype=np.uint64)
+    np.add.at(skeleton_sum, row, _mix(position, _hash_strings(skeletons)[kept]))
+    spelling_sum = np.zeros(len(frame), dtype=np.uint64)
+    np.add.at(spelling_sum, row, _mix(position, _hash_strings(spellings)[kept]))
+    distinct = np.bincount(row, minlength=len(frame))
+    letters = np.bincount(row, weights=np.array([len(s) for s in skeletons])[kept], minlength=len(frame))
+
+    country_codes, countries = pd.factorize(frame['country'])
+    countries = [normalize_label(c, COUNTRY_ALIASES) for c in countries] + ['']
+    country_hash = _hash_strings(np.asarray(countries, dtype=object))[country_codes]
+    keyed = (distinct >= MIN_SKELETON_TOKENS) & (letters >= MIN_SKELETON_LETTERS)
+    exact_keys = _mix(_mix(_EXACT_SALT, country_hash), _row_sums(exact, offsets))
+    blocks = np.where(keyed, _mix(_mix(_BLOCK_SALT, country_hash), skeleton_sum), exact_keys)
+    variants = np.where(keyed, _mix(blocks, spelling_sum), exact_keys)
+    nameless = token_count == 0
+    if nameless.any():
+        lead_ids = frame['lead_id'].astype('str').fillna('').to_numpy()[nameless]
+        blocks[nameless] = variants[nameless] = _mix(_ROW_SALT, _hash_strings(lead_ids))
+    keyed &= ~nameless
+
+    # Spellings of one row per distinct variant
+    _, first = np.unique(variants, return_index=True)
+    lo, hi = np.searchsorted(row, first), np.searchsorted(row, first, side='right')
+    text = [' '.join(spellings[k] for k in kept[a:b]) if named else ''
+            for a, b, named in zip(lo, hi, keyed[first])]
+    table = pd.DataFrame({'block': blocks[first].view(np.int64), 'variant': variants[first].view(np.int64),
+                          'name': pd.array(text, dtype='str')})
+    return variants.view(np.int64), table
+
+
+def _vowel_edits(a, b, limit):
+    """
+    Vowels inserted or deleted to turn spelling `a` into `b`, or limit + 1
+    when more are needed or a consonant differs. 'e' reads as 'a' or 'i'
+    ("Mohammed" / "Muhammad", "Khaled" / "Khalid") at no cost.
+    """
+    over = limit + 1
+    previous = [min(over, j) if all(ch in _VOWELS for ch in b[:j]) else over for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        current = [previous[0] + 1 if ca in _VOWELS else over]
+        for j, cb in enumerate(b, 1):
+            best = previous[j - 1] if ca == cb or (ca, cb) in _SILENT_E else over
+            if ca in _VOWELS:
+                best = min(best, previous[j] + 1)
+            if cb in _VOWELS:
+                best = min(best, current[j - 1] + 1)
+            current.append(min(best, over))
+        if min(current) >= over:
+            return over
+        previous = current
+    return previous[-1]
+
+
+def name_distance(a, b, limit=MAX_VOWEL_EDITS):
+    """
+    Vowel edits (_vowel_edits) between two variant names token by token, or
+    limit + 1 when the names differ otherwise. Arabic spellings only match
+    themselves.
+    """
+    a, b = a.split(' '), b.split(' ')
+    if not a[0] or len(a) != len(b):
+        return limit + 1
+    total = 0
+    for x, y in zip(a, b):
+        if x != y:
+            total += limit + 1 if x.endswith('~') or y.endswith('~') else _vowel_edits(x, y, limit - total)
+            if total > limit:
+                return limit + 1
+    return total
+
+
+def _components(names):
+    """Index of each name's first connected name, names within MAX_VOWEL_EDITS joined transitively"""
+    parent = list(range(len(names)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in itertools.combinations(range(len(names)), 2):
+        a, b = root(i), root(j)
+        if a != b and name_distance(names[i], names[j]) <= MAX_VOWEL_EDITS:
+            parent[max(a, b)] = min(a, b)
+    return [root(i) for i in range(len(names))]
+
+
+def resolve_variants(variants):
+    """
+    Lead registry over `variants` (VARIANT_COLUMNS, repeats allowed): one
+    row per variant, sorted by variant, with its lead_uid. Variants are
+    compared only within their block; those within MAX_VOWEL_EDITS of each
+    other, directly or through others, are one lead, whose uid is its
+    smallest variant.
+    """
+    registry = variants[VARIANT_COLUMNS].drop_duplicates('variant').sort_values('variant', ignore_index=True)
+    uids = registry['variant'].to_numpy().copy()
+    blocks = registry['block'].to_numpy()
+    # Stable, so each block lists its variants in ascending order
+    order = np.argsort(blocks, kind='stable')
+    starts = np.flatnonzero(np.r_[True, blocks[order][1:] != blocks[order][:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    names = registry['name'].to_numpy()
+    for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+        members = order[start:start + size]
+        uids[members] = uids[members[_components(names[members])]]
+    return registry.assign(lead_uid=uids)
+
+
+def update_registry(registry, variants, blocks):
+    """`registry` with the variants of `blocks` re-resolved over those in `variants`"""
+    affected = registry['block'].isin(blocks).to_numpy()
+    resolved = resolve_variants(variants[variants['block'].isin(blocks).to_numpy()])
+    return pd.concat([registry[~affected], resolved]).sort_values('variant', ignore_index=True)
+
+
+def lookup_uids(variants, registry):
+    """lead_uid per row from its variant; every variant must be in `registry`"""
+    keys = registry['variant'].to_numpy()
+    position = np.minimum(np.searchsorted(keys, variants), max(len(keys) - 1, 0))
+    if len(variants) and not np.array_equal(keys[position], variants):
+        raise KeyError("name variants missing from the lead registry")
+    return registry['lead_uid'].to_numpy()[position]
+
+
+def lead_uids(frame):
+    """int64 lead_uid per row of a frame with NAME_COLUMNS, its names resolved among themselves"""
+    variants, table = name_keys(frame)
+    return lookup_uids(variants, resolve_variants(table))
+
+
+def read_name_keys(path, chunksize=CHUNK_ROWS):
+    """name_keys of a lead export, reading NAME_COLUMNS one chunk at a time"""
+    variants, tables = [], []
+    with pd.read_csv(path, usecols=NAME_COLUMNS, dtype='str', chunksize=chunksize, encoding='utf-8-sig') as reader:
+        for chunk in reader:
+            keys, table = name_keys(chunk)
+            variants.append(keys)
+            tables.append(table)
+    if not tables:
+        return np.empty(0, dtype=np.int64), name_keys(pd.DataFrame(columns=NAME_COLUMNS))[1]
+    return np.concatenate(variants), pd.concat(tables, ignore_index=True).drop_duplicates('variant', ignore_index=True)
+
+
+def period_rank(values):
+    """Sortable integer per row, in value (or category) order with missing values last"""
+    codes, uniques = pd.factorize(values, sort=True)
+    return np.where(codes < 0, len(uniques), codes)
+
+
+def first_rows(uids, periods):
+    """int8 flag per row: 1 on each lead's earliest row, ties going to the first in row order"""
+    order = np.lexsort((periods, uids))
+    ordered = uids[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = ordered[1:] != ordered[:-1]
+    flags = np.zeros(len(uids), dtype=np.int8)
+    flags[order[first]] = 1
+    return flags
+
+
+def attach_identity(frame, uids, period):
+    """Frame with normalized dimensions, lead_uid and is_primary (earliest row by `period`)"""
+    frame = normalize_dimensions(frame)
+    frame['lead_uid'] = uids
+    frame['is_primary'] = first_rows(uids, period_rank(frame[period]))
+    return frame
@@ -0,0 +1,223 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - DIMENSION DICTIONARY
+# One vocabulary and one set of integer codes per dimension across tables
+# ============================================================================
+#
+# The exports spell the same value differently: the cost files say
+# "Google_Search" where the lead files say "Google Search", and lead rows
+# carry "Post 3" next to "Post3". At load time every column listed in
+# TABLE_DIMENSIONS is mapped onto its dimension's dictionary:
+#
+#   1. Values are trimmed and known alternate names replaced (the dedup.py
+#      aliases).
+#   2. Spellings that differ only in case, spaces, underscores or hyphens
+#      are one value, spelled as in the reference table when the dimension
+#      has one (REFERENCES), otherwise as most rows spell it.
+#   3. The column is cast to the dimension's CategoricalDtype, the sorted
+#      canonical values. A value has the same category code in every table,
+#      so merges, comparisons and group-bys across tables run on codes.
+#      Codes are positions in the sorted vocabulary: they hold for one
+#      version of the data, and a value first seen in a weekly batch can
+#      shift the codes after it.
+#
+# Nothing else is guessed. What ingest found is kept as the issues table
+# (data_loader's "dimension_issues"): respelled values, values missing from
+# the reference table, and rare values that read like a misspelling of a
+# common one, reported with the likely value but left as they are.
+# Measured by benchmarks/dimensions.py.
+
+import collections
+import difflib
+import re
+
+import numpy as np
+import pandas as pd
+
+from dedup import CHANNEL_ALIASES, COUNTRY_ALIASES, normalize_label
+
+# table -> {column: dimension}
+LEAD_DIMENSIONS = {'channel': 'channel', 'country': 'country', 'region': 'region', 'post_id': 'post_id',
+                   'status': 'status'}
+TABLE_DIMENSIONS = {
+    'channel_gs': {'channel': 'channel'},
+    'channel_sm': {'channel': 'channel'},
+    'country_attr': {'country': 'country', 'region_group': 'region_group', 'primary_channel': 'channel'},
+    'master_leads': LEAD_DIMENSIONS,
+    'master_leads_weekly': LEAD_DIMENSIONS,
+    'master_leads_monthly': LEAD_DIMENSIONS,
+    'post_perf_totals': {'post_id': 'post_id'},
+    'post_perf_regional': {'post_id': 'post_id', 'region': 'region'},
+    'weekly_channel_summary': {'channel': 'channel', 'country': 'country', 'status': 'status'},
+}
+DIMENSIONS = list(dict.fromkeys(dim for columns in TABLE_DIMENSIONS.values() for dim in columns.values()))
+
+# dimension -> (table, column) listing its known values
+REFERENCES = {'country': ('country_attr', 'country'), 'post_id': ('post_perf_totals', 'post_id')}
+ALIASES = {'country': COUNTRY_ALIASES, 'channel': CHANNEL_ALIASES}
+# Values that stand for "everything else" rather than a member
+BUCKETS = {'Other'}
+
+# A value on under SUSPECT_SHARE of its dimension's rows that is at least
+# SUSPECT_SIMILARITY alike (difflib ratio) to a more common value with the
+# same digits is reported as a likely misspelling ("Post1" / "Post11" differ)
+SUSPECT_SHARE = 0.01
+SUSPECT_SIMILARITY = 0.85
+
+ISSUE_COLUMNS = ['dimension', 'table', 'column', 'value', 'rows', 'issue', 'canonical']
+
+_FOLDED = re.compile(r'[\s_\-]+')
+_DIGITS = re.compile(r'\d+')
+
+
+def fold_key(value):
+    """Spelling-insensitive key: case, spaces, underscores and hyphens ignored"""
+    return _FOLDED.sub('', value.casefold())
+
+
+def _sources(tables):
+    """{dimension: [(table, column)]} for the dimension columns present in `tables`"""
+    sources = collections.defaultdict(list)
+    for table, columns in TABLE_DIMENSIONS.items():
+        for column, dim in columns.items():
+            if table in tables and column in tables[table]:
+                sources[dim].append((table, column))
+    return sources
+
+
+def _value_rows(values):
+    """{value: rows} over the non-missing values of a column"""
+    counts = values.value_counts(sort=False)
+    return {value: int(rows) for value, rows in counts.items() if rows}
+
+
+def _close_match(value, candidates):
+    """The candidate `value` most likely misspells, or None"""
+    digits = _DIGITS.findall(value)
+    candidates = [c for c in candidates if _DIGITS.findall(c) == digits]
+    matches = difflib.get_close_matches(value, candidates, n=1, cutoff=SUSPECT_SIMILARITY)
+    return matches[0] if matches else None
+
+
+def _vocabulary(dim, seen, reference):
+    """
+    ({raw value: canonical value}, [(value, issue, canonical)]) for one
+    dimension from its {(table, column): {raw value: rows}}.
+    """
+    aliases = ALIASES.get(dim, {})
+    normalized = {raw: normalize_label(raw, aliases) for counts in seen.values() for raw in counts}
+    rows = collections.Counter()
+    for counts in seen.values():
+        for raw, n in counts.items():
+            rows[normalized[raw]] += n
+
+    spelling = {}
+    for value in sorted(rows, key=lambda v: (v not in reference, -rows[v], v)):
+        spelling.setdefault(fold_key(value), value)
+    canonical = {raw: spelling[fold_key(value)] for raw, value in normalized.items()}
+
+    totals = collections.Counter()
+    for value, n in rows.items():
+        totals[spelling[fold_key(value)]] += n
+    findings = [(raw, 'respelled', value) for raw, value in canonical.items() if raw != value]
+    for value in sorted(totals):
+        if value in reference or value in BUCKETS:
+            continue
+        if reference:
+            findings.append((value, 'unknown', _close_match(value, sorted(reference))))
+        elif totals[value] < SUSPECT_SHARE * sum(totals.values()):
+            match = _close_match(value, sorted(v for v in totals if totals[v] > totals[value]))
+            if match is not None:
+                findings.append((value, 'suspect', match))
+    return canonical, findings
+
+
+class DimensionDictionary:
+    """
+    Canonical values per dimension. `dtypes[dim]` is the CategoricalDtype
+    every column of that dimension is cast to, so a value's code is the
+    same wherever it appears. `issues` is what build() found (ISSUE_COLUMNS).
+    """
+
+    def __init__(self, values, issues=None):
+        self.dtypes = {dim: pd.CategoricalDtype(pd.Index(sorted(values.get(dim, ())), dtype='str'))
+                       for dim in DIMENSIONS}
+        self._folded = {dim: {fold_key(value): value for value in dtype.categories}
+                        for dim, dtype in self.dtypes.items()}
+        self.issues = issues if issues is not None else pd.DataFrame(columns=ISSUE_COLUMNS)
+
+    @classmethod
+    def build(cls, tables):
+        """Dictionary over the raw TABLE_DIMENSIONS columns of `tables`, with its issues"""
+        values, issues = {}, []
+        for dim, sources in _sources(tables).items():
+            seen = {source: _value_rows(tables[source[0]][source[1]]) for source in sources}
+            reference = set()
+            if dim in REFERENCES and REFERENCES[dim] in seen:
+                aliases = ALIASES.get(dim, {})
+                reference = {normalize_label(value, aliases) for value in seen[REFERENCES[dim]]}
+            canonical, findings = _vocabulary(dim, seen, reference)
+            values[dim] = set(canonical.values())
+            for value, issue, suggestion in findings:
+                # Respellings are reported where the raw spelling occurs, the rest where the value does
+                for (table, column), counts in seen.items():
+                    rows = (counts.get(value, 0) if issue == 'respelled' else
+                            sum(n for raw, n in counts.items() if canonical[raw] == value))
+                    if rows:
+                        issues.append((dim, table, column, value, rows, issue, suggestion))
+        return cls(values, pd.DataFrame(issues, columns=ISSUE_COLUMNS))
+
+    @classmethod
+    def from_tables(cls, tables, issues=None):
+        """Dictionary of already encoded `tables` (e.g. read from the snapshot)"""
+        values = collections.defaultdict(set)
+        for dim, sources in _sources(tables).items():
+            for table, column in sources:
+                if isinstance(tables[table][column].dtype, pd.CategoricalDtype):
+                    values[dim].update(tables[table][column].cat.categories)
+        return cls(values, issues)
+
+    def canonical(self, dim, value):
+        """Dictionary spelling of `value`; values it does not know come back trimmed"""
+        if not isinstance(value, str):
+            return value
+        value = normalize_label(value, ALIASES.get(dim, {}))
+        return self._folded[dim].get(fold_key(value), value)
+
+    def _respelled(self, values, dim):
+        """(code per row, canonical value per code) for a column"""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values)
+        return codes, pd.Index([self.canonical(dim, value) for value in uniques], dtype='str')
+
+    def respell(self, values, dim):
+        """`values` as plain strings in their dictionary spelling"""
+        codes, canonical = self._respelled(values, dim)
+        spelled = np.append(canonical.to_numpy(dtype=object), None)[codes]
+        return pd.Series(spelled, index=values.index, name=values.name, dtype='str')
+
+    def encode_column(self, values, dim):
+        """
+        `values` as the dimension's categorical. Values outside the
+        dictionary (a new batch, say) are added in sorted order.
+        """
+        codes, canonical = self._respelled(values, dim)
+        dtype = self.dtypes[dim]
+        missing = canonical.difference(dtype.categories)
+        if len(missing):
+            dtype = pd.CategoricalDtype(dtype.categories.append(missing).sort_values())
+        recode = np.append(dtype.categories.get_indexer(canonical), -1)
+        return pd.Series(pd.Categorical.from_codes(recode[codes], dtype=dtype), index=values.index,
+                         name=values.name)
+
+    def encode(self, frame, table):
+        """`frame` with its TABLE_DIMENSIONS columns encoded"""
+        for column, dim in TABLE_DIMENSIONS.get(table, {}).items():
+            if column in frame:
+                frame[column] = self.encode_column(frame[column], dim)
+        return frame
+
+    def codes(self, dim, values):
+        """Integer code per value; -1 for values outside the dictionary"""
+        return self.dtypes[dim].categories.get_indexer(values)
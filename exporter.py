@@ -0,0 +1,229 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - REPORT EXPORTER
+# Batch JSON/HTML snapshots of every sidebar filter combination
+# ============================================================================
+#
+#   python app.py export --out reports --format json,html --weeks full,last8
+#   python app.py export --scaling --weeks each
+#   python app.py export --grains week,month,quarter
+#   python app.py export --workers 1,2,4,8 --weeks each
+#
+# Data is loaded once in the parent. With the default "fork" start method the
+# workers inherit it copy-on-write (gc.freeze keeps refcount updates off the
+# shared pages); under "spawn" each worker loads it from the feather snapshot.
+
+import argparse
+import gc
+import html
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from plotly.io.json import to_json_plotly
+
+import app
+import data_loader
+
+PLOTLY_CDN = "https://cdn.plot.ly/plotly-2.35.2.min.js"
+
+# Set in the parent before the pool starts, or by _init_worker under spawn
+_DATA = None
+
+
+def week_ranges(spec, min_week, max_week):
+    """
+    Week ranges from a comma-separated spec: 'full', 'each' (every single
+    week), 'lastN' (the final N weeks) or an explicit 'A-B'.
+    """
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if part == 'full':
+            ranges.append((min_week, max_week))
+        elif part == 'each':
+            ranges.extend((w, w) for w in range(min_week, max_week + 1))
+        elif part.startswith('last'):
+            ranges.append((max(min_week, max_week - int(part[4:]) + 1), max_week))
+        elif re.fullmatch(r'\d+-\d+', part):
+            lo, hi = (int(w) for w in part.split('-'))
+            ranges.append((max(lo, min_week), min(hi, max_week)))
+        else:
+            raise ValueError(f"Unknown week range: {part}")
+    return list(dict.fromkeys(r for r in ranges if r[0] <= r[1]))
+
+
+def filter_combinations(data, weeks='full', grains=('Week',)):
+    """Every (channel, country, priority, week range, grain) the sidebar can select"""
+    options = app.sidebar_options(data)
+    ranges = week_ranges(weeks, *options['week_bounds'])
+    for channel, country, priority, week_range, grain in itertools.product(
+            options['channel'], options['country'], options['priority'], ranges, grains):
+        yield {'channel': channel, 'country': country, 'priority': priority, 'week_range': week_range,
+               'grain': grain}
+
+
+def combination_slug(filters):
+    parts = [filters['channel'], filters['country'], filters['priority'],
+             'w{}-{}'.format(*filters['week_range'])]
+    if filters['grain'] != 'Week':
+        parts.append(filters['grain'])
+    return '__'.join(re.sub(r'[^A-Za-z0-9]+', '-', str(p)).strip('-') for p in parts)
+
+
+def _init_worker(base_dir):
+    global _DATA
+    if _DATA is None:
+        _DATA = app.build_data(base_dir)
+
+
+def _figures(overview_figures, performance):
+    figures = dict(overview_figures)
+    for tab, figs in performance.items():
+        for i, fig in enumerate(figs):
+            figures[f'performance.{tab}.{i}'] = fig
+    return figures
+
+
+def _html_page(filters, kpis, figures, version):
+    title = ' | '.join(f"{k}: {v}" for k, v in filters.items())
+    rows = ''.join(f"<tr><th>{html.escape(k)}</th><td>{v:,.2f}</td></tr>" for k, v in kpis.items())
+    charts = ''.join(f"<h3>{html.escape(name)}</h3>" + fig.to_html(full_html=False, include_plotlyjs=False)
+                     for name, fig in figures.items())
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+            f"<script src='{PLOTLY_CDN}'></script></head><body>"
+            f"<h1>SBE Marketing Intelligence</h1><p>{html.escape(title)} &middot; data {version}</p>"
+            f"<table>{rows}</table>{charts}</body></html>")
+
+
+def export_combination(filters, out_dir, formats):
+    """Compute and write one combination; returns its index entry, or None when empty"""
+    overview = app.compute_overview(_DATA, filters)
+    if overview is None:
+        return None
+    kpis, overview_figures = overview
+    figures = _figures(overview_figures, app.compute_performance(_DATA, filters))
+    version = _DATA['data_version']
+
+    slug = combination_slug(filters)
+    payloads = {}
+    if 'json' in formats:
+        payloads['json'] = to_json_plotly({'filters': filters, 'data_version': version,
+                                           'kpis': kpis, 'figures': figures})
+    if 'html' in formats:
+        payloads['html'] = _html_page(filters, kpis, figures, version)
+    if out_dir is not None:
+        for fmt, payload in payloads.items():
+            with open(os.path.join(out_dir, fmt, f'{slug}.{fmt}'), 'w', encoding='utf-8') as f:
+                f.write(payload)
+    return {'slug': slug, 'filters': filters, 'kpis': kpis,
+            'bytes': sum(len(p) for p in payloads.values())}
+
+
+def _export_chunk(args):
+    chunk, out_dir, formats = args
+    return [export_combination(filters, out_dir, formats) for filters in chunk]
+
+
+def run_export(combos, base_dir, out_dir, formats, workers, chunksize):
+    """Fan the combinations out over a process pool; returns (entries, seconds)"""
+    chunks = [combos[i:i + chunksize] for i in range(0, len(combos), chunksize)]
+    start = time.perf_counter()
+    if workers <= 1:
+        results = [_export_chunk((chunk, out_dir, formats)) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(base_dir,)) as pool:
+            results = list(pool.map(_export_chunk, [(chunk, out_dir, formats) for chunk in chunks]))
+    elapsed = time.perf_counter() - start
+    return [e for chunk in results for e in chunk if e is not None], elapsed
+
+
+def _write_creative(out_dir, formats):
+    # The Creative tab ignores the sidebar filters, so it is exported once
+    figures = {f'performance.creative.{i}': fig for i, fig in enumerate(app.build_creative_figures(_DATA) or ())}
+    if 'json' in formats:
+        with open(os.path.join(out_dir, 'json', 'creative.json'), 'w', encoding='utf-8') as f:
+            f.write(to_json_plotly({'data_version': _DATA['data_version'], 'figures': figures}))
+    if 'html' in formats:
+        with open(os.path.join(out_dir, 'html', 'creative.html'), 'w', encoding='utf-8') as f:
+            f.write(_html_page({'view': 'creative'}, {}, figures, _DATA['data_version']))
+
+
+def export_main(argv=None):
+    global _DATA
+    parser = argparse.ArgumentParser(prog='app.py export', description='Export report snapshots for every filter combination')
+    parser.add_argument('--data-dir', default=data_loader.BASE_DIR)
+    parser.add_argument('--out', default='reports', help='output directory')
+    parser.add_argument('--format', default='json', help="comma-separated: json, html")
+    parser.add_argument('--weeks', default='full', help="comma-separated: full, each, lastN, A-B")
+    parser.add_argument('--grains', default='Week', help="comma-separated time grains: Week, Month, Quarter")
+    parser.add_argument('--workers', default=str(os.cpu_count() or 1),
+                        help='worker processes; a comma-separated list times each count without writing files')
+    parser.add_argument('--chunksize', type=int, default=8, help='combinations per task')
+    parser.add_argument('--scaling', action='store_true',
+                        help='time 1, 2, 4 ... --workers workers without writing files')
+    args = parser.parse_args(argv)
+
+    try:
+        workers = sorted({int(w) for w in args.workers.split(',') if w.strip()})
+    except ValueError:
+        parser.error(f"--workers takes comma-separated integers, not {args.workers!r}")
+    if not workers or workers[0] < 1:
+        parser.error("--workers must be at least 1")
+    formats = {f.strip() for f in args.format.split(',') if f.strip()}
+    if not formats <= {'json', 'html'}:
+        parser.error(f"unknown format: {', '.join(sorted(formats - {'json', 'html'}))}")
+    grains = [g.strip().capitalize() for g in args.grains.split(',') if g.strip()]
+    if not set(grains) <= {'Week', 'Month', 'Quarter'}:
+        parser.error(f"unknown grain: {', '.join(sorted(set(grains) - {'Week', 'Month', 'Quarter'}))}")
+
+    start = time.perf_counter()
+    _DATA = app.build_data(args.data_dir)
+    print(f"Loaded data {_DATA['data_version']} in {time.perf_counter() - start:.2f}s")
+
+    # Empty slices are dropped up front so workers only receive real reports
+    cube = _DATA['lead_cube']
+    combos, skipped = [], 0
+    for filters in filter_combinations(_DATA, args.weeks, grains):
+        if cube.slice(filters).is_empty():
+            skipped += 1
+        else:
+            combos.append(filters)
+    print(f"{len(combos)} combinations to export, {skipped} empty combinations skipped")
+
+    gc.freeze()
+    if multiprocessing.get_start_method() != 'fork':
+        print("Note: workers are spawned and reload the data from the snapshot")
+
+    if args.scaling or len(workers) > 1:
+        if args.scaling:
+            top = workers[-1]
+            workers = sorted({1, top} | {2 ** i for i in range(top.bit_length()) if 2 ** i <= top})
+        # Speedup is relative to the smallest count; efficiency is per worker added on top of it
+        print(f"{os.cpu_count()} CPUs, {len(combos)} combinations in chunks of {args.chunksize}")
+        print(f"{'workers':>8} {'seconds':>9} {'combos/s':>10} {'speedup':>8} {'efficiency':>11}")
+        baseline = None
+        for n in workers:
+            _, elapsed = run_export(combos, args.data_dir, None, formats, n, args.chunksize)
+            rate = len(combos) / elapsed if elapsed > 0 else 0.0
+            baseline = baseline or rate
+            speedup = rate / baseline if baseline else 0.0
+            print(f"{n:>8} {elapsed:>9.2f} {rate:>10.1f} {speedup:>7.2f}x {speedup * workers[0] / n:>10.0%}")
+        return 0
+
+    for fmt in formats:
+        os.makedirs(os.path.join(args.out, fmt), exist_ok=True)
+    entries, elapsed = run_export(combos, args.data_dir, args.out, formats, workers[0], args.chunksize)
+    _write_creative(args.out, formats)
+    with open(os.path.join(args.out, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump({'data_version': _DATA['data_version'], 'formats': sorted(formats), 'skipped': skipped,
+                   'reports': [{k: e[k] for k in ('slug', 'filters', 'kpis')} for e in entries]}, f, indent=2)
+
+    rate = len(entries) / elapsed if elapsed > 0 else 0.0
+    written = sum(e['bytes'] for e in entries)
+    print(f"Exported {len(entries)} combinations with {workers[0]} workers in {elapsed:.2f}s "
+          f"({rate:.1f} combinations/s, {written / 1e6:.1f} MB) to {args.out}")
+    return 0
@@ -0,0 +1,72 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - FIGURE CACHE
+# Bounded LRU for built Plotly figures shared across sessions
+# ============================================================================
+
+import threading
+from collections import OrderedDict
+
+
+def filter_key(filters):
+    """Hashable, normalized form of the sidebar filter dict"""
+    week_min, week_max = filters['week_range']
+    return (filters['channel'], filters['country'], filters['priority'], int(week_min), int(week_max))
+
+
+class FigureLRU:
+    """
+    Thread-safe LRU mapping cache keys to built figures. Values are shared
+    between sessions, so callers must treat them as read-only.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, builder):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+
+        # Build outside the lock; a concurrent miss may build twice, which is harmless
+        value = builder()
+
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+    def prefill(self, key, builder):
+        """
+        Build `key` ahead of demand; True if it was added. Skipped when the
+        key is present or the cache is full, and the entry goes to the
+        least-recently-used end, so prefilling never evicts entries sessions
+        have used. Not counted as a hit or miss.
+        """
+        with self._lock:
+            if key in self._items or len(self._items) >= self.maxsize:
+                return False
+
+        value = builder()
+
+        with self._lock:
+            if key in self._items or len(self._items) >= self.maxsize:
+                return False
+            self._items[key] = value
+            self._items.move_to_end(key, last=False)
+        return True
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
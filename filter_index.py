@@ -0,0 +1,82 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - FILTER INDEX
+# Row-id index over the lead tables for the sidebar filters
+# ============================================================================
+
+import numpy as np
+import pandas as pd
+
+
+def _value_positions(values):
+    """Map each distinct value to the sorted int array of rows holding it"""
+    codes, uniques = pd.factorize(values, sort=False)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {
+        value: order[bounds[i]:bounds[i + 1]].astype(np.int64)
+        for i, value in enumerate(uniques)
+    }
+
+
+class FilterIndex:
+    """
+    Precomputed row positions for the channel, country, priority and week
+    filters. master_leads_weekly and master_enriched share row order, so one
+    set of positions selects from both.
+    """
+
+    def __init__(self, leads, country_attr):
+        self.n_rows = len(leads)
+        self.channel = _value_positions(leads['channel'])
+        self.country = _value_positions(leads['country'])
+
+        priority = leads['country'].map(country_attr.drop_duplicates('country').set_index('country')['market_priority'])
+        self.priority = _value_positions(priority)
+
+        week_num = leads['week_num'].to_numpy()
+        self.week_order = np.argsort(week_num, kind='stable').astype(np.int64)
+        self.week_sorted = week_num[self.week_order]
+
+    @classmethod
+    def build(cls, data):
+        return cls(data['master_leads_weekly'], data['country_attr'])
+
+    def extend(self, leads, country_attr):
+        """New index over this index's rows followed by the appended `leads`"""
+        added = FilterIndex(leads, country_attr)
+        index = object.__new__(FilterIndex)
+        index.n_rows = self.n_rows + added.n_rows
+        for attr in ('channel', 'country', 'priority'):
+            positions = dict(getattr(self, attr))
+            for value, rows in getattr(added, attr).items():
+                rows = rows + self.n_rows
+                positions[value] = np.concatenate([positions[value], rows]) if value in positions else rows
+            setattr(index, attr, positions)
+        # Appended rows sort after existing rows of the same week, as a stable argsort would
+        slots = np.searchsorted(self.week_sorted, added.week_sorted, side='right')
+        index.week_sorted = np.insert(self.week_sorted, slots, added.week_sorted)
+        index.week_order = np.insert(self.week_order, slots, added.week_order + self.n_rows)
+        return index
+
+    def _week_rows(self, week_range):
+        week_min, week_max = week_range
+        lo = np.searchsorted(self.week_sorted, week_min, side='left')
+        hi = np.searchsorted(self.week_sorted, week_max, side='right')
+        if lo == 0 and hi == self.n_rows:
+            return None
+        return np.sort(self.week_order[lo:hi])
+
+    def select(self, filters):
+        """
+        Resolve a filter dict to sorted row positions, or None when the
+        filters keep every row.
+        """
+        rows = self._week_rows(filters['week_range'])
+        empty = np.empty(0, dtype=np.int64)
+        for key, positions in (('channel', self.channel), ('country', self.country), ('priority', self.priority)):
+            value = filters[key]
+            if value == 'All':
+                continue
+            matches = positions.get(value, empty)
+            rows = matches if rows is None else np.intersect1d(rows, matches, assume_unique=True)
+        return rows
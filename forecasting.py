@@ -0,0 +1,155 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - FORECASTING
+# Damped-trend exponential smoothing fitted to every lead series at once
+# ============================================================================
+#
+# Each (channel, country) weekly lead series gets Holt's linear method with a
+# damped trend (Holt-Winters without a seasonal term; 35 weeks cannot carry
+# a yearly season). Series are the rows of one matrix and every candidate
+# (alpha, beta, phi) is a leading axis, so a fit is one pass over the weeks
+# with each step vectorized over candidates x series. Forecasts for a filter
+# are the sum of the matching series' forecasts, so every slice agrees with
+# the totals.
+
+import numpy as np
+import pandas as pd
+
+from cube import series_mask
+
+HORIZON = 8
+
+# Smoothing grid searched per series on one-step-ahead squared error
+ALPHAS = np.linspace(0.05, 0.95, 10)
+BETAS = np.array([0.01, 0.05, 0.1, 0.2, 0.4])
+PHIS = np.array([0.8, 0.9, 0.98])
+INIT_WEEKS = 4
+
+# Two-sided normal quantile per prediction-interval level
+Z_SCORES = {0.8: 1.2816, 0.95: 1.9600}
+
+
+def weekly_matrix(cube):
+    """(series keys, week numbers, series x week lead counts) from a LeadCube"""
+    keys, weeks, matrices = cube.series(['lead_count'])
+    return keys, weeks, matrices['lead_count'].astype(float)
+
+
+def _grid():
+    alpha, beta, phi = (axis.ravel() for axis in np.meshgrid(ALPHAS, BETAS, PHIS, indexing='ij'))
+    return alpha[:, None], beta[:, None], phi[:, None]
+
+
+def smooth(counts, alpha, beta, phi):
+    """
+    Run damped Holt over every series (rows of `counts`) for every
+    parameter set (rows of alpha/beta/phi, shape (G, 1)) at once.
+    Returns final level and trend and the one-step squared error sum,
+    each shaped (G, series).
+    """
+    # Sparse weekly counts make the first week alone a noisy starting level
+    start = counts[:, :INIT_WEEKS].mean(axis=1)
+    level = np.broadcast_to(start, (len(alpha), len(counts))).copy()
+    trend = np.zeros_like(level)
+    sse = np.zeros_like(level)
+    error = np.empty_like(level)
+    gain = alpha * beta
+    # In-place updates: no temporaries of the (G, series) state per week
+    for t in range(1, counts.shape[1]):
+        trend *= phi
+        level += trend  # now the one-step prediction
+        np.subtract(counts[:, t], level, out=error)
+        sse += error * error
+        level += alpha * error
+        trend += gain * error
+    return level, trend, sse
+
+
+def fit_forecast(counts, horizon=HORIZON):
+    """
+    Per-series best parameters and the `horizon`-week forecast mean and
+    variance, each (series, horizon). Variance follows the damped-trend
+    state-space form: sigma^2 * (1 + sum_j (alpha * (1 + beta * phi_j))^2).
+    """
+    alpha, beta, phi = _grid()
+    level, trend, sse = smooth(counts, alpha, beta, phi)
+    best = np.argmin(sse, axis=0)
+    series = np.arange(len(counts))
+    alpha, beta, phi = alpha[best, 0], beta[best, 0], phi[best, 0]
+    level, trend = level[best, series], trend[best, series]
+    sigma2 = sse[best, series] / max(counts.shape[1] - 2, 1)
+
+    steps = np.arange(1, horizon + 1)
+    # phi_h = phi + phi^2 + ... + phi^h, per series and step
+    damp = np.cumsum(phi[:, None] ** steps, axis=1)
+    mean = np.maximum(level[:, None] + damp * trend[:, None], 0)
+    carry = alpha[:, None] * (1 + beta[:, None] * damp[:, :-1])
+    variance = sigma2[:, None] * (1 + np.concatenate([np.zeros((len(counts), 1)), np.cumsum(carry ** 2, axis=1)], axis=1))
+    params = pd.DataFrame({'alpha': alpha, 'beta': beta, 'phi': phi})
+    return params, mean, variance
+
+
+def mape(actual, predicted):
+    """Mean absolute percentage error over the weeks with any leads"""
+    nonzero = actual != 0
+    if not nonzero.any():
+        return float('nan')
+    return float(np.mean(np.abs((actual[nonzero] - predicted[nonzero]) / actual[nonzero])) * 100)
+
+
+class LeadForecast:
+    """
+    Forecasts for every (channel, country) series, plus a backtest: the same
+    fit on all but the last `horizon` weeks, kept to score any slice.
+    """
+
+    def __init__(self, keys, weeks, counts, params, mean, variance, backtest_mean):
+        self.keys = keys
+        self.weeks = weeks
+        self.counts = counts
+        self.params = params
+        self.mean = mean
+        self.variance = variance
+        self.backtest_mean = backtest_mean
+
+    @classmethod
+    def build(cls, cube, horizon=HORIZON):
+        keys, weeks, counts = weekly_matrix(cube)
+        params, mean, variance = fit_forecast(counts, horizon)
+        _, backtest_mean, _ = fit_forecast(counts[:, :-horizon], horizon)
+        return cls(keys, weeks, counts, params, mean, variance, backtest_mean)
+
+    @property
+    def horizon(self):
+        return self.mean.shape[1]
+
+    def slice(self, filters, level=0.8):
+        """
+        History within the week range, forecast with a `level` prediction
+        interval and backtest MAPE for the series matching the filters, or
+        None when no series matches.
+        """
+        mask = series_mask(self.keys, filters)
+        if not mask.any():
+            return None
+        lo, hi = filters['week_range']
+        in_range = (self.weeks >= lo) & (self.weeks <= hi)
+        history = self.counts[mask].sum(axis=0)
+        mean = self.mean[mask].sum(axis=0)
+        # Series errors are treated as independent, so variances add
+        spread = Z_SCORES[level] * np.sqrt(self.variance[mask].sum(axis=0))
+        actual = history[-self.horizon:]
+        backtest = self.backtest_mean[mask].sum(axis=0)
+        naive = np.full(self.horizon, history[-self.horizon - 4:-self.horizon].mean())
+        return {
+            'weeks': self.weeks[in_range],
+            'history': history[in_range],
+            'future_weeks': self.weeks[-1] + np.arange(1, self.horizon + 1),
+            'mean': mean,
+            'lower': np.maximum(mean - spread, 0),
+            'upper': mean + spread,
+            'backtest_weeks': self.weeks[-self.horizon:],
+            'backtest': backtest,
+            'mape': mape(actual, backtest),
+            'naive_mape': mape(actual, naive),
+            'series': int(mask.sum()),
+        }
@@ -0,0 +1,186 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - FUNNEL ENGINE
+# Stage conversion from the weekly channel summary on a dense count array
+# ============================================================================
+#
+# weekly_channel_summary.csv reports lead counts per (channel, week,
+# country, status). They are held as one array indexed channel x week x
+# country x status, built once per data version. Channel, country and
+# status positions are the shared dimension codes (dimensions.py), so rows
+# are placed without a lookup. The week axis holds the weeks the report
+# covers, in week_num order.
+#
+# Stages nest (STAGES): every lead with a status entered the funnel,
+# Unqualified leads were reached and dropped, "Reachable Exploring" leads
+# are still in consideration and Qualified ones got through (STATUS_DEPTH).
+# A stage counts the leads whose status got at least that far, and its
+# conversion rate is that count over the stage before. Rows without a
+# status (the report does not break every country down) and statuses
+# outside STATUS_DEPTH count as leads but stay outside the stages.
+#
+# The report numbers its weeks on its own (one number twice), so each row's
+# week_date_range is looked up in the cost reports' calendar, the week_num
+# the lead tables and the sidebar use. Rows whose range is not in the
+# calendar are left out and counted in `unmatched_rows`.
+#
+# Country and priority totals are summed out at build time, so a query picks
+# one precomputed (channel or all) x week x (country, priority or all) x
+# status array, slices the week range and multiplies by the status -> stage
+# matrix. Measured by benchmarks/funnel.py.
+
+import re
+
+import numpy as np
+import pandas as pd
+
+STAGES = ['Leads', 'Reachable', 'Exploring', 'Qualified']
+# Status -> index of the deepest stage it reached
+STATUS_DEPTH = {'Unreachable': 0, 'Unqualified': 1, 'Reachable Exploring': 2, 'Qualified': 3}
+
+_SPACES = re.compile(r'\s+')
+
+
+def _range_key(values):
+    """Week date range without spacing or case differences ("Dec 30 - Jan 5" / "Dec 30-Jan 5")"""
+    return [_SPACES.sub('', value).casefold() if isinstance(value, str) else None for value in values]
+
+
+def week_calendar(channels_combined):
+    """{week_date_range key: week_num} from the cost reports"""
+    calendar = channels_combined.dropna(subset=['week_number', 'week_date_range'])
+    return dict(zip(_range_key(calendar['week_date_range']), calendar['week_number'].astype(int)))
+
+
+def conversion(stages):
+    """Each stage over the one before, along the last axis; NaN where the earlier stage is empty"""
+    before, after = stages[..., :-1], stages[..., 1:]
+    return np.divide(after, before, out=np.full(after.shape, np.nan), where=before > 0)
+
+
+class FunnelCube:
+    """
+    Summary lead counts on a channel x week x country x status array.
+
+    `channels`, `countries` and `statuses` are the dimension dictionary's
+    categories, the last status slot holding rows without one; `weeks` are
+    the report's weeks (week_num) and `priorities` the market priorities.
+    `totals` maps (channel level, geography level) to the precomputed
+    arrays: channel level 'channel' or 'all', geography 'country',
+    'priority' or 'all'.
+    """
+
+    def __init__(self, channels, weeks, countries, priorities, country_priority, statuses, membership,
+                 totals, unmatched_rows):
+        self.channels = channels
+        self.weeks = weeks
+        self.countries = countries
+        self.priorities = priorities
+        self.country_priority = country_priority
+        self.statuses = statuses
+        self.membership = membership
+        self.totals = totals
+        self.unmatched_rows = unmatched_rows
+
+    @classmethod
+    def build(cls, summary, channels_combined, country_attr):
+        """From weekly_channel_summary with dictionary-encoded dimensions, the cost calendar and country_attr"""
+        calendar = week_calendar(channels_combined)
+        ranges, uniques = pd.factorize(summary['week_date_range'])
+        week_num = np.append([calendar.get(key, -1) for key in _range_key(uniques)], -1)[ranges]
+        channel = summary['channel'].cat.codes.to_numpy()
+        country = summary['country'].cat.codes.to_numpy()
+        keep = (week_num >= 0) & (channel >= 0) & (country >= 0)
+
+        statuses = summary['status'].cat.categories
+        status = summary['status'].cat.codes.to_numpy()
+        status = np.where(status < 0, len(statuses), status)
+        weeks, week = np.unique(week_num[keep], return_inverse=True)
+        channels, countries = summary['channel'].cat.categories, summary['country'].cat.categories
+        shape = (len(channels), len(weeks), len(countries), len(statuses) + 1)
+        flat = np.ravel_multi_index((channel[keep], week, country[keep], status[keep]), shape)
+        counts = np.bincount(flat, weights=summary['lead_count'].fillna(0).to_numpy(dtype=float)[keep],
+                             minlength=np.prod(shape)).reshape(shape)
+
+        # Stage k holds the statuses with depth >= k; status-less rows are in no stage
+        depth = np.array([STATUS_DEPTH.get(s, -1) for s in statuses] + [-1])
+        membership = ((depth[:, None] >= np.arange(len(STAGES))) & (depth[:, None] >= 0)).astype(float)
+
+        # Countries missing from country_attr (e.g. the "Other" bucket) have no priority
+        priorities = country_attr['market_priority'].cat.categories
+        attr = country_attr.dropna(subset=['country']).drop_duplicates('country')
+        country_priority = np.full(len(countries), -1)
+        country_priority[countries.get_indexer(attr['country'])] = attr['market_priority'].cat.codes.to_numpy()
+        onehot = (country_priority[:, None] == np.arange(len(priorities))).astype(float)
+
+        by_priority = np.einsum('cwks,kp->cwps', counts, onehot)
+        totals = {('channel', 'country'): counts, ('channel', 'priority'): by_priority,
+                  ('channel', 'all'): counts.sum(axis=2)}
+        for geography in ('country', 'priority', 'all'):
+            totals['all', geography] = totals['channel', geography].sum(axis=0)
+        return cls(np.asarray(channels), weeks, np.asarray(countries), np.asarray(priorities), country_priority,
+                   np.append(np.asarray(statuses, dtype=object), None), membership, totals,
+                   int((~keep).sum()))
+
+    def _position(self, labels, value):
+        positions = np.flatnonzero(labels == value)
+        return positions[0] if len(positions) else None
+
+    def status_counts(self, filters):
+        """(weeks in the range, week x status lead counts) for the sidebar filters; None when off the axes"""
+        lo, hi = np.searchsorted(self.weeks, filters['week_range'][0]), np.searchsorted(
+            self.weeks, filters['week_range'][1], side='right')
+        index = [slice(lo, hi)]
+        level = 'all'
+        if filters['channel'] != 'All':
+            channel = self._position(self.channels, filters['channel'])
+            if channel is None:
+                return None
+            level = 'channel'
+            index.insert(0, channel)
+
+        if filters['country'] != 'All':
+            country = self._position(self.countries, filters['country'])
+            if country is None:
+                return None
+            if filters['priority'] != 'All' and (self.country_priority[country] < 0 or
+                                                 self.priorities[self.country_priority[country]] != filters['priority']):
+                return None
+            geography, position = 'country', country
+        elif filters['priority'] != 'All':
+            geography, position = 'priority', self._position(self.priorities, filters['priority'])
+            if position is None:
+                return None
+        else:
+            geography, position = 'all', None
+        counts = self.totals[level, geography][tuple(index)]
+        return self.weeks[lo:hi], counts if position is None else counts[:, position]
+
+    def query(self, filters):
+        """
+        Funnel of the filtered slice, or None when it has no leads:
+        'weeks', week x stage 'stages' and per-week 'unstaged' counts,
+        'stage_totals' and 'conversion' over the whole range, per-week
+        'weekly_conversion' and 'wow' (change from the previous week of the
+        report; NaN for the first).
+        """
+        found = self.status_counts(filters)
+        if found is None:
+            return None
+        weeks, counts = found
+        leads = counts.sum(axis=1)
+        if not leads.sum():
+            return None
+        stages = counts @ self.membership
+        stage_totals = stages.sum(axis=0)
+        weekly = conversion(stages)
+        wow = np.full(weekly.shape, np.nan)
+        wow[1:] = weekly[1:] - weekly[:-1]
+        return {
+            'weeks': weeks,
+            'stages': stages,
+            'unstaged': leads - stages[:, 0],
+            'stage_totals': stage_totals,
+            'conversion': conversion(stage_totals),
+            'weekly_conversion': weekly,
+            'wow': wow,
+        }
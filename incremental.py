@@ -0,0 +1,331 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - INCREMENTAL INGESTION
+# Fold new weekly report batches into the loaded data without a full reload
+# ============================================================================
+#
+# Weekly lead exports with the master_leads_weekly.csv columns are dropped
+# into data/incoming/ (or SBE_DROP_DIR). A batch replaces every row sharing
+# one of its source_file values, so a re-exported week corrects that week
+# instead of duplicating it. Only the batch is parsed and cleaned; the lead
+# tables are appended to and the cube, filter index and cost ledger are
+# updated from the batch rows alone.
+#
+# Batch rows get lead_uids like the base file (dedup.py): the name variants
+# of every ingested batch join the lead registry ('lead_registry'), and only
+# the blocks a changed batch touches are resolved again. A new spelling can
+# give a known lead a smaller uid or join two leads; their rows are
+# re-keyed. In memory, each lead's primary row is then re-chosen over the
+# whole weekly table and the cube takes the difference for rows whose flag
+# changed. Under streaming ingestion only the set of counted lead_uids is
+# known, so a batch row counts only when its lead has not been counted
+# before: a lead first seen in the base file stays in its original week even
+# if a batch adds an earlier row for it, and two counted leads a batch joins
+# stay counted twice. A lead split by a removed batch needs a full reload.
+#
+# A batch that cannot be read (malformed, or still being written) is skipped
+# and its error kept in the batch log; the other batches are applied and the
+# file is retried once it changes again. A changed file that fails keeps its
+# previously ingested rows.
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cost_ledger import CostLedger
+from cube import MEASURES, lead_counts
+from data_loader import BASE_DIR, IDENTITY_PERIODS, READ_SCHEMAS, _file_sha256, clean_weekly_leads, enrich_countries
+from dedup import (VARIANT_COLUMNS, first_rows, lookup_uids, period_rank, read_name_keys, resolve_variants,
+                   update_registry)
+from datastore import DataStore
+from dimensions import TABLE_DIMENSIONS
+from filter_index import FilterIndex
+from time_rollup import TimeRollup
+
+DROP_DIRNAME = 'incoming'
+
+# Lead columns whose categories read_csv infers from the values present
+INFERRED_CATEGORIES = [col for col, dtype in READ_SCHEMAS['master_leads_weekly']['dtype'].items() if dtype == 'category']
+
+
+class FullReloadRequired(Exception):
+    """The change cannot be applied incrementally"""
+
+
+def drop_dir(base_dir=BASE_DIR):
+    return os.environ.get('SBE_DROP_DIR', os.path.join(base_dir, DROP_DIRNAME))
+
+
+def scan_batches(directory):
+    """{filename: (size, mtime_ns)} for the batch CSVs; stat() only"""
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return {}
+    batches = {}
+    for name in names:
+        if name.endswith('.csv'):
+            stat = os.stat(os.path.join(directory, name))
+            batches[name] = (stat.st_size, stat.st_mtime_ns)
+    return batches
+
+
+def read_batch(path, dictionary, registry=None):
+    """
+    (rows, name keys) of a batch file: rows cleaned like master_leads_weekly,
+    their dimensions encoded with the loaded `dictionary`, and the file's
+    dedup.read_name_keys. lead_uids come from `registry`, which must hold the
+    batch's variants; without one the batch's names are resolved among
+    themselves.
+    """
+    keys = read_name_keys(path)
+    registry = resolve_variants(keys[1]) if registry is None else registry
+    return clean_weekly_leads(pd.read_csv(path, **READ_SCHEMAS['master_leads_weekly']), keys, registry,
+                              dictionary), keys
+
+
+def lead_registry(data):
+    """The lead registry with the ingested batches' names, or the loaded one"""
+    return data.get('lead_registry', data['lead_variants'])
+
+
+def _remap(uids, old, new):
+    """`uids` with each of `old` replaced by the matching `new` (`old` sorted)"""
+    position = np.minimum(np.searchsorted(old, uids), max(len(old) - 1, 0))
+    hit = old[position] == uids if len(old) else np.zeros(len(uids), dtype=bool)
+    return np.where(hit, new[position], uids)
+
+
+def _rekeyed(registry, updated, blocks):
+    """
+    (old uids, new uids) of the leads `updated` re-keys in `blocks`, old
+    sorted. Raises FullReloadRequired when a lead splits, since its rows do
+    not record which spelling they were read under.
+    """
+    before, after = (table.loc[table['block'].isin(blocks).to_numpy(), ['variant', 'lead_uid']]
+                     for table in (registry, updated))
+    both = before.merge(after, on='variant', suffixes=('_old', '_new'))
+    pairs = both[['lead_uid_old', 'lead_uid_new']].drop_duplicates()
+    if pairs['lead_uid_old'].duplicated().any():
+        raise FullReloadRequired("a removed batch splits a lead")
+    pairs = pairs[pairs['lead_uid_old'] != pairs['lead_uid_new']].sort_values('lead_uid_old')
+    return pairs['lead_uid_old'].to_numpy(), pairs['lead_uid_new'].to_numpy()
+
+
+def _reidentify(frame, old, new, period):
+    """Lead table with its uids remapped and primary rows re-chosen"""
+    uids = _remap(frame['lead_uid'].to_numpy(), old, new)
+    return frame.assign(lead_uid=uids, is_primary=first_rows(uids, period_rank(frame[period])))
+
+
+def mark_new_leads(rows, counted):
+    """
+    (rows with is_primary, sorted counted lead_uids after them) for batch
+    rows under streaming ingestion: a row is primary when its lead is not in
+    `counted` and it is the lead's earliest row in `rows`.
+    """
+    uids = rows['lead_uid'].to_numpy()
+    fresh = ~np.isin(uids, counted)
+    primary = np.zeros(len(rows), dtype=np.int8)
+    primary[fresh] = first_rows(uids[fresh], rows['week_num'].to_numpy()[fresh])
+    return rows.assign(is_primary=primary), np.union1d(counted, uids)
+
+
+def _trim(values, keep):
+    """Categorical `values` without the categories no row uses, except those in `keep`"""
+    categories = values.cat.categories
+    used = np.zeros(len(categories), dtype=bool)
+    codes = values.cat.codes.to_numpy()
+    used[codes[codes >= 0]] = True
+    return values.cat.set_categories(categories[used | categories.isin(keep)])
+
+
+def _append(frame, rows, dictionary, trim=False):
+    """
+    `frame` + `rows` with the inferred categoricals over the sorted union of
+    values, as a fresh read would give. The union is formed on categories
+    and codes, so the cost of the existing rows is an integer remap.
+    Dimension columns keep every dictionary value, like a fresh load.
+    """
+    old_cols, new_cols = {}, {}
+    for col in INFERRED_CATEGORIES:
+        if col not in frame:
+            continue
+        current = frame[col].cat.categories
+        categories = current.union(pd.Index(rows[col].dropna().unique(), dtype=current.dtype)).sort_values()
+        if not categories.equals(current):
+            old_cols[col] = frame[col].cat.set_categories(categories)
+        new_cols[col] = rows[col].astype(pd.CategoricalDtype(categories))
+    # assign() returns new frames; the shared ones are read-only
+    combined = pd.concat([frame.assign(**old_cols), rows.assign(**new_cols)], ignore_index=True)
+    if trim:
+        # Rows were removed, so some values may no longer occur
+        dimensions = TABLE_DIMENSIONS['master_leads_weekly']
+        combined = combined.assign(**{col: _trim(combined[col], dictionary.dtypes[dimensions[col]].categories
+                                                 if col in dimensions else ()) for col in new_cols})
+    return combined
+
+
+def _bump(version, changes):
+    digest = hashlib.sha256(version.encode())
+    for name, sha in changes:
+        digest.update(f"{name}:{sha}".encode())
+    return digest.hexdigest()[:12]
+
+
+def _ingested(entry):
+    """Batch log entry without the error of a failed read"""
+    return {key: value for key, value in entry.items() if key != 'error'}
+
+
+def refresh_data(data, directory, seen=None):
+    """
+    Return a new data dict with added, changed or deleted batch files in
+    `directory` applied, or None when nothing changed. Unchanged tables and
+    structures are shared with `data`, not copied. Files that fail to read
+    are left out and logged under 'ingested_batches' with an 'error'.
+    """
+    seen = scan_batches(directory) if seen is None else seen
+    log = data.get('ingested_batches', {})
+    touched = [name for name in seen if name not in log or log[name]['stat'] != seen[name]]
+    removed = [name for name in log if name not in seen]
+
+    # Touched but byte-identical files only need their stat refreshed
+    hashes = {name: _file_sha256(os.path.join(directory, name)) for name in touched}
+    changed = [name for name in touched if log.get(name, {}).get('sha256') != hashes[name]]
+    new_log = {name: entry for name, entry in log.items() if name not in removed}
+    for name in touched:
+        new_log[name] = {**_ingested(log.get(name, {})), 'stat': seen[name], 'sha256': hashes[name]}
+
+    batches, keys = {}, {}
+    for name in changed:
+        try:
+            batches[name], keys[name] = read_batch(os.path.join(directory, name), data['dimensions'])
+        except Exception as err:
+            # Logged with its stat but the last ingested hash, so it is retried only once it changes
+            new_log[name] = {**_ingested(log.get(name, {})), 'stat': seen[name],
+                             'error': f"{type(err).__name__}: {err}"}
+    changed = list(batches)
+    # Files that never got in have no rows to take out
+    removed = [name for name in removed if 'source_files' in log[name]]
+    for name, rows in batches.items():
+        new_log[name]['source_files'] = sorted(rows['source_file'].dropna().unique().tolist())
+    if not changed and not removed:
+        if new_log == log:
+            return None
+        return {**data, 'ingested_batches': new_log}
+
+    streaming = 'master_leads_weekly' not in data
+    if streaming and (removed or any('source_files' in log.get(name, {}) for name in changed)):
+        # Without lead rows there is nothing to subtract the old batch from
+        raise FullReloadRequired("changed or deleted batch under streaming ingestion")
+
+    # Only the blocks the changed and removed batches' names fall in are resolved again
+    previous = data.get('batch_variants', {})
+    batch_variants = {name: variants for name, variants in previous.items() if name not in removed + changed}
+    batch_variants.update({name: keys[name][1] for name in changed})
+    blocks = pd.concat([keys[name][1]['block'] for name in changed]
+                       + [previous[name]['block'] for name in removed + changed if name in previous]).unique()
+    pool = pd.concat([data['lead_variants'][VARIANT_COLUMNS], *batch_variants.values()], ignore_index=True)
+    registry = update_registry(lead_registry(data), pool, blocks)
+    old_uids, new_uids = _rekeyed(lead_registry(data), registry, blocks)
+    batches = {name: rows.assign(lead_uid=lookup_uids(keys[name][0], registry)) for name, rows in batches.items()}
+
+    country_attr = data['country_attr']
+    replaced = {sf for name in changed for sf in new_log[name]['source_files']}
+    replaced.update(sf for name in removed + changed if name in log for sf in log[name].get('source_files', []))
+
+    new = dict(data)
+    new['lead_registry'], new['batch_variants'] = registry, batch_variants
+    delta = []
+    if streaming:
+        new['counted_leads'] = np.unique(_remap(data['counted_leads'], old_uids, new_uids))
+        if batches:
+            added, new['counted_leads'] = mark_new_leads(pd.concat(batches.values(), ignore_index=True),
+                                                         new['counted_leads'])
+            delta.append(lead_counts(added))
+    else:
+        leads, enriched = data['master_leads_weekly'], data['master_enriched']
+        if len(old_uids):
+            # Primary rows of the weekly table are re-chosen below
+            leads = leads.assign(lead_uid=_remap(leads['lead_uid'].to_numpy(), old_uids, new_uids))
+            enriched = enriched.assign(lead_uid=leads['lead_uid'].to_numpy())
+            for name in ('master_leads', 'master_leads_monthly'):
+                new[name] = _reidentify(data[name], old_uids, new_uids, IDENTITY_PERIODS[name])
+        added = pd.concat(batches.values(), ignore_index=True) if batches else leads.iloc[:0]
+        mask = leads['source_file'].isin(replaced).to_numpy()
+        if mask.any():
+            gone = lead_counts(leads[mask])
+            gone[MEASURES] = -gone[MEASURES]
+            delta.append(gone)
+        weekly = _append(leads[~mask], added, data['dimensions'], trim=mask.any())
+        enriched = _append(enriched[~mask], enrich_countries(added, country_attr), data['dimensions'],
+                           trim=mask.any())
+        # Added rows can take over (or hand back) the primary row of a kept lead
+        primary = first_rows(weekly['lead_uid'].to_numpy(), weekly['week_num'].to_numpy())
+        kept = int((~mask).sum())
+        moved = np.flatnonzero(primary[:kept] != weekly['is_primary'].to_numpy()[:kept])
+        if len(moved):
+            delta.append(lead_counts(weekly.iloc[moved].assign(is_primary=primary[moved] - weekly['is_primary'].iloc[moved])))
+        weekly['is_primary'] = primary
+        enriched['is_primary'] = primary
+        delta.append(lead_counts(weekly.iloc[kept:]))
+        new['master_leads_weekly'] = weekly
+        new['master_enriched'] = enriched
+        if mask.any():
+            new['filter_index'] = FilterIndex.build(new)
+        else:
+            new['filter_index'] = data['filter_index'].extend(added, country_attr)
+
+    if delta:
+        new['lead_cube'] = data['lead_cube'].merge(pd.concat(delta, ignore_index=True), country_attr)
+    new['cost_ledger'] = CostLedger.build(data['channels_combined'], new['lead_cube'])
+    new['time_rollup'] = TimeRollup.build(new['lead_cube'])
+
+    # Only lead-derived caches see a new version; e.g. the Creative figures stay cached
+    changes = [(name, hashes[name]) for name in changed] + [(name, 'deleted') for name in removed]
+    new['data_version'] = _bump(data['data_version'], changes)
+    new['table_versions'] = {**data['table_versions'],
+                             'master_leads_weekly': _bump(data['table_versions']['master_leads_weekly'], changes)}
+    new['ingested_batches'] = new_log
+    return new
+
+
+class LiveStore:
+    """
+    Current DataStore for one version of the base files, advanced as batches
+    land. Each refresh publishes a new immutable DataStore; sessions keep
+    whichever one they were handed for the rest of their rerun. When a
+    refresh fails the last good DataStore stays current and `error` says
+    why, until the drop folder changes again.
+    """
+
+    def __init__(self, build, directory):
+        self._build = build
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._seen = scan_batches(directory)
+        self.error = None
+        data = build()
+        self.current = DataStore(data, data['data_version'])
+
+    def refresh(self):
+        seen = scan_batches(self.directory)
+        if seen == self._seen:
+            return self.current
+        with self._lock:
+            if seen != self._seen:
+                try:
+                    try:
+                        data = refresh_data(dict(self.current.tables), self.directory, seen)
+                    except FullReloadRequired:
+                        data = self._build()
+                    self.error = None
+                except Exception as err:
+                    data, self.error = None, f"{type(err).__name__}: {err}"
+                if data is not None:
+                    self.current = DataStore(data, data['data_version'])
+                self._seen = seen
+        return self.current
@@ -0,0 +1,162 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - INSTRUMENTATION
+# Opt-in per-rerun timing and allocation spans
+# ============================================================================
+#
+# Enable with SBE_PROFILE=1 or the ?profile=1 query parameter. Each rerun
+# records one span per stage (load, filter, aggregate, figure, chart) with
+# wall-clock time, tracemalloc allocation figures and the number of rows
+# that flowed through it; chart spans also carry the figure's JSON payload
+# size. Spans are appended to SBE_PROFILE_LOG as JSONL. tracemalloc is
+# process-wide, so allocation figures are only meaningful with one rerun at
+# a time; SBE_PROFILE_MEMORY=0 keeps the timings and skips them (as the
+# load test does).
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+
+PROFILE_LOG = os.environ.get("SBE_PROFILE_LOG", "profile_spans.jsonl")
+PROFILE_MEMORY = os.environ.get("SBE_PROFILE_MEMORY", "1") not in ("", "0")
+
+_current = contextvars.ContextVar('sbe_profiler', default=None)
+_log_lock = threading.Lock()
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def profiling_requested(query_params=None):
+    if os.environ.get("SBE_PROFILE", "") not in ("", "0"):
+        return True
+    return query_params is not None and query_params.get("profile") == "1"
+
+
+class RerunProfiler:
+    """Collects the spans of one script rerun"""
+
+    def __init__(self, session_id=None, trace_memory=True):
+        self.rerun_id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.started = time.time()
+        self.spans = []
+        self._stack = []
+        self._owns_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start()
+        self.trace_memory = tracemalloc.is_tracing()
+
+    @contextlib.contextmanager
+    def span(self, name, stage, rows=None):
+        record = {'name': name, 'stage': stage, 'rows': rows, 'depth': len(self._stack)}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]['_peak'] = max(self._stack[-1]['_peak'], peak)
+            tracemalloc.reset_peak()
+            record['_start_mem'] = current
+            record['_peak'] = current
+        self._stack.append(record)
+        self.spans.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['wall_ms'] = (time.perf_counter() - start) * 1000
+            self._stack.pop()
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(record.pop('_peak'), peak)
+                start_mem = record.pop('_start_mem')
+                record['alloc_kb'] = (current - start_mem) / 1024
+                record['peak_kb'] = (peak - start_mem) / 1024
+                if self._stack:
+                    self._stack[-1]['_peak'] = max(self._stack[-1]['_peak'], peak)
+                tracemalloc.reset_peak()
+
+    def stop(self):
+        """Stop tracemalloc if this rerun started it; safe to call more than once"""
+        if self._owns_tracing:
+            self._owns_tracing = False
+            tracemalloc.stop()
+
+    def finish(self, page=None, log_path=PROFILE_LOG):
+        self.stop()
+        total_ms = (time.time() - self.started) * 1000
+        if log_path:
+            lines = [
+                json.dumps({'rerun_id': self.rerun_id, 'session_id': self.session_id, 'ts': self.started,
+                            'page': page, 'rerun_ms': total_ms, **span})
+                for span in self.spans
+            ]
+            try:
+                with _log_lock, open(log_path, 'a') as fh:
+                    fh.write('\n'.join(lines) + '\n')
+            except OSError:
+                pass
+        return total_ms
+
+
+def start_rerun(enabled, session_id=None):
+    profiler = RerunProfiler(session_id, PROFILE_MEMORY) if enabled else None
+    _current.set(profiler)
+    return profiler
+
+
+def span(name, stage, rows=None):
+    """Time a block under the active rerun profiler; no-op when disabled"""
+    profiler = _current.get()
+    if profiler is None:
+        return _NULL_SPAN
+    return profiler.span(name, stage, rows)
+
+
+def set_rows(record, rows):
+    """Attach a row count once it is known inside a span"""
+    if record is not None:
+        record['rows'] = rows
+
+
+def figure_points(fig):
+    """Number of data points a Plotly figure will serialize"""
+    total = 0
+    for trace in fig.data:
+        for attr in ('x', 'values', 'y', 'z'):
+            values = getattr(trace, attr, None)
+            if values is not None:
+                total += len(values)
+                break
+    return total
+
+
+def set_payload(record, fig):
+    """Attach the size of a figure's JSON, as sent to the browser"""
+    if record is not None:
+        record['payload_kb'] = len(fig.to_json()) / 1024
+
+
+def render_panel(st, profiler, total_ms):
+    """Collapsible per-stage breakdown in the sidebar"""
+    with st.sidebar.expander(f"⏱️ Profiler — {total_ms:.0f} ms", expanded=False):
+        stage_totals = {}
+        for record in profiler.spans:
+            if record['depth'] == 0:
+                stage_totals[record['stage']] = stage_totals.get(record['stage'], 0) + record['wall_ms']
+        for stage, ms in sorted(stage_totals.items(), key=lambda kv: -kv[1]):
+            st.markdown(f"**{stage}** — {ms:.1f} ms")
+        rows = [
+            {
+                'span': '  ' * r['depth'] + r['name'],
+                'stage': r['stage'],
+                'ms': round(r['wall_ms'], 2),
+                'rows': r['rows'],
+                'alloc KB': round(r['alloc_kb'], 1) if 'alloc_kb' in r else None,
+                'peak KB': round(r['peak_kb'], 1) if 'peak_kb' in r else None,
+                'payload KB': round(r['payload_kb'], 1) if 'payload_kb' in r else None,
+            }
+            for r in profiler.spans
+        ]
+        st.dataframe(rows, hide_index=True)
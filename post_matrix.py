@@ -0,0 +1,161 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - POST x REGION MATRIX
+# Creative performance per post and target region on dense arrays
+# ============================================================================
+#
+# post_performance_regional_clean.csv has one row per (post, region) a post
+# ran in. The matrix holds its measures as post x region arrays, NaN where a
+# post did not run in a region or the export left the value blank, and is
+# built once per data version. A region selection sums columns and ROI and
+# CPQL are recomputed from the sums. A post's regional rows add up to more
+# than its reported totals, so with every region selected the per-post
+# figures come from post_performance_totals_clean.csv instead.
+
+import numpy as np
+import pandas as pd
+
+POST_MEASURES = ['ad_spend_usd', 'leads', 'eligible_leads', 'qualified_leads']
+RATIOS = ['roi_score', 'cpql']
+OTHER_LABEL = "Other"
+
+
+def ratios(spend, qualified):
+    """(ROI score: qualified leads per $1k spent, CPQL); NaN where undefined"""
+    spend, qualified = np.asarray(spend, dtype=float), np.asarray(qualified, dtype=float)
+    roi = (np.divide(qualified, spend, out=np.full(spend.shape, np.nan), where=spend > 0) * 1000).round(3)
+    cpql = np.divide(spend, qualified, out=np.full(spend.shape, np.nan), where=qualified > 0)
+    return roi, cpql
+
+
+def add_ratios(frame):
+    """Add RATIOS columns computed from a frame's summed POST_MEASURES"""
+    frame['roi_score'], frame['cpql'] = ratios(frame['ad_spend_usd'], frame['qualified_leads'])
+    return frame
+
+
+def _pooling(weights, selected, keep):
+    """
+    (one-hot matrix mapping positions to output slots, slot count). The
+    `keep` selected positions with the largest weights get a slot each,
+    the other selected positions share one OTHER_LABEL slot when there are
+    more than `keep`, and unselected positions map nowhere.
+    """
+    positions = np.flatnonzero(selected)
+    if len(positions) > keep:
+        keep -= 1
+    ranked = positions[np.argsort(-weights[positions], kind='stable')]
+    slots = len(ranked[:keep]) + (len(ranked) > keep)
+    onehot = np.zeros((len(selected), slots))
+    onehot[ranked[:keep], np.arange(len(ranked[:keep]))] = 1
+    onehot[ranked[keep:], slots - 1] = 1
+    return onehot, ranked[:keep]
+
+
+class PostRegionMatrix:
+    """
+    POST_MEASURES per (post, region) cell plus each post's reported totals.
+
+    Posts keep the totals file's order, then any post only in the regional
+    file; regions are sorted. `cells` hold the measures with blanks as 0 and
+    `reported` marks (as 1.0) the cells that had a value, so a region
+    selection is a matrix product with its column mask and a sum that saw
+    no value can still be told apart from a reported 0.
+    """
+
+    def __init__(self, posts, post_types, regions, cells, reported, totals):
+        self.posts = posts
+        self.post_types = post_types
+        self.regions = regions
+        self._region_index = pd.Index(regions)
+        self.cells = cells
+        self.reported = reported
+        self.totals = totals
+
+    @classmethod
+    def build(cls, regional, post_totals):
+        regional = regional.dropna(subset=['post_id', 'region'])
+        posts = pd.Index(post_totals['post_id'].dropna()).append(pd.Index(regional['post_id'])).unique()
+        regions = np.sort(regional['region'].unique().astype(str))
+        flat = posts.get_indexer(regional['post_id']) * len(regions) + np.searchsorted(regions, regional['region'])
+
+        size = len(posts) * len(regions)
+        cells, reported = {}, {}
+        for measure in POST_MEASURES:
+            values = regional[measure].to_numpy(dtype=float)
+            present = ~np.isnan(values)
+            cells[measure] = np.bincount(flat[present], weights=values[present],
+                                         minlength=size).reshape(len(posts), len(regions))
+            reported[measure] = (np.bincount(flat[present], minlength=size) > 0).astype(np.float32).reshape(
+                len(posts), len(regions))
+
+        by_post = post_totals.dropna(subset=['post_id']).groupby('post_id', sort=False)
+        totals = {measure: by_post[measure].sum(min_count=1).reindex(posts).to_numpy(dtype=float)
+                  for measure in POST_MEASURES}
+        types = pd.concat([post_totals[['post_id', 'post_type']], regional[['post_id', 'post_type']]])
+        post_types = types.drop_duplicates('post_id').set_index('post_id')['post_type'].reindex(posts).to_numpy()
+        return cls(posts.to_numpy(), post_types, regions, cells, reported, totals)
+
+    def region_mask(self, regions=None):
+        """Boolean mask over self.regions; None selects every region"""
+        if regions is None:
+            return np.ones(len(self.regions), dtype=bool)
+        return self._region_index.isin(list(regions))
+
+    def is_all(self, regions):
+        return regions is None or self.region_mask(regions).all()
+
+    def by_post(self, regions=None):
+        """
+        One row per post (index post_id): post_type, POST_MEASURES over the
+        selected regions and RATIOS. Reported totals when every region is
+        selected; posts that did not run in the selection are all NaN.
+        """
+        mask = self.region_mask(regions)
+        if mask.all():
+            measures = self.totals
+        else:
+            measures = {measure: self._sums(measure, mask) for measure in POST_MEASURES}
+        frame = pd.DataFrame({'post_type': self.post_types, **measures},
+                             index=pd.Index(self.posts, name='post_id'))
+        return add_ratios(frame)
+
+    def _sums(self, measure, mask):
+        """Per-post sums over the masked regions; NaN where no value was reported there"""
+        sums = self.cells[measure] @ mask.astype(float)
+        sums[self.reported[measure] @ mask.astype(np.float32) == 0] = np.nan
+        return sums
+
+    def grid(self, regions=None, max_rows=25, max_cols=25):
+        """
+        (post labels, region labels, {measure or ratio: 2D array}) for a
+        heatmap of the selected regions. The posts and regions with the most
+        spend are kept, up to max_rows / max_cols, and the rest are pooled into
+        OTHER_LABEL before the ratios are computed. Cells with no value are NaN.
+        """
+        mask = self.region_mask(regions)
+        ran = sum(self.reported[measure] @ mask.astype(np.float32) for measure in POST_MEASURES) > 0
+        spend = self.cells['ad_spend_usd']
+        rows, kept_posts = _pooling(spend @ mask.astype(float), ran, max_rows)
+        cols, kept_regions = _pooling(spend.sum(axis=0), mask, max_cols)
+
+        out, cols32 = {}, cols.astype(np.float32)
+        for measure in POST_MEASURES:
+            counts = rows.T @ (self.reported[measure] @ cols32)
+            out[measure] = np.where(counts > 0, rows.T @ (self.cells[measure] @ cols), np.nan)
+        out['roi_score'], out['cpql'] = ratios(out['ad_spend_usd'], out['qualified_leads'])
+
+        post_labels = np.append(self.posts[kept_posts], [OTHER_LABEL] * (rows.shape[1] - len(kept_posts)))
+        region_labels = np.append(self.regions[kept_regions], [OTHER_LABEL] * (cols.shape[1] - len(kept_regions)))
+        return post_labels.astype(object), region_labels.astype(object), out
+
+    def post_regions(self, post_id, regions=None):
+        """Drill-down for one post: one row per selected region it ran in, POST_MEASURES and RATIOS"""
+        row = np.flatnonzero(self.posts == post_id)
+        if not len(row):
+            return pd.DataFrame(columns=POST_MEASURES + RATIOS, index=pd.Index([], name='region'))
+        cols = np.flatnonzero(self.region_mask(regions))
+        frame = pd.DataFrame({measure: np.where(self.reported[measure][row[0], cols] > 0,
+                                                self.cells[measure][row[0], cols], np.nan)
+                              for measure in POST_MEASURES},
+                             index=pd.Index(self.regions[cols], name='region'))
+        return add_ratios(frame.dropna(how='all'))
@@ -0,0 +1,287 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - LEAD SCORING
+# Lead-qualification model trained and scored in vectorized NumPy passes
+# ============================================================================
+#
+# Every feature is categorical, so the model is a logistic regression over
+# one-hot columns: a lead's logit is the intercept plus one weight per
+# feature, looked up by the lead's category code. Training collapses the
+# leads to their distinct feature combinations first, so its cost follows
+# the number of combinations rather than the number of leads. Artifacts are
+# saved per data version under <data dir>/.models/.
+
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ['channel', 'country', 'region_group', 'market_priority', 'is_reachable', 'platform', 'post_id']
+TARGET = 'is_qualified'
+
+# The last HOLDOUT_WEEKS weeks are held out to report out-of-time metrics
+HOLDOUT_WEEKS = 8
+
+MODEL_DIRNAME = '.models'
+# Bumped when training changes, so artifacts of the same data version are retrained
+MODEL_FORMAT = 3
+
+
+def model_dir(base_dir):
+    return os.path.join(base_dir, MODEL_DIRNAME)
+
+
+def _feature_codes(column, vocab):
+    """Vocabulary index per lead; missing and unseen values map to len(vocab)"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes, values = column.cat.codes.to_numpy(), column.cat.categories
+    else:
+        codes, values = pd.factorize(column)
+    lookup = np.append(vocab.get_indexer(values), -1)
+    lookup[lookup < 0] = len(vocab)
+    # Code -1 (missing) picks the trailing unknown slot
+    return lookup[codes]
+
+
+def _vocab_array(values):
+    """Vocabulary as a plain NumPy array (no pickled objects in the artifact)"""
+    return values.to_numpy() if pd.api.types.is_numeric_dtype(values) else np.asarray(values, dtype=str)
+
+
+def _sigmoid(logits):
+    # exp(-log(1 + e^-x)) never overflows, unlike 1 / (1 + e^-x)
+    return np.exp(-np.logaddexp(0.0, -logits))
+
+
+def evaluate(probabilities, positives, threshold, counts=None):
+    """
+    ROC-AUC, precision, recall and F1 of `probabilities` against `positives`.
+
+    With `counts`, each entry stands for counts[i] leads of which positives[i]
+    qualified. ROC-AUC is computed per distinct score, so tied scores count
+    half and the pass stays linear after one sort.
+    """
+    counts = np.ones(len(positives)) if counts is None else np.asarray(counts, dtype=float)
+    positives = np.asarray(positives, dtype=float)
+    negatives = counts - positives
+    total_pos, total_neg = positives.sum(), negatives.sum()
+
+    levels, inverse = np.unique(probabilities, return_inverse=True)
+    pos_at = np.bincount(inverse, positives, len(levels))
+    neg_at = np.bincount(inverse, negatives, len(levels))
+    neg_below = np.cumsum(neg_at) - neg_at
+    if total_pos and total_neg:
+        auc = float((pos_at * (neg_below + 0.5 * neg_at)).sum() / (total_pos * total_neg))
+    else:
+        auc = float('nan')
+
+    predicted = probabilities >= threshold
+    tp = positives[predicted].sum()
+    flagged = counts[predicted].sum()
+    precision = tp / flagged if flagged else 0.0
+    recall = tp / total_pos if total_pos else 0.0
+    f1 = 2 * tp / (flagged + total_pos) if flagged + total_pos else 0.0
+    return {
+        'roc_auc': auc,
+        'precision': float(precision),
+        'recall': float(recall),
+        'f1': float(f1),
+        'leads': int(counts.sum()),
+        'qualified_rate': float(total_pos / counts.sum()) if counts.sum() else 0.0,
+    }
+
+
+def _best_threshold(probabilities, positives, counts):
+    """Score cut-off with the highest F1 over the weighted combinations"""
+    order = np.argsort(-probabilities, kind='stable')
+    tp = np.cumsum(positives[order])
+    flagged = np.cumsum(counts[order])
+    f1 = 2 * tp / (flagged + positives.sum())
+    return float(probabilities[order][np.argmax(f1)])
+
+
+class LeadScorer:
+    """
+    L2-regularized logistic regression over one-hot FEATURES.
+
+    `vocab[f]` holds the training values of feature f; its weights are
+    `weights[offsets[f]:offsets[f + 1]]`, one per value plus a last,
+    always-zero slot for values never seen in training. `holdout` is the
+    scorer fit on the weeks before the holdout, which scores the holdout
+    weeks out of time.
+    """
+
+    def __init__(self, vocab, weights, intercept, threshold, metrics=None, holdout=None):
+        self.vocab = vocab
+        self.weights = weights
+        self.intercept = intercept
+        self.threshold = threshold
+        self.metrics = metrics or {}
+        self.holdout = holdout
+        self.offsets = np.cumsum([0] + [len(vocab[f]) + 1 for f in FEATURES])
+
+    def encode(self, leads):
+        """(n_leads, n_features) one-hot column indices"""
+        return np.column_stack([_feature_codes(leads[f], self.vocab[f]) + self.offsets[i]
+                                for i, f in enumerate(FEATURES)])
+
+    def score(self, leads):
+        """Qualification probability for every lead in one vectorized pass"""
+        logits = np.full(len(leads), self.intercept)
+        for i, f in enumerate(FEATURES):
+            feature_weights = self.weights[self.offsets[i]:self.offsets[i + 1]]
+            logits += feature_weights[_feature_codes(leads[f], self.vocab[f])]
+        return _sigmoid(logits)
+
+    @classmethod
+    def fit(cls, leads, l2=1.0, max_iter=50, tol=1e-8):
+        """Newton (IRLS) fit on the distinct feature combinations of `leads`"""
+        vocab = {}
+        for f in FEATURES:
+            values = leads[f].dropna().unique()
+            vocab[f] = pd.Index(np.sort(np.asarray(values)))
+        scorer = cls(vocab, np.zeros(0), 0.0, 0.5)
+
+        # One mixed-radix key per lead, then a 1-D unique over the keys
+        columns = scorer.encode(leads)
+        sizes = np.diff(scorer.offsets)
+        local = columns - scorer.offsets[:-1]
+        keys = np.ravel_multi_index(local.T, sizes)
+        keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        positives = np.bincount(inverse, leads[TARGET].to_numpy(dtype=float), len(keys))
+        combos = np.column_stack(np.unravel_index(keys, sizes)) + scorer.offsets[:-1]
+
+        n_columns = int(scorer.offsets[-1])
+        design = np.zeros((len(keys), n_columns + 1))
+        design[:, 0] = 1.0
+        np.put_along_axis(design, combos + 1, 1.0, axis=1)
+        penalty = np.full(n_columns + 1, l2)
+        penalty[0] = 0.0  # intercept is not shrunk
+
+        beta = np.zeros(n_columns + 1)
+        rate = positives.sum() / counts.sum()
+        if 0 < rate < 1:
+            beta[0] = np.log(rate / (1 - rate))
+        def objective(beta):
+            logits = design @ beta
+            return (positives @ logits - counts @ np.logaddexp(0.0, logits)) - 0.5 * penalty @ beta ** 2
+
+        current = objective(beta)
+        for _ in range(max_iter):
+            p = _sigmoid(design @ beta)
+            gradient = design.T @ (positives - counts * p) - penalty * beta
+            hessian = (design.T * (counts * p * (1 - p))) @ design + np.diag(penalty)
+            step = np.linalg.solve(hessian + 1e-9 * np.eye(len(beta)), gradient)
+            # Halve the Newton step until the penalized likelihood improves
+            scale = 1.0
+            while scale > 1e-6 and objective(beta + scale * step) < current:
+                scale /= 2
+            beta += scale * step
+            current = objective(beta)
+            if np.abs(scale * step).max() < tol:
+                break
+
+        scorer.intercept, scorer.weights = float(beta[0]), beta[1:]
+        fitted = _sigmoid(design @ beta)
+        scorer.threshold = _best_threshold(fitted, positives, counts)
+        scorer.metrics = {'train': evaluate(fitted, positives, scorer.threshold, counts)}
+        return scorer
+
+    @classmethod
+    def train(cls, leads, holdout_weeks=HOLDOUT_WEEKS):
+        """
+        Fit on every lead once: on its primary row when the table marks one
+        (is_primary), so a lead seen in several exports cannot land on both
+        sides of the holdout split. Holdout metrics come from a second fit on
+        the leads before the final `holdout_weeks` weeks, scored on those weeks;
+        that fit is kept as `holdout` for scoring filtered views of them.
+        """
+        if 'is_primary' in leads:
+            leads = leads[leads['is_primary'].to_numpy() == 1]
+        cutoff = int(leads['week_num'].max()) - holdout_weeks
+        past = (leads['week_num'] <= cutoff).to_numpy()
+        scorer = cls.fit(leads)
+        if past.any() and not past.all():
+            earlier = scorer.holdout = cls.fit(leads[past])
+            recent = leads[~past]
+            scorer.metrics['holdout'] = {
+                **evaluate(earlier.score(recent), recent[TARGET].to_numpy(), earlier.threshold),
+                'from_week': cutoff + 1,
+            }
+        return scorer
+
+    def importance(self):
+        """[(feature, spread of its weights)], largest first"""
+        spread = {f: float(np.ptp(self.weights[self.offsets[i]:self.offsets[i + 1] - 1]))
+                  if len(self.vocab[f]) else 0.0 for i, f in enumerate(FEATURES)}
+        return sorted(spread.items(), key=lambda item: item[1], reverse=True)
+
+    def _arrays(self, prefix=''):
+        arrays = {f'{prefix}vocab_{f}': _vocab_array(self.vocab[f]) for f in FEATURES}
+        meta = {'intercept': self.intercept, 'threshold': self.threshold, 'metrics': self.metrics}
+        arrays[f'{prefix}weights'] = self.weights
+        arrays[f'{prefix}meta'] = np.array(json.dumps(meta))
+        return arrays
+
+    @classmethod
+    def _from_arrays(cls, artifact, prefix=''):
+        meta = json.loads(str(artifact[f'{prefix}meta']))
+        vocab = {f: pd.Index(artifact[f'{prefix}vocab_{f}']) for f in FEATURES}
+        return cls(vocab, artifact[f'{prefix}weights'], meta['intercept'], meta['threshold'], meta['metrics'])
+
+    def save(self, path):
+        arrays = self._arrays()
+        if self.holdout is not None:
+            arrays.update(self.holdout._arrays('holdout_'))
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as artifact:
+            scorer = cls._from_arrays(artifact)
+            if 'holdout_meta' in artifact.files:
+                scorer.holdout = cls._from_arrays(artifact, 'holdout_')
+            return scorer
+
+
+def load_or_train(leads, version, directory):
+    """
+    The scorer for data `version`: read from `directory` when an artifact
+    exists, trained and saved otherwise. Artifacts of other versions are
+    removed; an unwritable directory just means training every process.
+    """
+    path = os.path.join(directory, f'lead_scorer-{MODEL_FORMAT}-{version}.npz')
+    try:
+        return LeadScorer.load(path)
+    except (OSError, KeyError, ValueError):
+        pass
+    scorer = LeadScorer.train(leads)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        scorer.save(path)
+        for stale in glob.glob(os.path.join(directory, 'lead_scorer-*.npz')):
+            if stale != path:
+                os.remove(stale)
+    except OSError:
+        pass
+    return scorer
+
+
+def segment_scores(leads, probabilities, dimension):
+    """Leads, mean predicted probability and actual qualified rate per value of `dimension`"""
+    codes, values = pd.factorize(leads[dimension], sort=True)
+    present = codes >= 0  # missing values form no segment, as in a groupby
+    codes = codes[present]
+    size = len(values)
+    count = np.bincount(codes, minlength=size)
+    segments = pd.DataFrame({
+        'leads': count,
+        'probability': np.bincount(codes, probabilities[present], size) / np.maximum(count, 1),
+        'actual': np.bincount(codes, leads[TARGET].to_numpy()[present], size) / np.maximum(count, 1),
+    }, index=pd.Index(values, name=dimension))
+    segments = segments[segments['leads'] > 0]
+    segments['expected_qualified'] = segments['leads'] * segments['probability']
+    return segments.sort_values('probability', ascending=False)
@@ -0,0 +1,136 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - SQL BACKEND
+# Optional in-process SQLite engine for filters and aggregations
+# ============================================================================
+#
+# Select with SBE_BACKEND=sqlite. The store exposes the same slice / totals /
+# rollup / nunique interface as cube.LeadCube, but every call is a
+# parameterized query with the sidebar filters pushed into the WHERE clause.
+
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cube import DIMENSIONS, FILTER_DIMENSIONS, MEASURES
+
+# Only a lead's primary row counts (see dedup.py)
+_MEASURE_SQL = ("COALESCE(SUM(is_primary), 0) AS lead_count, COALESCE(SUM(is_qualified * is_primary), 0) AS qualified_sum, "
+                "COALESCE(SUM(is_reachable * is_primary), 0) AS reachable_sum")
+
+
+def _check_dims(dims):
+    # Column names cannot be bound as parameters, so only known dimensions are interpolated
+    for dim in dims:
+        if dim not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dim}")
+
+
+class SqliteLeadStore:
+    """Lead rows in an in-memory SQLite database, one row per lead row"""
+
+    def __init__(self, conn, n_rows):
+        self._conn = conn
+        self._lock = threading.Lock()
+        self.n_rows = n_rows
+
+    @classmethod
+    def build(cls, leads, country_attr):
+        return cls.build_chunked([leads], country_attr)
+
+    @classmethod
+    def build_chunked(cls, chunks, country_attr):
+        """Insert lead frames one chunk at a time (streaming ingestion)"""
+        priority = country_attr.drop_duplicates('country').set_index('country')['market_priority']
+
+        # Shared across Streamlit script threads; every query holds self._lock
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE leads (row_pos INTEGER PRIMARY KEY, channel TEXT, country TEXT, "
+            "market_priority TEXT, week_num INTEGER, is_qualified INTEGER, is_reachable INTEGER, is_primary INTEGER)"
+        )
+        n_rows = 0
+        for leads in chunks:
+            table = pd.DataFrame({
+                'row_pos': np.arange(n_rows, n_rows + len(leads), dtype=np.int64),
+                'channel': leads['channel'].astype(object),
+                'country': leads['country'].astype(object),
+                'market_priority': leads['country'].map(priority).astype(object),
+                'week_num': leads['week_num'].astype('int64'),
+                'is_qualified': leads['is_qualified'].astype('int64'),
+                'is_reachable': leads['is_reachable'].astype('int64'),
+                'is_primary': leads['is_primary'].astype('int64'),
+            })
+            table = table.astype(object).where(table.notna(), None)
+            conn.executemany("INSERT INTO leads VALUES (?, ?, ?, ?, ?, ?, ?, ?)", table.itertuples(index=False, name=None))
+            n_rows += len(leads)
+        for dim in DIMENSIONS:
+            conn.execute(f"CREATE INDEX idx_leads_{dim} ON leads ({dim})")
+        conn.commit()
+        return cls(conn, n_rows)
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def slice(self, filters):
+        clauses = ["week_num BETWEEN ? AND ?"]
+        params = [int(filters['week_range'][0]), int(filters['week_range'][1])]
+        for key, dim in FILTER_DIMENSIONS.items():
+            if filters[key] != 'All':
+                clauses.append(f"{dim} = ?")
+                params.append(filters[key])
+        return SqlLeadSlice(self, " AND ".join(clauses), tuple(params))
+
+    def select_rows(self, filters):
+        """Sorted row positions matching the filters, for app.filter_rows"""
+        view = self.slice(filters)
+        rows = self.query(f"SELECT row_pos FROM leads WHERE {view.where} ORDER BY row_pos", view.params)
+        if len(rows) == self.n_rows:
+            return None
+        return np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+
+    def __len__(self):
+        return self.n_rows
+
+
+class SqlLeadSlice:
+    """Filtered view; mirrors the LeadCube slice interface"""
+
+    def __init__(self, store, where, params):
+        self.store = store
+        self.where = where
+        self.params = params
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.store.query(f"SELECT COUNT(*) FROM leads WHERE {self.where} AND is_primary = 1",
+                                           self.params)[0][0]
+        return self._count
+
+    def is_empty(self):
+        return len(self) == 0
+
+    def totals(self):
+        row = self.store.query(f"SELECT {_MEASURE_SQL} FROM leads WHERE {self.where}", self.params)[0]
+        return dict(zip(MEASURES, (int(v) for v in row)))
+
+    def rollup(self, *dims):
+        _check_dims(dims)
+        cols = ", ".join(dims)
+        not_null = " AND ".join(f"{dim} IS NOT NULL" for dim in dims)
+        rows = self.store.query(
+            f"SELECT {cols}, {_MEASURE_SQL} FROM leads WHERE {self.where} AND {not_null} "
+            f"GROUP BY {cols} HAVING SUM(is_primary) > 0 ORDER BY {cols}",
+            self.params,
+        )
+        frame = pd.DataFrame(rows, columns=[*dims, *MEASURES])
+        frame[MEASURES] = frame[MEASURES].astype('int64')
+        return frame.set_index(list(dims))
+
+    def nunique(self, dim):
+        _check_dims([dim])
+        return self.store.query(f"SELECT COUNT(DISTINCT {dim}) FROM leads WHERE {self.where} AND is_primary = 1",
+                                self.params)[0][0]
@@ -0,0 +1,134 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - STREAMING INGESTION
+# Chunked reads of the lead exports, folded straight into the aggregates
+# ============================================================================
+#
+# Enable with SBE_INGEST=stream. master_leads_weekly.csv is read CHUNK_ROWS
+# rows at a time; each chunk is cleaned exactly as in data_loader and reduced
+# to per-(channel, country, week_num) measures, so memory is bounded by the
+# number of cube cells rather than the number of leads. The row-per-lead
+# tables (and the FilterIndex over them) are never materialized in this mode.
+#
+# Counting by lead_uid takes two passes: the first keeps each lead's first
+# week, the second marks one row of that week as the lead's primary row.
+# Both hold one entry per distinct lead, not per row. Rows get their
+# lead_uid from the lead registry (dedup.py), which the load resolves over
+# the names of every lead export before the first pass.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from cube import MEASURES, lead_counts
+from data_loader import (BASE_DIR, LEAD_DTYPES, LEAD_TABLES, SOURCE_FILES, TABLES, _timed,
+                         add_week_num, build_tables, data_version, source_fingerprint)
+from dedup import NAME_COLUMNS, lookup_uids, name_keys
+from dimensions import DimensionDictionary
+
+CHUNK_ROWS = 250_000
+
+# Only what the cube needs; strings stay plain until every chunk has been seen
+STREAM_DTYPES = {
+    'channel': 'str',
+    'country': 'str',
+    'week_number': 'str',
+    'is_qualified': LEAD_DTYPES['is_qualified'],
+    'is_reachable': LEAD_DTYPES['is_reachable'],
+}
+
+COUNT_DIMENSIONS = ['channel', 'country', 'week_num']
+
+
+def weekly_leads_path(base_dir=BASE_DIR):
+    return os.path.join(base_dir, SOURCE_FILES['master_leads_weekly'])
+
+
+def _read_chunks(path, columns, chunksize):
+    dtype = {col: STREAM_DTYPES.get(col, 'str') for col in columns}
+    return pd.read_csv(path, usecols=list(dtype), dtype=dtype, chunksize=chunksize, encoding='utf-8-sig')
+
+
+def _chunk_uids(chunk, registry):
+    return lookup_uids(name_keys(chunk)[0], registry)
+
+
+def first_weeks(path, registry, chunksize=CHUNK_ROWS):
+    """(sorted lead_uids, first week_num of each) over a weekly lead export, uids from the lead `registry`"""
+    keys, weeks = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int16)
+    with _read_chunks(path, NAME_COLUMNS + ['week_number'], chunksize) as reader:
+        for chunk in reader:
+            uids = np.concatenate([keys, _chunk_uids(chunk, registry)])
+            weeks = np.concatenate([weeks, add_week_num(chunk)['week_num'].to_numpy()])
+            keys, inverse = np.unique(uids, return_inverse=True)
+            first = np.full(len(keys), np.iinfo(np.int16).max, dtype=np.int16)
+            np.minimum.at(first, inverse, weeks)
+            weeks = first
+    return keys, weeks
+
+
+def iter_lead_chunks(path, dictionary, registry, chunksize=CHUNK_ROWS, first=None):
+    """
+    Cleaned chunks of a weekly lead export: cube dimensions (spelled as in
+    the DimensionDictionary, as plain strings), flags, lead_uid and
+    is_primary. is_primary marks each lead's first row in its first week, as
+    data_loader does for the loaded table. `first` is the first_weeks result
+    when already known.
+    """
+    keys, weeks = first_weeks(path, registry, chunksize) if first is None else first
+    claimed = np.zeros(len(keys), dtype=bool)
+    with _read_chunks(path, NAME_COLUMNS + list(STREAM_DTYPES), chunksize) as reader:
+        for chunk in reader:
+            chunk = add_week_num(chunk.assign(lead_uid=_chunk_uids(chunk, registry)))
+            for dim in COUNT_DIMENSIONS[:2]:
+                chunk[dim] = dictionary.respell(chunk[dim], dim)
+            position = np.searchsorted(keys, chunk['lead_uid'].to_numpy())
+            candidates = np.flatnonzero((chunk['week_num'].to_numpy() == weeks[position]) & ~claimed[position])
+            _, first = np.unique(position[candidates], return_index=True)
+            primary = np.zeros(len(chunk), dtype=np.int8)
+            primary[candidates[first]] = 1
+            claimed[position[candidates[first]]] = True
+            yield chunk.drop(columns=NAME_COLUMNS[:2]).assign(is_primary=primary)
+
+
+def _reduce(counts):
+    return counts.groupby(COUNT_DIMENSIONS, dropna=False, sort=False)[MEASURES].sum().reset_index()
+
+
+def stream_lead_counts(path, dictionary, registry, chunksize=CHUNK_ROWS, first=None):
+    """
+    Fold a weekly lead export into (channel, country, week_num) counts.
+
+    The result feeds LeadCube.from_counts and yields the same cells as
+    LeadCube.build on the fully loaded table.
+    """
+    counts = pd.DataFrame({dim: pd.Series(dtype='str') for dim in COUNT_DIMENSIONS[:2]})
+    counts['week_num'] = pd.Series(dtype='int16')
+    for measure in MEASURES:
+        counts[measure] = pd.Series(dtype='int64')
+    for chunk in iter_lead_chunks(path, dictionary, registry, chunksize, first):
+        counts = _reduce(pd.concat([counts, _reduce(lead_counts(chunk))], ignore_index=True))
+
+    # data_loader.sort_categories gives the in-memory path sorted categories; match it
+    for dim in COUNT_DIMENSIONS[:2]:
+        counts[dim] = counts[dim].astype(pd.CategoricalDtype(sorted(counts[dim].dropna().unique())))
+    return counts
+
+
+def load_streaming(base_dir=BASE_DIR, chunksize=CHUNK_ROWS, timings=None):
+    """
+    Return (tables, version) like data_loader.load_tables, minus the lead
+    tables and plus 'lead_counts' folded from master_leads_weekly.csv,
+    'counted_leads', the sorted lead_uids already counted, and 'dimensions',
+    the DimensionDictionary of the other tables the chunks are spelled by.
+    The lead registry ('lead_variants') is loaded like any other table.
+    """
+    tables = build_tables(base_dir, timings=timings, names=[t for t in TABLES if t not in LEAD_TABLES])
+    tables['dimensions'] = DimensionDictionary.from_tables(tables, tables['dimension_issues'])
+    path = weekly_leads_path(base_dir)
+    registry = tables['lead_variants']
+    first = _timed('stream:lead_uids', first_weeks, (path, registry, chunksize), timings)
+    tables['lead_counts'] = _timed('stream:master_leads_weekly', stream_lead_counts,
+                                   (path, tables['dimensions'], registry, chunksize, first), timings)
+    tables['counted_leads'] = first[0]
+    return tables, data_version(source_fingerprint(base_dir))
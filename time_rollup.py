@@ -0,0 +1,100 @@
+# ============================================================================
+# SBE MARKETING INTELLIGENCE PLATFORM - TIME ROLLUP
+# Week -> month -> quarter hierarchy with precomputed aggregates per grain
+# ============================================================================
+#
+# Report weeks are numbered by the program, not the calendar: Week 14 is the
+# "Aug 5-11" (2024) report and every week runs Monday to Sunday. A week
+# belongs to the month (and quarter) holding its Thursday, i.e. most of its
+# days. Every grain is built once per data version from the lead cube's
+# per-series weekly matrix: period totals plus trailing moving sums, so a
+# filter only sums the matching series rows.
+
+import numpy as np
+import pandas as pd
+
+from cube import MEASURES, series_mask
+
+GRAINS = ['Week', 'Month', 'Quarter']
+
+# Trailing moving-average window per grain, in periods
+MA_WINDOWS = {'Week': 4, 'Month': 3, 'Quarter': 2}
+
+# (week_num, Monday it starts on) for one report week; see source_file
+REFERENCE_WEEK = (14, np.datetime64('2024-08-05'))
+
+
+def week_start(week_num):
+    """Monday each report week starts on"""
+    number, monday = REFERENCE_WEEK
+    return monday + (np.asarray(week_num) - number) * np.timedelta64(7, 'D')
+
+
+def period_labels(weeks, grain):
+    """Label of the `grain` period each week falls in; chronological order"""
+    if grain == 'Week':
+        return np.asarray(weeks)
+    thursdays = pd.DatetimeIndex(week_start(weeks) + np.timedelta64(3, 'D'))
+    if grain == 'Month':
+        return np.asarray(thursdays.strftime('%b %Y'))
+    return np.asarray(thursdays.to_period('Q').strftime('%Y Q%q'))
+
+
+class TimeRollup:
+    """
+    MEASURES per (channel, country, market_priority) series at every grain.
+
+    For each grain: period labels, the first and last week of each period,
+    per-series period totals and per-series trailing moving sums over
+    MA_WINDOWS[grain] periods (NaN until a full window exists). Moving sums
+    are additive, so a slice's moving average is the sum of its series'
+    moving sums over the window length; no slice regroups leads.
+    """
+
+    def __init__(self, keys, grains):
+        self.keys = keys
+        self.grains = grains
+
+    @classmethod
+    def build(cls, cube):
+        keys, weeks, weekly = cube.series(MEASURES)
+        grains = {}
+        for grain in GRAINS:
+            labels = period_labels(weeks, grain)
+            starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+            ends = np.r_[starts[1:], len(weeks)] - 1
+            totals = {m: np.add.reduceat(weekly[m], starts, axis=1) for m in MEASURES}
+            window = MA_WINDOWS[grain]
+            cumulative = np.cumsum(totals['lead_count'], axis=1)
+            moving = np.full(cumulative.shape, np.nan)
+            if cumulative.shape[1] >= window:
+                moving[:, window - 1:] = cumulative[:, window - 1:]
+                moving[:, window:] -= cumulative[:, :-window]
+            grains[grain] = {
+                'labels': labels[starts],
+                'first_week': weeks[starts],
+                'last_week': weeks[ends],
+                'totals': totals,
+                'moving_sum': moving,
+            }
+        return cls(keys, grains)
+
+    def slice(self, filters, grain):
+        """
+        One row per `grain` period overlapping the week range, for the series
+        matching the filters: MEASURES, 'moving_avg' and 'partial' (period
+        extends past the week range; its totals cover the whole period).
+        Empty when nothing matches.
+        """
+        table = self.grains[grain]
+        lo, hi = filters['week_range']
+        periods = (table['last_week'] >= lo) & (table['first_week'] <= hi)
+        rows = series_mask(self.keys, filters)
+        frame = pd.DataFrame({'period': table['labels'][periods]})
+        for measure in MEASURES:
+            frame[measure] = table['totals'][measure][np.ix_(rows, periods)].sum(axis=0)
+        frame['moving_avg'] = table['moving_sum'][np.ix_(rows, periods)].sum(axis=0) / MA_WINDOWS[grain]
+        frame['partial'] = (table['first_week'][periods] < lo) | (table['last_week'][periods] > hi)
+        if not rows.any():
+            return frame.iloc[:0]
+        return frame